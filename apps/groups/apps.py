@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class GroupsConfig(AppConfig):
+    name = 'apps.groups'
+
+    def ready(self):
+        from . import signals  # noqa: F401
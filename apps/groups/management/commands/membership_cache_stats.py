@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.groups import membership
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the group membership cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after printing them'
+        )
+
+    def handle(self, *args, **options):
+        stats = membership.stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit_ratio={ratio:.2%}"
+        )
+        if options['reset']:
+            membership.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
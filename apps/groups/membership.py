@@ -0,0 +1,110 @@
+"""
+Cached "which groups is this user a member of" lookups.
+
+Each user's memberships are cached as {owner_id: [group_id, ...]}, so
+visibility checks for one author only look at that author's groups.
+Entries are dropped by the signal handlers in signals.py whenever
+FriendGroup.members changes or a group is deleted.
+
+Entries live in the shared cache (L2) only: an in-process copy would outlive
+the invalidation in other workers and let a removed member keep seeing the
+group's posts. Hit/miss counters are summed per process and added to L2
+every STATS_FLUSH_EVERY lookups, not on each one.
+"""
+import threading
+
+from django.conf import settings
+
+from pickme.cache import shared_cache
+
+from .models import FriendGroup
+
+HITS_KEY = 'groups:membership:hits'
+MISSES_KEY = 'groups:membership:misses'
+STATS_FLUSH_EVERY = 100
+
+_pending = {HITS_KEY: 0, MISSES_KEY: 0}
+_pending_lock = threading.Lock()
+
+
+def _key(user_id):
+    return f'groups:member-of:{user_id}'
+
+
+def _incr(cache, key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def _take_pending():
+    with _pending_lock:
+        counts = dict(_pending)
+        for key in _pending:
+            _pending[key] = 0
+    return counts
+
+
+def _count(key):
+    with _pending_lock:
+        _pending[key] += 1
+        if sum(_pending.values()) < STATS_FLUSH_EVERY:
+            return
+    flush_stats()
+
+
+def flush_stats():
+    """Add this process's pending counts to the shared counters."""
+    cache = shared_cache()
+    for key, delta in _take_pending().items():
+        if delta:
+            _incr(cache, key, delta)
+
+
+def _memberships(user_id):
+    cache = shared_cache()
+    memberships = cache.get(_key(user_id))
+    if memberships is not None:
+        _count(HITS_KEY)
+        return memberships
+
+    _count(MISSES_KEY)
+    memberships = {}
+    rows = FriendGroup.members.through.objects.filter(
+        user_id=user_id
+    ).values_list('friendgroup__owner_id', 'friendgroup_id')
+    for owner_id, group_id in rows:
+        memberships.setdefault(owner_id, []).append(group_id)
+    cache.set(_key(user_id), memberships, settings.GROUP_MEMBERSHIP_CACHE_TIMEOUT)
+    return memberships
+
+
+def member_group_ids(user, owner_id=None):
+    """Ids of groups `user` is a member of, optionally only those owned by `owner_id`."""
+    if user is None or not user.is_authenticated:
+        return []
+    memberships = _memberships(user.pk)
+    if owner_id is not None:
+        return list(memberships.get(int(owner_id), []))
+    return [group_id for group_ids in memberships.values() for group_id in group_ids]
+
+
+def invalidate(user_ids):
+    shared_cache().delete_many([_key(user_id) for user_id in user_ids])
+
+
+def stats():
+    """Counters of all processes, as far as they have been flushed."""
+    flush_stats()
+    cache = shared_cache()
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def reset_stats():
+    _take_pending()
+    shared_cache().delete_many([HITS_KEY, MISSES_KEY])
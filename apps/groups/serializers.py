@@ -2,11 +2,14 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import FriendGroup
 from apps.users.serializers import UserSearchSerializer
+from pickme.fieldsets import FieldSelectionMixin
 
 User = get_user_model()
 
 
-class FriendGroupSerializer(serializers.ModelSerializer):
+class FriendGroupSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    expandable_fields = ('owner',)
+
     owner = UserSearchSerializer(read_only=True)
     members_count = serializers.SerializerMethodField()
 
@@ -16,6 +19,8 @@ class FriendGroupSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'owner', 'created_at', 'updated_at')
 
     def get_members_count(self, obj):
+        if hasattr(obj, 'members_count'):
+            return obj.members_count
         return obj.members.count()
 
 
@@ -26,7 +31,7 @@ class FriendGroupCreateSerializer(serializers.ModelSerializer):
 
     def validate_name(self, value):
         user = self.context['request'].user
-        if FriendGroup.objects.filter(owner=user, name=value).exists():
+        if FriendGroup.objects.filter(owner_id=user.pk, name=value).exists():
             raise serializers.ValidationError('You already have a group with this name')
         return value
 
@@ -43,7 +48,7 @@ class FriendGroupUpdateSerializer(serializers.ModelSerializer):
     def validate_name(self, value):
         user = self.context['request'].user
         instance = self.instance
-        if FriendGroup.objects.filter(owner=user, name=value).exclude(pk=instance.pk).exists():
+        if FriendGroup.objects.filter(owner_id=user.pk, name=value).exclude(pk=instance.pk).exists():
             raise serializers.ValidationError('You already have a group with this name')
         return value
 
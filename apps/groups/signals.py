@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+
+from apps.posts import live
+from . import membership
+from .models import FriendGroup
+
+
+def _invalidate(user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    membership.invalidate(user_ids)
+
+    def committed():
+        # Drop again, in case a concurrent request re-cached the old
+        # memberships before this transaction became visible
+        membership.invalidate(user_ids)
+        live.membership_changed(user_ids)
+    transaction.on_commit(committed)
+
+
+@receiver(m2m_changed, sender=FriendGroup.members.through)
+def group_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # user.member_of_groups.add(...) and friends: only `instance` changes
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _invalidate([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        instance._cleared_member_ids = list(instance.members.values_list('id', flat=True))
+    elif action == 'post_clear':
+        _invalidate(getattr(instance, '_cleared_member_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        _invalidate(pk_set)
+
+
+@receiver(pre_delete, sender=FriendGroup)
+def group_deleted(sender, instance, **kwargs):
+    _invalidate(instance.members.values_list('id', flat=True))
@@ -2,7 +2,10 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef
 from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import extend_schema, extend_schema_view
 
 from .models import FriendGroup
 from .serializers import (
@@ -12,21 +15,34 @@ from .serializers import (
     FriendGroupDetailSerializer,
     GroupMemberSerializer,
 )
-from apps.users.serializers import UserSearchSerializer
+from apps.users.serializers import UserSearchRowSerializer, UserSearchSerializer
+from apps.posts import timeline
+from pickme.conditional import ConditionalGetMixin, version_subquery
+from pickme.db_router import ReplicaReadMixin
+from pickme.fieldsets import FIELDSET_PARAMETERS, select_fields
+from pickme.pagination import KeysetPagination
 
 User = get_user_model()
 
 
 class IsGroupOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.owner == request.user
+        return obj.owner_id == request.user.pk
 
 
-class FriendGroupListCreateView(generics.ListCreateAPIView):
+@extend_schema_view(get=extend_schema(parameters=FIELDSET_PARAMETERS))
+class FriendGroupListCreateView(ReplicaReadMixin, generics.ListCreateAPIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_queryset(self):
-        return FriendGroup.objects.filter(owner=self.request.user)
+        queryset = FriendGroup.objects.filter(owner_id=self.request.user.pk)
+        selection = select_fields(self.request, FriendGroupSerializer)
+        if selection.expands('owner'):
+            queryset = queryset.select_related('owner')
+        if 'members_count' in selection:
+            # The GROUP BY drops Meta.ordering, restated for stable pages
+            queryset = queryset.annotate(members_count=Count('members')).order_by('name')
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -34,36 +50,57 @@ class FriendGroupListCreateView(generics.ListCreateAPIView):
         return FriendGroupSerializer
 
 
-class FriendGroupDetailView(generics.RetrieveUpdateDestroyAPIView):
+class FriendGroupDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = (permissions.IsAuthenticated, IsGroupOwner)
 
     def get_queryset(self):
-        return FriendGroup.objects.filter(owner=self.request.user)
+        return FriendGroup.objects.filter(owner_id=self.request.user.pk)
+
+    def get_validators(self):
+        # Renames move updated_at; members coming and going change their
+        # count or newest id, profile changes their updated_at
+        members = FriendGroup.members.through.objects.filter(friendgroup_id=OuterRef('pk')).values('friendgroup_id')
+        version = self.get_queryset().filter(pk=self.kwargs['pk']).annotate(
+            owner_updated_at=F('owner__updated_at'),
+            members_version=version_subquery(members, Count('pk'), Max('pk'), Max('user__updated_at')),
+        ).values_list('updated_at', 'owner_updated_at', 'members_version').first()
+        return None if version is None else (version, None)
 
     def get_serializer_class(self):
         if self.request.method in ('PUT', 'PATCH'):
             return FriendGroupUpdateSerializer
         return FriendGroupDetailSerializer
 
+    def perform_destroy(self, instance):
+        # Members must not keep entries of posts they no longer see, even if
+        # the pruning fails
+        with transaction.atomic():
+            member_ids = list(instance.members.values_list('id', flat=True))
+            post_ids = list(instance.posts.values_list('id', flat=True))
+            instance.delete()
+            timeline.prune_entries(member_ids, post_ids)
 
-class GroupMembersListView(generics.ListAPIView):
+
+@extend_schema_view(get=extend_schema(responses=UserSearchSerializer))
+class GroupMembersListView(ReplicaReadMixin, generics.ListAPIView):
     permission_classes = (permissions.IsAuthenticated, IsGroupOwner)
-    serializer_class = UserSearchSerializer
+    serializer_class = UserSearchRowSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         group = get_object_or_404(
             FriendGroup,
             pk=self.kwargs['group_id'],
-            owner=self.request.user
+            owner_id=self.request.user.pk
         )
-        return group.members.all()
+        return group.members.values(*UserSearchRowSerializer.row_fields)
 
 
 class GroupMemberAddView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request, group_id):
-        group = get_object_or_404(FriendGroup, pk=group_id, owner=request.user)
+        group = get_object_or_404(FriendGroup, pk=group_id, owner_id=request.user.pk)
         
         serializer = GroupMemberSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
@@ -78,6 +115,7 @@ class GroupMemberAddView(APIView):
             )
         
         group.members.add(user)
+        timeline.add_member(group, user)
         return Response(
             {'detail': 'User added to group'},
             status=status.HTTP_201_CREATED
@@ -88,7 +126,7 @@ class GroupMemberRemoveView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def delete(self, request, group_id, user_id):
-        group = get_object_or_404(FriendGroup, pk=group_id, owner=request.user)
+        group = get_object_or_404(FriendGroup, pk=group_id, owner_id=request.user.pk)
         user = get_object_or_404(User, pk=user_id)
         
         if not group.members.filter(pk=user_id).exists():
@@ -98,4 +136,5 @@ class GroupMemberRemoveView(APIView):
             )
         
         group.members.remove(user)
+        timeline.remove_member(group, user)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('last_error',)
+    actions = ('retry',)
+
+    @admin.action(description='Retry selected jobs now')
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.QUEUED,
+            attempts=0,
+            run_at=timezone.now(),
+        )
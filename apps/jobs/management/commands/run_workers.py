@@ -0,0 +1,76 @@
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils.module_loading import autodiscover_modules
+
+from apps.jobs import queue
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.JOBS_CONCURRENCY,
+            help='Number of worker threads, each with its own database connection'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Seconds an idle worker waits before polling again'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due now and exit'
+        )
+
+    def handle(self, *args, **options):
+        # Tasks register themselves when their module is imported
+        autodiscover_modules('tasks')
+        queue.requeue_stale()
+
+        stop = threading.Event()
+        if not options['once']:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                # Finish the jobs in progress, then exit
+                signal.signal(sig, lambda *_: stop.set())
+
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(stop, options['poll_interval'], options['once']),
+                name=f'jobs-worker-{index}',
+            )
+            for index in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        if not options['once']:
+            self.stdout.write(f'Started {len(threads)} worker(s)')
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+
+    def work(self, stop, poll_interval, once):
+        last_requeue = time.monotonic()
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                if queue.run_next():
+                    continue
+                if once:
+                    break
+                if time.monotonic() - last_requeue > settings.JOBS_LOCK_TIMEOUT:
+                    queue.requeue_stale()
+                    last_requeue = time.monotonic()
+                stop.wait(poll_interval)
+        finally:
+            connection.close()
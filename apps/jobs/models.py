@@ -0,0 +1,47 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A queued call of a function registered with @task (see queue.py)."""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        FAILED = 'failed', 'Failed'
+
+    name = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'jobs'
+        ordering = ['run_at', 'id']
+        indexes = [
+            # What workers poll: due queued jobs, oldest first
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=Q(status='queued'),
+                name='jobs_queued_run_at_idx'
+            ),
+            # Running jobs of crashed workers are requeued after a timeout
+            models.Index(
+                fields=['locked_at'],
+                condition=Q(status='running'),
+                name='jobs_running_locked_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
@@ -0,0 +1,131 @@
+"""
+Background jobs stored in PostgreSQL.
+
+Register a function with @task and call `func.enqueue(**kwargs)`; kwargs
+must be JSON-serializable. The job row is inserted in the caller's
+transaction, so it becomes visible to workers exactly when that transaction
+commits and disappears with it on rollback.
+
+Workers (`manage.py run_workers`) claim due jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of them can poll the same
+table without handing out a job twice. A finished job is deleted. A failing
+one is retried with exponential backoff until max_attempts, then kept as
+"failed" for inspection in the admin. Jobs left "running" by a crashed
+worker are requeued after JOBS_LOCK_TIMEOUT seconds, or failed if that was
+their last attempt, so tasks must be idempotent.
+
+With JOBS_EAGER (tests) enqueue() runs the task immediately instead.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name=None, max_attempts=None):
+    def decorator(func):
+        func.job_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        func.enqueue = lambda delay=0, **kwargs: enqueue(func, delay=delay, **kwargs)
+        _registry[func.job_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, delay=0, **kwargs):
+    """Queue `func(**kwargs)` to run `delay` seconds after commit at the earliest."""
+    if settings.JOBS_EAGER:
+        func(**kwargs)
+        return None
+    return Job.objects.create(
+        name=func.job_name,
+        payload=kwargs,
+        max_attempts=func.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts`, with jitter."""
+    delay = min(settings.JOBS_BACKOFF_MAX, settings.JOBS_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+def claim():
+    """Lock the next due job for this worker, or return None."""
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.Status.QUEUED,
+            run_at__lte=timezone.now(),
+        ).order_by('run_at', 'id').first()
+        if job is None:
+            return None
+        job.status = Job.Status.RUNNING
+        job.attempts += 1
+        job.locked_at = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'locked_at'])
+    return job
+
+
+def run(job):
+    func = _registry.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f'No task registered as {job.name}')
+        func(**job.payload)
+    except Exception:
+        logger.exception('Job %s failed (attempt %s of %s)', job, job.attempts, job.max_attempts)
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.Status.FAILED
+        else:
+            job.status = Job.Status.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+        job.locked_at = None
+        job.save(update_fields=['status', 'run_at', 'locked_at', 'last_error'])
+        return False
+    job.delete()
+    return True
+
+
+def run_next():
+    """Claim and run one job. Returns False if there was nothing to do."""
+    job = claim()
+    if job is None:
+        return False
+    run(job)
+    return True
+
+
+def requeue_stale():
+    """Put back jobs whose worker died while running them.
+
+    The crash counts as a failed attempt: a job that keeps killing its worker
+    (out of memory, say) is marked failed after max_attempts like any other.
+    Returns the number of jobs requeued.
+    """
+    now = timezone.now()
+    error = f'Worker stopped without finishing the job within JOBS_LOCK_TIMEOUT ({settings.JOBS_LOCK_TIMEOUT}s)'
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT),
+    )
+    with transaction.atomic():
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.Status.FAILED, locked_at=None, last_error=error
+        )
+        requeued = stale.update(status=Job.Status.QUEUED, locked_at=None, run_at=now, last_error=error)
+    if failed:
+        logger.error('%s stale job(s) failed after their last attempt', failed)
+    return requeued
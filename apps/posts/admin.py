@@ -1,19 +1,27 @@
 from django.contrib import admin
-from .models import Post, Like
+from django.contrib.postgres.search import SearchQuery
+from .models import Post, Like, SEARCH_CONFIG
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ('id', 'author', 'content_type', 'audience_type', 'likes_count', 'created_at')
     list_filter = ('content_type', 'audience_type', 'media_type', 'created_at')
-    search_fields = ('author__email', 'author__username', 'text_content')
+    # text_content is searched through the full-text index, see get_search_results
+    search_fields = ('author__email', 'author__username')
     raw_id_fields = ('author',)
     filter_horizontal = ('audience_groups',)
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('likes_count', 'created_at', 'updated_at')
 
-    def likes_count(self, obj):
-        return obj.likes.count()
-    likes_count.short_description = 'Likes'
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('search_vector')
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            query = SearchQuery(search_term, config=SEARCH_CONFIG, search_type='websearch')
+            results |= queryset.filter(search_vector=query)
+        return results, may_have_duplicates
 
 
 @admin.register(Like)
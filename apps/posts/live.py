@@ -0,0 +1,105 @@
+"""
+Live updates for GET /api/posts/stream/ (server-sent events).
+
+Events are published through pickme.pubsub with the fields Post.can_view
+needs, so each open stream decides what its viewer may see without a
+database query:
+    post - a post was created
+    likes - a post's likes_count changed
+    membership - group memberships of `user_ids` changed; their streams
+        reload their group ids
+
+Clients only receive ids and counts and fetch posts through the REST API.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from pickme import pubsub
+from apps.groups.membership import member_group_ids
+from .models import Post
+
+
+def _audience(post, group_ids=None):
+    if group_ids is None and post.audience_type == Post.AudienceType.GROUPS:
+        group_ids = post.audience_groups.values_list('id', flat=True)
+    return {
+        'author_id': post.author_id,
+        'audience_type': post.audience_type,
+        'group_ids': list(group_ids or []),
+    }
+
+
+def post_created(post, group_ids):
+    event = {
+        'type': 'post',
+        'id': post.pk,
+        'created_at': post.created_at.isoformat(),
+        **_audience(post, group_ids),
+    }
+    transaction.on_commit(lambda: pubsub.publish(event))
+
+
+def likes_changed(post):
+    event = {
+        'type': 'likes',
+        'id': post.pk,
+        'likes_count': post.likes_count,
+        **_audience(post),
+    }
+    transaction.on_commit(lambda: pubsub.publish(event))
+
+
+def membership_changed(user_ids):
+    pubsub.publish({'type': 'membership', 'user_ids': list(user_ids)})
+
+
+# What clients get of each event type
+CLIENT_FIELDS = {
+    'post': ('id', 'author_id', 'created_at'),
+    'likes': ('id', 'likes_count'),
+}
+
+
+class Viewer:
+    def __init__(self, user):
+        self.user_id = user.pk
+        self.user = user
+        self.group_ids = set()
+
+    async def load_groups(self):
+        self.group_ids = set(await sync_to_async(member_group_ids)(self.user))
+
+    def can_view(self, event):
+        """Post.can_view() on the fields of an event."""
+        if event['author_id'] == self.user_id:
+            return True
+        if event['audience_type'] == Post.AudienceType.EVERYONE:
+            return True
+        if event['audience_type'] == Post.AudienceType.GROUPS:
+            return not self.group_ids.isdisjoint(event['group_ids'])
+        return False
+
+
+def _format(event_type, data):
+    return f'event: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+async def stream(viewer):
+    """Server-sent events for `viewer`, with a comment line as heartbeat."""
+    async with pubsub.subscribe() as subscription:
+        # Subscribed before loading groups, so no change falls in between
+        await viewer.load_groups()
+        yield f'retry: {settings.LIVE_RETRY_MS}\n: connected\n\n'
+        while not subscription.overflowed:
+            event = await subscription.get(timeout=settings.LIVE_HEARTBEAT)
+            if event is None:
+                yield ': ping\n\n'
+            elif event['type'] == 'membership':
+                if viewer.user_id in event['user_ids']:
+                    await viewer.load_groups()
+            elif event['type'] in CLIENT_FIELDS and viewer.can_view(event):
+                fields = CLIENT_FIELDS[event['type']]
+                yield _format(event['type'], {name: event[name] for name in fields})
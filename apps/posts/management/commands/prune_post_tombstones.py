@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.posts.models import PostTombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete post tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of tombstones deleted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        expired = PostTombstone.objects.filter(created_at__lt=cutoff).order_by('created_at')
+
+        deleted = 0
+        # Sync tokens older than the cutoff are answered with a reset, so
+        # these rows are never read again
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            PostTombstone.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} post tombstone(s)')
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from apps.posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild materialized home timelines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Rebuild only this user id (can be repeated)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of users loaded per query'
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+
+        users = User.objects.order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+
+        rebuilt = 0
+        for user in users.iterator(chunk_size=options['chunk_size']):
+            timeline.rebuild_viewer(user)
+            rebuilt += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {rebuilt} timeline(s)')
+        )
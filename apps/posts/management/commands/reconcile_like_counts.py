@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.posts.models import Post, Like
+
+
+class Command(BaseCommand):
+    help = 'Fix drift between Post.likes_count and the likes table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of post ids checked per UPDATE'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        counts = Like.objects.filter(
+            post=OuterRef('pk')
+        ).order_by().values('post').annotate(total=Count('*')).values('total')
+        actual = Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+        last_id = Post.objects.aggregate(last=Max('id'))['last'] or 0
+        fixed = 0
+        # Walk primary key ranges so each UPDATE locks a bounded set of rows
+        for start in range(0, last_id + 1, chunk_size):
+            fixed += Post.objects.filter(
+                pk__gte=start,
+                pk__lt=start + chunk_size,
+            ).exclude(likes_count=actual).update(likes_count=actual, counters_updated_at=timezone.now())
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled likes_count on {fixed} post(s)')
+        )
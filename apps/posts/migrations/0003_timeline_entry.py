@@ -0,0 +1,47 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_add_like_model'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.post')),
+                ('viewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'timeline_entries',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['viewer', '-created_at'], name='timeline_viewer_created_idx')],
+                'unique_together': {('viewer', 'post')},
+            },
+        ),
+        # Backfill own non-public posts and group posts (hybrid mode layout).
+        # With TIMELINE_HYBRID_MODE=False run `manage.py rebuild_timelines`.
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO timeline_entries (viewer_id, post_id, created_at)
+                SELECT p.author_id, p.id, p.created_at
+                FROM posts p
+                WHERE p.audience_type <> 'everyone'
+                UNION
+                SELECT m.user_id, p.id, p.created_at
+                FROM posts p
+                JOIN posts_audience_groups pag ON pag.post_id = p.id
+                JOIN friend_groups_members m ON m.friendgroup_id = pag.friendgroup_id
+                WHERE p.audience_type = 'groups'
+                ON CONFLICT DO NOTHING
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
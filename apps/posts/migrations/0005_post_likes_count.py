@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE posts SET likes_count = counts.total
+                FROM (SELECT post_id, COUNT(*) AS total FROM likes GROUP BY post_id) AS counts
+                WHERE counts.post_id = posts.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,40 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0001_initial'),
+        ('posts', '0005_post_likes_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql=[
+                """
+                CREATE TRIGGER posts_search_vector_update
+                BEFORE INSERT OR UPDATE OF text_content ON posts
+                FOR EACH ROW EXECUTE FUNCTION
+                tsvector_update_trigger(search_vector, 'pg_catalog.russian', text_content)
+                """,
+                """
+                UPDATE posts
+                SET search_vector = to_tsvector('pg_catalog.russian', coalesce(text_content, ''))
+                """,
+            ],
+            reverse_sql='DROP TRIGGER IF EXISTS posts_search_vector_update ON posts',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='posts_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The posts indexes are built concurrently, posting and liking keep
+    # working meanwhile
+    atomic = False
+
+    dependencies = [
+        ('posts', '0007_post_media_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.BigIntegerField()),
+                ('reason', models.CharField(choices=[('deleted', 'Deleted'), ('audience', 'Audience changed')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'post_tombstones',
+                'indexes': [models.Index(fields=['created_at'], name='post_tombstones_created_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='counters_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(fields=['updated_at'], name='posts_updated_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(fields=['counters_updated_at'], name='posts_counters_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # timeline_entries is the largest table, its index is built concurrently
+    atomic = False
+
+    dependencies = [
+        ('posts', '0008_post_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='added_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='timelineentry',
+            index=models.Index(fields=['viewer', 'added_at'], name='timeline_viewer_added_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently, the feed keeps being served meanwhile; the old
+    # timeline index is dropped once its replacement exists
+    atomic = False
+
+    dependencies = [
+        ('posts', '0010_post_tombstone_viewer'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='timelineentry',
+            index=models.Index(fields=['viewer', '-created_at', '-post'], name='timeline_viewer_feed_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='timelineentry',
+            name='timeline_viewer_created_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('audience_type', 'everyone')), fields=['-created_at', '-id'], name='posts_public_created_id_idx'),
+        ),
+    ]
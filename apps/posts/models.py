@@ -1,13 +1,135 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, F, Max, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.functions import Greatest
 from django.conf import settings
+from django.utils import timezone
 import uuid
 
+from apps.groups.membership import member_group_ids
+from pickme.conditional import version_subquery
+
+
+# Text search configuration of Post.search_vector. The column is filled by a
+# database trigger (see migration 0006), keep both in sync when changing it.
+SEARCH_CONFIG = 'russian'
+
 
 def media_upload_path(instance, filename):
     ext = filename.split('.')[-1]
     return f'posts/{instance.author.id}/{uuid.uuid4()}.{ext}'
 
 
+class PostQuerySet(models.QuerySet):
+    def _visible_condition(self, viewer, author_id=None):
+        """Same rules as Post.can_view, as a single WHERE condition.
+
+        Group membership is an EXISTS subquery over the viewer's cached group
+        ids rather than a join, so the result never needs DISTINCT.
+        """
+        public = Q(audience_type=Post.AudienceType.EVERYONE)
+        if viewer is None or not viewer.is_authenticated:
+            return public
+
+        condition = Q(author_id=viewer.pk) | public
+        group_ids = member_group_ids(viewer, owner_id=author_id)
+        if group_ids:
+            shared = Exists(Post.audience_groups.through.objects.filter(
+                post_id=OuterRef('pk'),
+                friendgroup_id__in=group_ids,
+            ))
+            condition |= Q(audience_type=Post.AudienceType.GROUPS) & shared
+        return condition
+
+    def visible_to(self, viewer, author_id=None):
+        """Posts `viewer` is allowed to see.
+
+        Pass `author_id` to list one author's posts: only the viewer's groups
+        owned by that author are then considered.
+        """
+        if author_id is not None:
+            return self.filter(author_id=author_id).filter(
+                self._visible_condition(viewer, author_id)
+            )
+        return self.filter(self._visible_condition(viewer))
+
+    def with_visibility(self, viewer):
+        """Annotate `viewer_can_view` instead of filtering, to tell 403 from 404."""
+        return self.annotate(viewer_can_view=ExpressionWrapper(
+            self._visible_condition(viewer),
+            output_field=BooleanField(),
+        ))
+
+    def bulk_can_view(self, viewer, post_ids):
+        """Ids among `post_ids` that `viewer` can see, in one query."""
+        return set(
+            self.filter(pk__in=post_ids).visible_to(viewer).values_list('pk', flat=True)
+        )
+
+    def for_serializer(self, viewer, selection=None):
+        """Load everything PostSerializer reads in a fixed number of queries.
+
+        Adds the viewer-specific `is_liked` as an EXISTS annotation and
+        prefetches the liker preview into `liked_by_preview` with a single
+        windowed query for the whole page. With the request's FieldSelection
+        (pickme/fieldsets.py) only what the selected fields read is loaded.
+        """
+        def selected(name):
+            return selection is None or name in selection
+
+        queryset = self.defer('search_vector')
+        if selection is None or selection.expands('author'):
+            queryset = queryset.select_related('author')
+        if selected('audience_groups') or selected('audience_groups_detail'):
+            queryset = queryset.prefetch_related('audience_groups')
+        if selected('liked_by'):
+            preview = Like.objects.select_related('user').order_by('-created_at', '-id')
+            queryset = queryset.prefetch_related(Prefetch(
+                'likes',
+                queryset=preview[:settings.POSTS_LIKED_BY_PREVIEW_SIZE],
+                to_attr='liked_by_preview'
+            ))
+        if selected('is_liked'):
+            queryset = queryset.with_is_liked(viewer)
+        return queryset
+
+    def with_is_liked(self, viewer):
+        """Annotate whether `viewer` likes each post, as an EXISTS subquery."""
+        if viewer is not None and viewer.is_authenticated:
+            is_liked = Exists(Like.objects.filter(post=OuterRef('pk'), user_id=viewer.pk))
+        else:
+            is_liked = Value(False)
+        return self.annotate(is_liked=is_liked)
+
+    def versions(self, viewer):
+        """values_list() rows that change whenever a post's PostSerializer output does.
+
+        Edits move the post's updated_at, profile and group changes the
+        author's, previewed likers' or groups' updated_at; audience groups
+        coming and going change their count or newest id, likes and unlikes
+        the stored likes_count and counters_updated_at. Only the
+        POSTS_LIKED_BY_PREVIEW_SIZE likers liked_by renders are read, so the
+        cost does not grow with the likes. Used as HTTP validators
+        (pickme/conditional.py) without rendering the posts.
+        """
+        groups = Post.audience_groups.through.objects.filter(post_id=OuterRef('pk')).values('post_id')
+        preview = Like.objects.filter(post_id=OuterRef(OuterRef('pk'))).order_by(
+            '-created_at', '-id'
+        ).values('pk')[:settings.POSTS_LIKED_BY_PREVIEW_SIZE]
+        likers = Like.objects.filter(pk__in=preview).values('post_id').order_by().annotate(
+            version=Max('user__updated_at')
+        ).values('version')
+        return self.with_is_liked(viewer).annotate(
+            author_updated_at=F('author__updated_at'),
+            groups_version=version_subquery(groups, Count('pk'), Max('pk'), Max('friendgroup__updated_at')),
+            likers_version=Subquery(likers),
+        ).values_list(
+            'id', 'updated_at', 'likes_count', 'counters_updated_at', 'is_liked',
+            'author_updated_at', 'groups_version', 'likers_version',
+        )
+
+
 class Post(models.Model):
     class ContentType(models.TextChoices):
         TEXT = 'text', 'Text'
@@ -41,6 +163,9 @@ class Post(models.Model):
         choices=MediaType.choices,
         blank=True
     )
+    # Resized WebP variants of photos, filled by `manage.py process_media`;
+    # NULL until processed (see apps/uploads/images.py)
+    media_variants = models.JSONField(null=True, blank=True, editable=False)
     audience_type = models.CharField(
         max_length=20,
         choices=AudienceType.choices,
@@ -51,19 +176,53 @@ class Post(models.Model):
         related_name='posts',
         blank=True
     )
+    # Denormalized COUNT of likes, maintained by like()/unlike() and
+    # corrected by `manage.py reconcile_like_counts`
+    likes_count = models.PositiveIntegerField(default=0)
+    # When likes_count last changed, for /api/sync/ (likes do not move
+    # updated_at); NULL until the first like
+    counters_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Maintained by the posts_search_vector_update trigger
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         db_table = 'posts'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of feeds and profile pages
+            models.Index(fields=['-created_at', '-id'], name='posts_created_id_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='posts_author_created_id_idx'),
+            # Public posts merged into hybrid mode feeds
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=Q(audience_type='everyone'),
+                name='posts_public_created_id_idx'
+            ),
+            # Changes since a sync token (apps/posts/sync.py)
+            models.Index(fields=['updated_at'], name='posts_updated_at_idx'),
+            models.Index(fields=['counters_updated_at'], name='posts_counters_updated_at_idx'),
+            GinIndex(fields=['search_vector'], name='posts_search_vector_idx'),
+            # Photos still waiting for process_media
+            models.Index(
+                fields=['id'],
+                condition=Q(media_type='photo', media_variants__isnull=True),
+                name='posts_media_pending_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Post by {self.author.username} at {self.created_at}"
 
     def can_view(self, user):
-        """Check if user can view this post"""
-        if self.author == user:
+        """Check if user can view this post.
+
+        For many posts use Post.objects.visible_to() or bulk_can_view().
+        """
+        if self.author_id == user.pk:
             return True
 
         if self.audience_type == self.AudienceType.ONLY_ME:
@@ -73,10 +232,40 @@ class Post(models.Model):
             return True
 
         if self.audience_type == self.AudienceType.GROUPS:
-            return self.audience_groups.filter(members=user).exists()
+            group_ids = member_group_ids(user, owner_id=self.author_id)
+            return bool(group_ids) and Post.audience_groups.through.objects.filter(
+                post_id=self.pk,
+                friendgroup_id__in=group_ids,
+            ).exists()
 
         return False
 
+    def like(self, user):
+        """Like the post. Returns False if the user had already liked it."""
+        with transaction.atomic():
+            _, created = Like.objects.get_or_create(user_id=user.pk, post=self)
+            if created:
+                Post.objects.filter(pk=self.pk).update(
+                    likes_count=F('likes_count') + 1,
+                    counters_updated_at=timezone.now(),
+                )
+        if created:
+            self.refresh_from_db(fields=['likes_count', 'counters_updated_at'])
+        return created
+
+    def unlike(self, user):
+        """Remove the user's like. Returns False if there was none."""
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(user_id=user.pk, post=self).delete()
+            if deleted:
+                Post.objects.filter(pk=self.pk).update(
+                    likes_count=Greatest(F('likes_count') - 1, 0),
+                    counters_updated_at=timezone.now(),
+                )
+        if deleted:
+            self.refresh_from_db(fields=['likes_count', 'counters_updated_at'])
+        return bool(deleted)
+
 
 class Like(models.Model):
     user = models.ForeignKey(
@@ -95,6 +284,78 @@ class Like(models.Model):
         db_table = 'likes'
         unique_together = ('user', 'post')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['post', '-created_at', '-id'], name='likes_post_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} liked post {self.post.id}"
+
+
+class TimelineEntry(models.Model):
+    """Materialized home feed row: `post` is visible to `viewer`."""
+    viewer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    # Copy of post.created_at so a viewer's feed is a single index range scan
+    created_at = models.DateTimeField()
+    # When the row was written, which can be long after the post was created
+    # (fan-out job, group backfill); /api/sync/ reads it. Null for rows
+    # written before it existed
+    added_at = models.DateTimeField(null=True, editable=False)
+
+    class Meta:
+        db_table = 'timeline_entries'
+        unique_together = ('viewer', 'post')
+        ordering = ['-created_at']
+        indexes = [
+            # Feed pages (FeedPagination): a range scan in feed order
+            models.Index(fields=['viewer', '-created_at', '-post'], name='timeline_viewer_feed_idx'),
+            models.Index(fields=['viewer', 'added_at'], name='timeline_viewer_added_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in timeline of user {self.viewer_id}"
+
+
+class PostTombstone(models.Model):
+    """A post deleted or moved out of `viewer`'s sight, reported by /api/sync/.
+
+    Public posts get one row for everyone (no viewer), other posts one row
+    per viewer whose timeline entry was removed, so nobody learns the ids of
+    posts they could not see. Kept for SYNC_TOMBSTONE_RETENTION_DAYS, see
+    `manage.py prune_post_tombstones`.
+    """
+    class Reason(models.TextChoices):
+        DELETED = 'deleted', 'Deleted'
+        AUDIENCE = 'audience', 'Audience changed'
+
+    # Not a foreign key: the post is usually gone
+    post_id = models.BigIntegerField()
+    viewer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='+'
+    )
+    reason = models.CharField(max_length=10, choices=Reason.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'post_tombstones'
+        indexes = [
+            models.Index(fields=['created_at'], name='post_tombstones_created_idx'),
+            models.Index(fields=['viewer', 'created_at'], name='post_tombstones_viewer_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} {self.reason}"
@@ -1,7 +1,25 @@
+import hashlib
+from collections import defaultdict
+from operator import itemgetter
+
 from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from pickme.fieldsets import FieldSelectionMixin, select_fields
 from .models import Post, Like
-from apps.users.serializers import UserSearchSerializer
+from . import live, tasks, timeline
+from apps.users.serializers import UserSearchSerializer, user_search_row
 from apps.groups.models import FriendGroup
+from apps.uploads.models import UploadIntent
+from apps.uploads.images import file_url, variant_urls
+from apps.uploads.serializers import VariantsField
+from apps.uploads.tasks import render_image_variants
 
 
 class PostCreateSerializer(serializers.ModelSerializer):
@@ -10,11 +28,20 @@ class PostCreateSerializer(serializers.ModelSerializer):
         queryset=FriendGroup.objects.all(),
         required=False
     )
+    # Finalized UploadIntent to use instead of uploading media_file here
+    media_upload = serializers.PrimaryKeyRelatedField(
+        queryset=UploadIntent.objects.filter(
+            purpose=UploadIntent.Purpose.POST_MEDIA,
+            status=UploadIntent.Status.UPLOADED
+        ),
+        required=False,
+        write_only=True
+    )
 
     class Meta:
         model = Post
         fields = (
-            'id', 'content_type', 'text_content', 'media_file',
+            'id', 'content_type', 'text_content', 'media_file', 'media_upload',
             'media_url', 'media_type', 'audience_type', 'audience_groups'
         )
 
@@ -22,7 +49,7 @@ class PostCreateSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             raise serializers.ValidationError('Authentication required')
-        user_groups = FriendGroup.objects.filter(owner=request.user)
+        user_groups = FriendGroup.objects.filter(owner_id=request.user.pk)
         for group in value:
             if group not in user_groups:
                 raise serializers.ValidationError(
@@ -30,10 +57,15 @@ class PostCreateSerializer(serializers.ModelSerializer):
                 )
         return value
 
+    def validate_media_upload(self, value):
+        if value.owner_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('Upload does not belong to you')
+        return value
+
     def validate(self, attrs):
         content_type = attrs.get('content_type')
         text_content = attrs.get('text_content')
-        media_file = attrs.get('media_file')
+        media_file = attrs.get('media_file') or attrs.get('media_upload')
         media_url = attrs.get('media_url')
         media_type = attrs.get('media_type')
         audience_type = attrs.get('audience_type')
@@ -45,6 +77,7 @@ class PostCreateSerializer(serializers.ModelSerializer):
                     'text_content': 'Text content is required for text posts'
                 })
             attrs['media_file'] = None
+            attrs['media_upload'] = None
             attrs['media_url'] = ''
             attrs['media_type'] = ''
 
@@ -72,12 +105,36 @@ class PostCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         audience_groups = validated_data.pop('audience_groups', [])
+        media_upload = validated_data.pop('media_upload', None)
+        if media_upload is not None:
+            validated_data['media_file'] = media_upload.key
         validated_data['author'] = self.context['request'].user
-        post = Post.objects.create(**validated_data)
-        
-        if audience_groups:
-            post.audience_groups.set(audience_groups)
-        
+        with transaction.atomic():
+            # Claimed only if still uploaded: of two posts racing for one
+            # upload (or a finalize attaching it elsewhere) a single one wins
+            if media_upload is not None:
+                claimed = UploadIntent.objects.filter(
+                    pk=media_upload.pk,
+                    status=UploadIntent.Status.UPLOADED
+                ).update(status=UploadIntent.Status.ATTACHED)
+                if not claimed:
+                    raise serializers.ValidationError({
+                        'media_upload': 'Upload is already attached'
+                    })
+
+            post = Post.objects.create(**validated_data)
+
+            if audience_groups:
+                post.audience_groups.set(audience_groups)
+
+            # Followers' timelines and image variants are filled in by the job
+            # workers after the post is committed
+            timeline.write_author_entry(post)
+            if timeline.needs_fan_out(post):
+                tasks.fan_out_post.enqueue(post_id=post.pk)
+            if post.media_type == Post.MediaType.PHOTO and post.media_file:
+                render_image_variants.enqueue(model='posts.post', pk=post.pk)
+            live.post_created(post, [group.pk for group in audience_groups])
         return post
 
 
@@ -96,7 +153,7 @@ class PostUpdateSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             raise serializers.ValidationError('Authentication required')
-        user_groups = FriendGroup.objects.filter(owner=request.user)
+        user_groups = FriendGroup.objects.filter(owner_id=request.user.pk)
         for group in value:
             if group not in user_groups:
                 raise serializers.ValidationError(
@@ -117,16 +174,38 @@ class PostUpdateSerializer(serializers.ModelSerializer):
 
         return attrs
 
+    @staticmethod
+    def _audience(post, group_ids=None):
+        """What decides who sees `post`: its audience type and, for groups, which."""
+        if post.audience_type != Post.AudienceType.GROUPS:
+            return post.audience_type, None
+        if group_ids is None:
+            group_ids = post.audience_groups.values_list('pk', flat=True)
+        return post.audience_type, frozenset(group_ids)
+
     def update(self, instance, validated_data):
         audience_groups = validated_data.pop('audience_groups', None)
-        
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        if audience_groups is not None:
-            instance.audience_groups.set(audience_groups)
-        
+        audience_changing = 'audience_type' in validated_data or audience_groups is not None
+        if audience_changing:
+            old_audience = self._audience(instance)
+
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            if audience_groups is not None:
+                instance.audience_groups.set(audience_groups)
+
+            # Resending the same audience must not move timeline rows or
+            # leave tombstones
+            if audience_changing:
+                group_ids = None if audience_groups is None else [group.pk for group in audience_groups]
+                if self._audience(instance, group_ids) != old_audience:
+                    timeline.refresh_post(
+                        instance,
+                        was_public=old_audience[0] == Post.AudienceType.EVERYONE
+                    )
         return instance
 
 
@@ -141,11 +220,40 @@ class LikeUserSerializer(serializers.ModelSerializer):
         return data
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        posts = list(iterable)
+        # One cache round trip for the whole page instead of one per post
+        self.child.load_shared(posts)
+        return [self.child.to_representation(post) for post in posts]
+
+
+class PostSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    """
+    The viewer-independent part of a post (author, groups, media, text) is
+    cached per post version; only `viewer_fields` are rendered per request.
+    The version is derived from the updated_at of the post, its author and its
+    audience groups, so editing the post, changing the author's profile or
+    avatar, or renaming a group makes the next render miss the cache.
+
+    Requests selecting fields (see pickme/fieldsets.py) are rendered without
+    the cache: the cached part holds every field, and the queryset of such a
+    request may not have loaded what it needs.
+
+    The key also holds `repr_version` and the cached field names, so adding
+    or removing a field invalidates it by itself; bump `repr_version` when
+    the rendering of an existing field changes.
+    """
+    viewer_fields = ('is_own', 'likes_count', 'is_liked', 'liked_by')
+    repr_version = 1
+    expandable_fields = ('author',)
+
     author = UserSearchSerializer(read_only=True)
+    media_variants = VariantsField()
     audience_groups_detail = serializers.SerializerMethodField()
     is_own = serializers.SerializerMethodField()
-    likes_count = serializers.SerializerMethodField()
+    likes_count = serializers.IntegerField(read_only=True)
     is_liked = serializers.SerializerMethodField()
     liked_by = serializers.SerializerMethodField()
 
@@ -153,10 +261,75 @@ class PostSerializer(serializers.ModelSerializer):
         model = Post
         fields = (
             'id', 'author', 'content_type', 'text_content', 'media_file',
-            'media_url', 'media_type', 'audience_type', 'audience_groups',
+            'media_variants', 'media_url', 'media_type', 'audience_type', 'audience_groups',
             'audience_groups_detail', 'is_own', 'likes_count', 'is_liked',
             'liked_by', 'created_at', 'updated_at'
         )
+        list_serializer_class = PostListSerializer
+
+    def to_representation(self, instance):
+        if not self.selection.is_default:
+            return self._represent(instance, lambda name: True)
+
+        shared = getattr(self, '_shared', {}).pop(instance.pk, None)
+        if shared is None:
+            self.load_shared([instance])
+            shared = self._shared.pop(instance.pk)
+
+        data = dict(shared)
+        data.update(self._represent(instance, lambda name: name in self.viewer_fields))
+        # Keep the declared field order
+        return {name: data[name] for name in self.fields if name in data}
+
+    def load_shared(self, posts):
+        """Fetch (or render and store) the cached part of each post."""
+        if not self.selection.is_default:
+            return
+        keys = {post.pk: self._shared_cache_key(post) for post in posts}
+        cached = cache.get_many(list(keys.values()))
+
+        self._shared = {}
+        missing = {}
+        for post in posts:
+            key = keys[post.pk]
+            if key not in cached:
+                cached[key] = missing[key] = self._represent(
+                    post, lambda name: name not in self.viewer_fields
+                )
+            self._shared[post.pk] = cached[key]
+        if missing:
+            cache.set_many(missing, settings.POST_REPR_CACHE_TIMEOUT)
+
+    def _shared_cache_key(self, post):
+        parts = [
+            ','.join(name for name in self.Meta.fields if name not in self.viewer_fields),
+            post.updated_at.isoformat(),
+            post.author.updated_at.isoformat(),
+        ]
+        parts.extend(f'{g.pk}@{g.updated_at.isoformat()}' for g in post.audience_groups.all())
+        # Media URLs are absolute, so they depend on the requested host
+        request = self.context.get('request')
+        if request is not None:
+            parts.append(request.build_absolute_uri('/'))
+        digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+        return f'post-repr:v{self.repr_version}:{post.pk}:{digest}'
+
+    def _represent(self, instance, include):
+        # Serializer.to_representation() restricted to some of the fields
+        ret = {}
+        for field in self._readable_fields:
+            if not include(field.field_name):
+                continue
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            if check_for_none is None:
+                ret[field.field_name] = None
+            else:
+                ret[field.field_name] = field.to_representation(attribute)
+        return ret
 
     def get_audience_groups_detail(self, obj):
         return [{'id': g.id, 'name': g.name} for g in obj.audience_groups.all()]
@@ -164,18 +337,129 @@ class PostSerializer(serializers.ModelSerializer):
     def get_is_own(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.author == request.user
+            return obj.author_id == request.user.pk
         return False
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+    # The fallbacks below only run for posts not loaded through
+    # Post.objects.for_serializer(), e.g. a freshly created post
 
     def get_is_liked(self, obj):
+        if hasattr(obj, 'is_liked'):
+            return obj.is_liked
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
+            return obj.likes.filter(user_id=request.user.pk).exists()
         return False
 
     def get_liked_by(self, obj):
-        likes = obj.likes.select_related('user').order_by('-created_at')
+        if hasattr(obj, 'liked_by_preview'):
+            likes = obj.liked_by_preview
+        else:
+            likes = obj.likes.select_related('user').order_by(
+                '-created_at', '-id'
+            )[:settings.POSTS_LIKED_BY_PREVIEW_SIZE]
         return [UserSearchSerializer(like.user).data for like in likes]
+
+
+class PostRowListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return self.child.represent_rows(list(data))
+
+
+class PostRowSerializer(PostSerializer):
+    """
+    Read-only PostSerializer for rows of rows(). Builds the same dicts
+    directly, without field objects, model instances or the representation
+    cache; audience groups and the liker preview are fetched for the whole
+    page with one query each.
+    """
+    # Columns behind each field; other fields are the column of that name
+    row_columns = {
+        'author': tuple(f'author__{name}' for name in UserSearchSerializer.Meta.fields),
+        'audience_groups': (),
+        'audience_groups_detail': (),
+        'is_own': ('author_id',),
+        'liked_by': (),
+    }
+
+    class Meta(PostSerializer.Meta):
+        list_serializer_class = PostRowListSerializer
+
+    @classmethod
+    def rows(cls, queryset, request):
+        """`queryset` as .values() rows with what the request's fields need."""
+        selection = select_fields(request, cls)
+        # id and created_at are the keyset pagination position
+        columns = {'id', 'created_at'}
+        for name in selection.fields:
+            if name == 'author' and not selection.expands(name):
+                columns.add('author_id')
+            else:
+                columns.update(cls.row_columns.get(name, (name,)))
+        if 'is_liked' in selection:
+            queryset = queryset.with_is_liked(request.user)
+        return queryset.values(*columns)
+
+    def to_representation(self, row):
+        return self.represent_rows([row])[0]
+
+    def represent_rows(self, rows):
+        selection = self.selection
+        request = self.context.get('request')
+        viewer_id = request.user.pk if request and request.user.is_authenticated else None
+        post_ids = [row['id'] for row in rows]
+        groups = liked_by = {}
+        if 'audience_groups' in selection or 'audience_groups_detail' in selection:
+            groups = self._audience_groups(post_ids)
+        if 'liked_by' in selection:
+            liked_by = self._liked_by(post_ids)
+        to_datetime = serializers.DateTimeField().to_representation
+
+        def media_variants(row):
+            variants = row['media_variants']
+            return None if variants is None else variant_urls(variants, request)
+
+        render = {
+            'author': (
+                (lambda row: user_search_row(row, request, 'author__'))
+                if selection.expands('author') else itemgetter('author_id')
+            ),
+            'media_file': lambda row: file_url(row['media_file'], request),
+            'media_variants': media_variants,
+            'audience_groups': lambda row: [group['id'] for group in groups.get(row['id'], [])],
+            'audience_groups_detail': lambda row: groups.get(row['id'], []),
+            'is_own': lambda row: viewer_id is not None and row['author_id'] == viewer_id,
+            'liked_by': lambda row: liked_by.get(row['id'], []),
+            'created_at': lambda row: to_datetime(row['created_at']),
+            'updated_at': lambda row: to_datetime(row['updated_at']),
+        }
+        render = [(name, render.get(name) or itemgetter(name)) for name in selection.fields]
+        return [{name: value(row) for name, value in render} for row in rows]
+
+    def _audience_groups(self, post_ids):
+        groups = defaultdict(list)
+        if post_ids:
+            # In FriendGroup.Meta.ordering, like the prefetch in for_serializer()
+            rows = Post.audience_groups.through.objects.filter(
+                post_id__in=post_ids
+            ).order_by('friendgroup__name').values_list('post_id', 'friendgroup_id', 'friendgroup__name')
+            for post_id, group_id, name in rows:
+                groups[post_id].append({'id': group_id, 'name': name})
+        return groups
+
+    def _liked_by(self, post_ids):
+        liked_by = defaultdict(list)
+        if post_ids:
+            rows = Like.objects.filter(post_id__in=post_ids).annotate(rank=Window(
+                RowNumber(),
+                partition_by=F('post_id'),
+                order_by=(F('created_at').desc(), F('id').desc()),
+            )).filter(
+                rank__lte=settings.POSTS_LIKED_BY_PREVIEW_SIZE
+            ).order_by('post_id', 'rank').values(
+                'post_id', *(f'user__{name}' for name in UserSearchSerializer.Meta.fields)
+            )
+            for row in rows:
+                # Relative URLs, as PostSerializer.get_liked_by() renders them
+                liked_by[row['post_id']].append(user_search_row(row, prefix='user__'))
+        return liked_by
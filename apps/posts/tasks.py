@@ -0,0 +1,11 @@
+from apps.jobs.queue import task
+from .models import Post
+from . import timeline
+
+
+@task()
+def fan_out_post(post_id):
+    """Write a post to the timelines of everyone in its audience."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        timeline.fan_out_post(post)
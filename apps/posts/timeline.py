@@ -0,0 +1,220 @@
+"""
+Fan-out-on-write home timeline.
+
+Every post is written to the timeline of each user allowed to see it, so
+a feed page is a range scan over `timeline_entries` for one viewer, on
+(viewer, created_at, post) where created_at is a copy of the post's
+(FeedPagination in views.py).
+
+In hybrid mode (TIMELINE_HYBRID_MODE, on by default) posts with audience
+"everyone" are not fanned out: they are merged into the feed at read time
+from a second range scan over the public posts' index on the same key, so a
+post from a popular author never writes one row per user.
+
+New posts reach the author's timeline in the request and everyone else's
+through the fan_out_post job (tasks.py). Removals (audience changes, leaving
+or deleting a group) stay in the request: those are access changes and must
+not wait for a worker.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import Post, PostTombstone, TimelineEntry
+
+User = get_user_model()
+
+PostAudienceGroup = Post.audience_groups.through
+
+
+def hybrid_mode():
+    return getattr(settings, 'TIMELINE_HYBRID_MODE', True)
+
+
+def _batch_size():
+    return getattr(settings, 'TIMELINE_FANOUT_BATCH_SIZE', 1000)
+
+
+def _recipient_ids(post):
+    """Ids of users whose timeline should contain the post (author included)."""
+    if post.audience_type == Post.AudienceType.EVERYONE and not hybrid_mode():
+        return User.objects.values_list('id', flat=True).iterator(chunk_size=_batch_size())
+
+    recipients = {post.author_id}
+    if post.audience_type == Post.AudienceType.GROUPS:
+        recipients.update(
+            User.objects.filter(member_of_groups__posts=post).values_list('id', flat=True)
+        )
+    return recipients
+
+
+def _insert(entries):
+    """Bulk insert an iterable of entries in batches, skipping existing rows."""
+    added_at = timezone.now()
+    batch = []
+    for entry in entries:
+        entry.added_at = added_at
+        batch.append(entry)
+        if len(batch) >= _batch_size():
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _write(viewer_ids, post):
+    _insert(
+        TimelineEntry(viewer_id=viewer_id, post=post, created_at=post.created_at)
+        for viewer_id in viewer_ids
+    )
+
+
+def _bury(entries, reason):
+    """Delete `entries`, leaving each viewer a tombstone for /api/sync/."""
+    rows = list(entries.values_list('pk', 'viewer_id', 'post_id'))
+    size = _batch_size()
+    for start in range(0, len(rows), size):
+        batch = rows[start:start + size]
+        TimelineEntry.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+        PostTombstone.objects.bulk_create(
+            PostTombstone(post_id=post_id, viewer_id=viewer_id, reason=reason)
+            for _, viewer_id, post_id in batch
+        )
+
+
+def _stale(entries):
+    """Narrow `entries` down to those whose post the viewer can no longer see."""
+    still_member = PostAudienceGroup.objects.filter(
+        post_id=OuterRef('post_id'),
+        friendgroup__members=OuterRef('viewer_id'),
+    )
+    return entries.filter(
+        post__audience_type=Post.AudienceType.GROUPS
+    ).exclude(
+        post__author_id=F('viewer_id')
+    ).exclude(Exists(still_member))
+
+
+def fan_out_post(post):
+    """Write a newly created post to its recipients' timelines."""
+    _write(_recipient_ids(post), post)
+
+
+def write_author_entry(post):
+    """Put a new post on its author's own timeline."""
+    _write([post.author_id], post)
+
+
+def needs_fan_out(post):
+    """Whether anyone besides the author gets a timeline row for the post."""
+    if post.audience_type == Post.AudienceType.EVERYONE:
+        return not hybrid_mode()
+    return post.audience_type == Post.AudienceType.GROUPS
+
+
+def refresh_post(post, was_public=False):
+    """Re-sync a post's timeline rows after its audience changed.
+
+    `was_public`: the audience used to be "everyone".
+    """
+    if post.audience_type == Post.AudienceType.EVERYONE and not hybrid_mode():
+        _write(_recipient_ids(post), post)
+        return
+
+    recipients = _recipient_ids(post)
+    removed = TimelineEntry.objects.filter(post=post).exclude(viewer_id__in=recipients)
+    if post.audience_type == Post.AudienceType.EVERYONE:
+        # Public in hybrid mode: the rows are redundant, nobody loses the post
+        removed.delete()
+    elif was_public:
+        # Anyone may have it: one tombstone for all, viewers who still see
+        # the post get it as an edit
+        removed.delete()
+        PostTombstone.objects.create(post_id=post.pk, reason=PostTombstone.Reason.AUDIENCE)
+    else:
+        _bury(removed, PostTombstone.Reason.AUDIENCE)
+    _write(recipients, post)
+
+
+def bury_post(post):
+    """Leave /api/sync/ tombstones for a post about to be deleted."""
+    if post.audience_type == Post.AudienceType.EVERYONE:
+        PostTombstone.objects.create(post_id=post.pk, reason=PostTombstone.Reason.DELETED)
+    else:
+        _bury(TimelineEntry.objects.filter(post=post), PostTombstone.Reason.DELETED)
+
+
+def add_member(group, user):
+    """Backfill group posts into the timeline of a user just added to `group`."""
+    posts = Post.objects.filter(
+        audience_type=Post.AudienceType.GROUPS,
+        audience_groups=group,
+    ).values_list('id', 'created_at')
+    _insert(
+        TimelineEntry(viewer=user, post_id=pk, created_at=created_at)
+        for pk, created_at in posts.iterator(chunk_size=_batch_size())
+    )
+
+
+def remove_member(group, user):
+    """Drop group posts the user lost access to after leaving `group`."""
+    _bury(
+        _stale(TimelineEntry.objects.filter(viewer=user, post__audience_groups=group)),
+        PostTombstone.Reason.AUDIENCE
+    )
+
+
+def prune_entries(viewer_ids, post_ids):
+    """Drop entries among `viewer_ids` x `post_ids` that are no longer visible.
+
+    Used when a group is deleted: collect its members and posts first, delete
+    the group, then prune.
+    """
+    _bury(
+        _stale(TimelineEntry.objects.filter(viewer_id__in=viewer_ids, post_id__in=post_ids)),
+        PostTombstone.Reason.AUDIENCE
+    )
+
+
+def rebuild_viewer(user):
+    """Recompute one user's timeline from scratch."""
+    visible = Q(author=user) | Q(
+        audience_type=Post.AudienceType.GROUPS,
+        audience_groups__members=user,
+    )
+    if not hybrid_mode():
+        visible |= Q(audience_type=Post.AudienceType.EVERYONE)
+
+    # Readers never see the timeline emptied
+    with transaction.atomic():
+        TimelineEntry.objects.filter(viewer=user).delete()
+        posts = Post.objects.filter(visible).distinct().values_list('id', 'created_at')
+        _insert(
+            TimelineEntry(viewer=user, post_id=pk, created_at=created_at)
+            for pk, created_at in posts.iterator(chunk_size=_batch_size())
+        )
+
+
+def seed_viewer(user):
+    """Give a newly registered user the public posts they can already see.
+
+    Nothing to do in hybrid mode: a new user has no own or group posts yet.
+    """
+    if not hybrid_mode():
+        rebuild_viewer(user)
+
+
+def feed_queryset(user):
+    """Posts in the user's home feed, newest first.
+
+    Which posts are visible; feed pages are read by FeedPagination.
+    """
+    if hybrid_mode():
+        return Post.objects.filter(
+            Q(audience_type=Post.AudienceType.EVERYONE) |
+            Q(pk__in=TimelineEntry.objects.filter(viewer_id=user.pk).values('post_id'))
+        )
+    # (viewer, post) is unique, so the join cannot produce duplicates
+    return Post.objects.filter(timeline_entries__viewer_id=user.pk)
@@ -1,9 +1,22 @@
 from django.urls import path
-from .views import PostListCreateView, PostDetailView, UserPostsView, PostLikeView
+from .views import (
+    PostListCreateView,
+    PostDetailView,
+    PostBatchView,
+    UserPostsView,
+    PostLikeView,
+    PostLikersView,
+    PostSearchView,
+    PostStreamView,
+)
 
 urlpatterns = [
     path('', PostListCreateView.as_view(), name='post-list-create'),
+    path('search/', PostSearchView.as_view(), name='post-search'),
+    path('batch/', PostBatchView.as_view(), name='post-batch'),
+    path('stream/', PostStreamView.as_view(), name='post-stream'),
     path('<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     path('<int:pk>/like/', PostLikeView.as_view(), name='post-like'),
+    path('<int:pk>/likes/', PostLikersView.as_view(), name='post-likers'),
     path('user/<int:user_id>/', UserPostsView.as_view(), name='user-posts'),
 ]
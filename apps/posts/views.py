@@ -1,54 +1,104 @@
-from rest_framework import generics, status, permissions
+from rest_framework import generics, status, permissions, serializers
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.contrib.auth import get_user_model
-from django.db.models import Q, Count
+from rest_framework.exceptions import NotFound, PermissionDenied
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view, inline_serializer
 
-from .models import Post, Like
-from .serializers import PostSerializer, PostCreateSerializer, PostUpdateSerializer
-from apps.users.serializers import UserSearchSerializer
+from pickme.async_views import AsyncViewMixin, aserialize
+from pickme.batch import BatchView, batch_schema
+from pickme.conditional import ConditionalGetMixin
+from pickme.db_router import ReplicaReadMixin
+from pickme.fieldsets import FIELDSET_PARAMETERS, select_fields
+from pickme.pagination import KeysetPagination
 
-User = get_user_model()
+from .models import Post, Like, TimelineEntry, SEARCH_CONFIG
+from . import live, sync, timeline
+from .serializers import (
+    PostSerializer,
+    PostRowSerializer,
+    PostCreateSerializer,
+    PostUpdateSerializer,
+    LikeUserSerializer,
+)
 
 
 class IsPostAuthor(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.author == request.user
+        return obj.author_id == request.user.pk
 
 
-class PostListCreateView(generics.ListCreateAPIView):
+class FeedPagination(KeysetPagination):
+    """Home feed pages read off the viewer's timeline (see timeline.py).
+
+    The page is among the first rows after the cursor of the viewer's
+    timeline entries and, in hybrid mode, of the public posts: two index
+    range scans whose ids are merged, the posts themselves are loaded by id.
+    """
+
+    def seek(self, queryset, ordering, position, limit):
+        # Entries carry a copy of the post's created_at, the id is post_id
+        entry_ordering = tuple(field.replace('id', 'post_id') if field.lstrip('-') == 'id' else field for field in ordering)
+        entries = TimelineEntry.objects.filter(viewer_id=self.request.user.pk).values('post_id')
+        ids = super().seek(entries, entry_ordering, position, limit)
+        if timeline.hybrid_mode():
+            public = Post.objects.filter(audience_type=Post.AudienceType.EVERYONE).values('id')
+            ids = ids.union(super().seek(public, ordering, position, limit), all=True)
+        return super().seek(queryset.filter(pk__in=ids), ordering, position, limit)
+
+
+@extend_schema_view(get=extend_schema(responses=PostSerializer, parameters=FIELDSET_PARAMETERS))
+class PostListCreateView(ConditionalGetMixin, ReplicaReadMixin, AsyncViewMixin, generics.ListCreateAPIView):
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = FeedPagination
+
+    def get_validators(self):
+        # The versions of the rows the page query would return, the extra
+        # row (is there a next page) included
+        user = self.request.user
+        rows = self.paginator.page_queryset(timeline.feed_queryset(user).versions(user), self.request)
+        return list(rows), None
+
+    async def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(await aserialize(serializer))
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return PostCreateSerializer
-        return PostSerializer
+        return PostRowSerializer
 
     def get_queryset(self):
-        user = self.request.user
-        
-        # Get all groups where user is a member
-        user_groups = user.member_of_groups.all()
-        
-        # Posts visible to user:
-        # 1. Own posts
-        # 2. Posts with audience_type='everyone'
-        # 3. Posts with audience_type='groups' where user is in one of the groups
-        queryset = Post.objects.filter(
-            Q(author=user) |  # Own posts
-            Q(audience_type=Post.AudienceType.EVERYONE) |  # Public posts
-            Q(
-                audience_type=Post.AudienceType.GROUPS,
-                audience_groups__in=user_groups
-            )  # Posts shared with user's groups
-        ).distinct().select_related('author').prefetch_related('audience_groups')
-        
-        return queryset
-
-
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
+        # Posts visible to the user (own, public and shared with the user's
+        # groups) are materialized in the user's timeline, see timeline.py
+        return PostRowSerializer.rows(timeline.feed_queryset(self.request.user), self.request)
+
+
+@extend_schema_view(get=extend_schema(parameters=FIELDSET_PARAMETERS))
+class PostDetailView(ConditionalGetMixin, AsyncViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = (permissions.IsAuthenticated,)
-    queryset = Post.objects.all()
+
+    def get_validators(self):
+        user = self.request.user
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        version = Post.objects.visible_to(user).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).versions(user).first()
+        # Missing and invisible posts are left to the handler
+        return None if version is None else (version, None)
+
+    def get_queryset(self):
+        user = self.request.user
+        selection = select_fields(self.request, PostSerializer)
+        return Post.objects.for_serializer(user, selection).with_visibility(user)
 
     def get_serializer_class(self):
         if self.request.method in ('PUT', 'PATCH'):
@@ -56,19 +106,29 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
         return PostSerializer
 
     def get_object(self):
-        obj = super().get_object()
-        user = self.request.user
-        
-        # Check view permission
-        if not obj.can_view(user):
-            from rest_framework.exceptions import PermissionDenied
+        return self.check_can_view(super().get_object())
+
+    def check_can_view(self, obj):
+        if not obj.viewer_can_view:
             raise PermissionDenied("You don't have permission to view this post")
-        
         return obj
 
+    async def get(self, request, *args, **kwargs):
+        # The visibility condition looks up the viewer's (cached) groups
+        queryset = await sync_to_async(self.get_queryset)()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = await self.filter_queryset(queryset).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).afirst()
+        if obj is None:
+            raise Http404(f'No {Post._meta.object_name} matches the given query.')
+        self.check_object_permissions(request, obj)
+        self.check_can_view(obj)
+        return Response(await aserialize(self.get_serializer(obj)))
+
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
-        if instance.author != request.user:
+        if instance.author_id != request.user.pk:
             return Response(
                 {'detail': 'You can only edit your own posts'},
                 status=status.HTTP_403_FORBIDDEN
@@ -82,94 +142,184 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        if instance.author != request.user:
+        if instance.author_id != request.user.pk:
             return Response(
                 {'detail': 'You can only delete your own posts'},
                 status=status.HTTP_403_FORBIDDEN
             )
         return super().destroy(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            timeline.bury_post(instance)
+            instance.delete()
 
-class UserPostsView(generics.ListAPIView):
+
+@extend_schema_view(get=extend_schema(responses=PostSerializer, parameters=FIELDSET_PARAMETERS))
+class UserPostsView(ReplicaReadMixin, generics.ListAPIView):
     permission_classes = (permissions.IsAuthenticated,)
-    serializer_class = PostSerializer
+    serializer_class = PostRowSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        user_id = self.kwargs.get('user_id')
         current_user = self.request.user
-        
-        try:
-            target_user = User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return Post.objects.none()
-        
-        # If viewing own posts, show all
-        if target_user == current_user:
-            return Post.objects.filter(author=target_user)
-        
-        # Get groups where current_user is a member (owned by target_user)
-        user_groups = current_user.member_of_groups.filter(owner=target_user)
-        
-        # Show:
-        # 1. Public posts
-        # 2. Posts shared with groups that current_user is a member of
-        queryset = Post.objects.filter(
-            Q(author=target_user) & (
-                Q(audience_type=Post.AudienceType.EVERYONE) |
-                Q(
-                    audience_type=Post.AudienceType.GROUPS,
-                    audience_groups__in=user_groups
-                )
-            )
-        ).distinct()
-
-        return queryset
+        # All posts when viewing own profile, otherwise public posts and
+        # posts shared with groups current_user is a member of
+        return PostRowSerializer.rows(Post.objects.visible_to(
+            current_user, author_id=self.kwargs.get('user_id')
+        ), self.request)
 
 
-class PostLikeView(APIView):
+@batch_schema(PostSerializer, FIELDSET_PARAMETERS)
+class PostBatchView(ReplicaReadMixin, BatchView):
+    """Posts by id, see pickme/batch.py; invisible posts are `forbidden`"""
     permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = PostSerializer
 
-    def get_post(self, pk):
-        try:
-            post = Post.objects.get(pk=pk)
-            if not post.can_view(self.request.user):
-                return None
-            return post
-        except Post.DoesNotExist:
-            return None
+    def get_queryset(self):
+        user = self.request.user
+        selection = select_fields(self.request, PostSerializer)
+        return Post.objects.for_serializer(user, selection).with_visibility(user)
+
+    def can_view(self, obj):
+        return obj.viewer_can_view
 
-    def get_liked_by(self, post):
-        likes = post.likes.select_related('user').order_by('-created_at')
-        return [UserSearchSerializer(like.user).data for like in likes]
 
-    def post(self, request, pk):
+class PostLikeView(AsyncViewMixin, APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    async def get_post(self, pk):
+        queryset = await sync_to_async(Post.objects.visible_to)(self.request.user)
+        return await queryset.filter(pk=pk).afirst()
+
+    async def post(self, request, pk):
         """Like a post"""
-        post = self.get_post(pk)
+        post = await self.get_post(pk)
         if not post:
             return Response(
                 {'detail': 'Post not found or access denied'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
+        # Like and counter update share a transaction, which the async ORM
+        # cannot open
+        created = await sync_to_async(post.like)(request.user)
+        if created:
+            await sync_to_async(live.likes_changed)(post)
         return Response({
             'detail': 'Post liked' if created else 'Post already liked',
-            'likes_count': post.likes.count(),
-            'liked_by': self.get_liked_by(post),
+            'likes_count': post.likes_count,
+            'is_liked': True,
         }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
-    def delete(self, request, pk):
+    async def delete(self, request, pk):
         """Unlike a post"""
-        post = self.get_post(pk)
+        post = await self.get_post(pk)
         if not post:
             return Response(
                 {'detail': 'Post not found or access denied'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        deleted, _ = Like.objects.filter(user=request.user, post=post).delete()
+        deleted = await sync_to_async(post.unlike)(request.user)
+        if deleted:
+            await sync_to_async(live.likes_changed)(post)
         return Response({
             'detail': 'Like removed' if deleted else 'Post was not liked',
-            'likes_count': post.likes.count(),
-            'liked_by': self.get_liked_by(post),
+            'likes_count': post.likes_count,
+            'is_liked': False,
         }, status=status.HTTP_200_OK)
+
+
+class PostStreamView(AsyncViewMixin, APIView):
+    """Server-sent events: new posts and like counts the user can see"""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    async def get(self, request):
+        if settings.SERVER_MODE != 'asgi':
+            # Each open stream would hold a sync worker
+            return Response(
+                {'detail': 'Live updates are not available'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        response = StreamingHttpResponse(
+            live.stream(live.Viewer(request.user)),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Tell nginx not to buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class PostLikersView(generics.ListAPIView):
+    """Users who liked a post, newest first"""
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = LikeUserSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        post_id = self.kwargs['pk']
+        if not Post.objects.visible_to(self.request.user).filter(pk=post_id).exists():
+            raise NotFound('Post not found or access denied')
+        return Like.objects.filter(post_id=post_id).select_related('user')
+
+
+class PostSearchPagination(KeysetPagination):
+    ordering = ('-rank', '-id')
+    position_types = {'rank': float, 'id': int}
+
+
+@extend_schema_view(get=extend_schema(parameters=FIELDSET_PARAMETERS))
+class PostSearchView(generics.ListAPIView):
+    """Full-text search over posts visible to the user, best match first"""
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = PostSerializer
+    pagination_class = PostSearchPagination
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '').strip()
+        if len(text) < 2:
+            return Post.objects.none()
+
+        user = self.request.user
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        return Post.objects.visible_to(user).filter(
+            search_vector=query
+        ).annotate(
+            # ts_rank() returns real; as float8 it round-trips exactly through
+            # the cursor, so the keyset comparison on rank stays exact
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        ).for_serializer(user, select_fields(self.request, PostSerializer))
+
+
+@extend_schema_view(get=extend_schema(
+    parameters=[
+        OpenApiParameter('since', str, description='Token of the previous sync, none for the first'),
+        *FIELDSET_PARAMETERS,
+    ],
+    responses=inline_serializer('Sync', {
+        'token': serializers.CharField(),
+        'reset': serializers.BooleanField(),
+        'posts': PostSerializer(many=True),
+        'likes': inline_serializer('SyncLikes', {
+            'id': serializers.IntegerField(),
+            'likes_count': serializers.IntegerField(),
+            'is_liked': serializers.BooleanField(),
+        }, many=True),
+        'removed': serializers.ListField(child=serializers.IntegerField()),
+    }),
+))
+class SyncView(generics.GenericAPIView):
+    """Changes of the feed since the previous sync, see sync.py"""
+    # Not from a replica: changes it has not replayed yet when the token is
+    # issued would be skipped for good
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = PostRowSerializer
+    pagination_class = None
+
+    def get(self, request):
+        since = sync.decode_token(request.query_params.get('since'))
+        data = sync.changes(request.user, since, request)
+        data['posts'] = self.get_serializer(data['posts'], many=True).data
+        return Response(data)
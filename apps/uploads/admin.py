@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import UploadIntent
+
+
+@admin.register(UploadIntent)
+class UploadIntentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'purpose', 'status', 'size', 'created_at', 'expires_at')
+    list_filter = ('purpose', 'status', 'created_at')
+    search_fields = ('key', 'owner__email', 'owner__username')
+    raw_id_fields = ('owner',)
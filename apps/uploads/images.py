@@ -0,0 +1,213 @@
+"""
+Resized WebP variants of photo posts and avatars.
+
+The request path only stores the original and queues a render_variants
+job (see tasks.py); `manage.py process_media` backfills rows whose variants
+field is still NULL. Either way the variants are rendered in a process
+pool (Pillow work is CPU-bound and holds the GIL) and recorded as
+{"320w": <storage name>, ..., "thumbnail": <storage name>}. An empty dict
+means the file could not be processed; serializers then fall back to the
+original.
+
+render_variants() runs in the pool's child processes and deals in bytes
+only, so it needs neither Django nor a database connection there.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _encode(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def render_variants(data, widths, square=False, thumbnail_size=None, quality=80):
+    """Encode `data` as WebP at each of `widths`; returns {key: bytes}.
+
+    Images are never upscaled: widths above the original collapse into a
+    single variant at the original width. With `square`, variants are
+    center-cropped squares (avatars).
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    variants = {}
+    source_width = min(image.size) if square else image.width
+    for width in sorted(set(min(width, source_width) for width in widths)):
+        if square:
+            variant = ImageOps.fit(image, (width, width), Image.Resampling.LANCZOS)
+        else:
+            variant = image.copy()
+            variant.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        variants[f'{width}w'] = _encode(variant, quality)
+
+    if thumbnail_size:
+        thumbnail = ImageOps.fit(image, (thumbnail_size, thumbnail_size), Image.Resampling.LANCZOS)
+        variants['thumbnail'] = _encode(thumbnail, quality)
+    return variants
+
+
+def _pending():
+    """(model, file field, variants field, queryset of rows to process)."""
+    from apps.posts.models import Post
+    from apps.users.models import User
+
+    return (
+        (Post, 'media_file', 'media_variants', Post.objects.filter(
+            media_type=Post.MediaType.PHOTO,
+            media_variants__isnull=True,
+        ).exclude(Q(media_file='') | Q(media_file__isnull=True))),
+        (User, 'avatar', 'avatar_variants', User.objects.filter(
+            avatar_variants__isnull=True,
+        ).exclude(Q(avatar='') | Q(avatar__isnull=True))),
+    )
+
+
+def _options(model):
+    from apps.users.models import User
+
+    if model is User:
+        return {
+            'widths': settings.AVATAR_VARIANT_WIDTHS,
+            'square': True,
+            'quality': settings.IMAGE_VARIANT_QUALITY,
+        }
+    return {
+        'widths': settings.IMAGE_VARIANT_WIDTHS,
+        'thumbnail_size': settings.IMAGE_THUMBNAIL_SIZE,
+        'quality': settings.IMAGE_VARIANT_QUALITY,
+    }
+
+
+def executor():
+    """Process pool shared by the job worker threads of this process.
+
+    None with IMAGE_PROCESSES=0: images are then rendered in the calling
+    thread.
+    """
+    global _executor
+    if settings.IMAGE_PROCESSES == 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # Worker processes are started from a multi-threaded parent, so
+            # don't fork it: children come from a clean forkserver instead
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSES,
+                mp_context=multiprocessing.get_context('forkserver'),
+            )
+        return _executor
+
+
+def _read(model, name, pk):
+    try:
+        with default_storage.open(name, 'rb') as source:
+            return source.read()
+    except OSError:
+        logger.warning('Cannot read %s for %s %s', name, model.__name__, pk)
+        return None
+
+
+def _store(name, variants):
+    base = os.path.splitext(name)[0]
+    stored = {}
+    for key, data in variants.items():
+        variant_name = f'{base}_{key}.webp'
+        # Re-processing replaces earlier variants instead of piling up copies
+        default_storage.delete(variant_name)
+        stored[key] = default_storage.save(variant_name, ContentFile(data))
+    return stored
+
+
+def process_pending(executor, limit):
+    """Render variants for up to `limit` rows of each model; returns how many were done."""
+    futures = {}
+    unreadable = []
+    for model, file_field, variants_field, queryset in _pending():
+        for pk, name in queryset.order_by('pk').values_list('pk', file_field)[:limit]:
+            job = (model, file_field, variants_field, pk, name)
+            data = _read(model, name, pk)
+            if data is None:
+                unreadable.append(job)
+                continue
+            futures[executor.submit(render_variants, data, **_options(model))] = job
+
+    for job in unreadable:
+        _record(*job, {})
+
+    for future in as_completed(futures):
+        _finish(future.result, *futures[future])
+    return len(futures) + len(unreadable)
+
+
+def process_one(executor, model_label, pk):
+    """Render variants for one row if it still needs them."""
+    for model, file_field, variants_field, queryset in _pending():
+        if model._meta.label_lower != model_label:
+            continue
+        name = queryset.filter(pk=pk).values_list(file_field, flat=True).first()
+        if name is None:
+            # Deleted, already processed or no longer a photo
+            return
+        data = _read(model, name, pk)
+        if data is None:
+            _record(model, file_field, variants_field, pk, name, {})
+            return
+        options = _options(model)
+        if executor is None:
+            render = lambda: render_variants(data, **options)  # noqa: E731
+        else:
+            render = executor.submit(render_variants, data, **options).result
+        _finish(render, model, file_field, variants_field, pk, name)
+        return
+    raise LookupError(f'No image variants for {model_label}')
+
+
+def _finish(render, model, file_field, variants_field, pk, name):
+    try:
+        stored = _store(name, render())
+    except Exception:
+        logger.exception('Cannot process %s for %s %s', name, model.__name__, pk)
+        stored = {}
+    _record(model, file_field, variants_field, pk, name, stored)
+
+
+def _record(model, file_field, variants_field, pk, name, stored):
+    # Only if the file was not replaced meanwhile. updated_at moves so the
+    # cached post representations pick up the new variants.
+    model.objects.filter(pk=pk, **{file_field: name}).update(**{
+        variants_field: stored,
+        'updated_at': timezone.now(),
+    })
+
+
+def file_url(name, request=None):
+    """URL of a stored file as DRF's FileField renders it, None without one."""
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def variant_urls(variants, request=None):
+    """{key: absolute URL} for a variants field, {} if there are none."""
+    return {key: file_url(name, request) for key, name in (variants or {}).items()}
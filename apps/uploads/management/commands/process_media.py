@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from apps.uploads.images import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Render resized WebP variants of photo posts and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=None,
+            help='Size of the resizing process pool (default: number of CPUs)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Rows of each model picked up per round'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait when there is nothing to process'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the current backlog and exit'
+        )
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['processes']) as executor:
+            while True:
+                done = process_pending(executor, options['batch_size'])
+                if done:
+                    self.stdout.write(f'Processed {done} image(s)')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.uploads.models import UploadIntent
+
+
+class Command(BaseCommand):
+    help = 'Delete expired upload intents that were never attached, and their files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of intents deleted per batch'
+        )
+
+    def handle(self, *args, **options):
+        stale = UploadIntent.objects.filter(
+            expires_at__lte=timezone.now()
+        ).exclude(status=UploadIntent.Status.ATTACHED).order_by('expires_at')
+
+        deleted = 0
+        while True:
+            batch = list(stale.values_list('id', 'key')[:options['chunk_size']])
+            if not batch:
+                break
+            for _, key in batch:
+                default_storage.delete(key)
+            UploadIntent.objects.filter(id__in=[pk for pk, _ in batch]).delete()
+            deleted += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} stale upload(s)')
+        )
@@ -0,0 +1,76 @@
+import mimetypes
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models
+from django.utils import timezone
+
+
+def object_key(purpose, user_id, filename, content_type):
+    """Storage name for a new upload, laid out like the models' upload_to paths."""
+    ext = os.path.splitext(filename)[1].lstrip('.').lower()
+    if not ext.isalnum() or len(ext) > 10:
+        ext = (mimetypes.guess_extension(content_type) or '.bin').lstrip('.')
+    prefix = 'avatars' if purpose == UploadIntent.Purpose.AVATAR else 'posts'
+    return f'{prefix}/{user_id}/{uuid.uuid4()}.{ext}'
+
+
+class UploadIntent(models.Model):
+    """A file the client uploads straight to storage, then attaches to a model."""
+
+    class Purpose(models.TextChoices):
+        POST_MEDIA = 'post_media', 'Post media'
+        AVATAR = 'avatar', 'Avatar'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        UPLOADED = 'uploaded', 'Uploaded'
+        ATTACHED = 'attached', 'Attached'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_intents'
+    )
+    purpose = models.CharField(max_length=20, choices=Purpose.choices)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    # Storage name of the object, as stored in FileField.name
+    key = models.CharField(max_length=255, unique=True)
+    content_type = models.CharField(max_length=100)
+    max_size = models.PositiveBigIntegerField()
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'upload_intents'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='uploads_status_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_purpose_display()} upload {self.id} by user {self.owner_id}"
+
+    def save(self, *args, **kwargs):
+        if self.expires_at is None:
+            self.expires_at = timezone.now() + timedelta(seconds=settings.UPLOAD_INTENT_TIMEOUT)
+        super().save(*args, **kwargs)
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+    def stored_size(self):
+        """Size of the uploaded object, or None if nothing was uploaded."""
+        if not default_storage.exists(self.key):
+            return None
+        return default_storage.size(self.key)
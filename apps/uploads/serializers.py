@@ -0,0 +1,74 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from .images import variant_urls
+from .models import UploadIntent, object_key
+
+# Accepted Content-Type prefixes per purpose
+ALLOWED_CONTENT_TYPES = {
+    UploadIntent.Purpose.AVATAR: ('image/',),
+    UploadIntent.Purpose.POST_MEDIA: ('image/', 'video/'),
+}
+
+
+def max_upload_size(purpose):
+    if purpose == UploadIntent.Purpose.AVATAR:
+        return settings.AVATAR_MAX_UPLOAD_SIZE
+    return settings.POST_MEDIA_MAX_UPLOAD_SIZE
+
+
+class VariantsField(serializers.ReadOnlyField):
+    """Image variants as {"320w": url, ..., "thumbnail": url}, srcset-style."""
+
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get('request'))
+
+
+class UploadIntentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadIntent
+        fields = (
+            'id', 'purpose', 'status', 'key', 'content_type',
+            'max_size', 'size', 'created_at', 'expires_at'
+        )
+        read_only_fields = fields
+
+
+class UploadIntentCreateSerializer(serializers.ModelSerializer):
+    filename = serializers.CharField(max_length=255, write_only=True)
+    size = serializers.IntegerField(min_value=1, required=False, write_only=True)
+
+    class Meta:
+        model = UploadIntent
+        fields = ('purpose', 'filename', 'content_type', 'size')
+
+    def validate(self, attrs):
+        purpose = attrs['purpose']
+        content_type = attrs['content_type'].lower()
+        if not content_type.startswith(ALLOWED_CONTENT_TYPES[purpose]):
+            raise serializers.ValidationError({
+                'content_type': f'Unsupported content type for {purpose}'
+            })
+        limit = max_upload_size(purpose)
+        if attrs.get('size', 0) > limit:
+            raise serializers.ValidationError({
+                'size': f'File is too large, the limit is {limit} bytes'
+            })
+        attrs['content_type'] = content_type
+        return attrs
+
+    def create(self, validated_data):
+        owner_id = self.context['request'].user.pk
+        purpose = validated_data['purpose']
+        content_type = validated_data['content_type']
+        return UploadIntent.objects.create(
+            owner_id=owner_id,
+            purpose=purpose,
+            content_type=content_type,
+            key=object_key(purpose, owner_id, validated_data['filename'], content_type),
+            max_size=max_upload_size(purpose),
+        )
+
+
+class UploadFinalizeSerializer(serializers.Serializer):
+    post = serializers.IntegerField(required=False)
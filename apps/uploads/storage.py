@@ -0,0 +1,51 @@
+"""
+Upload targets handed out to clients.
+
+With S3 the client gets a presigned POST: the bucket itself enforces the
+content type and size limit, and the file never passes through our
+workers. Without S3 (local development) the target is UploadContentView,
+which takes the same multipart form and is authorized by a signed URL the
+same way, so clients need no special case.
+"""
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+SIGNING_SALT = 'uploads.content'
+
+
+def upload_target(intent, request):
+    """{'method', 'url', 'fields'} the client POSTs the file to, as field `file`."""
+    if settings.USE_S3:
+        client = default_storage.connection.meta.client
+        presigned = client.generate_presigned_post(
+            Bucket=default_storage.bucket_name,
+            Key=intent.key,
+            Fields={'Content-Type': intent.content_type},
+            Conditions=[
+                {'Content-Type': intent.content_type},
+                ['content-length-range', 1, intent.max_size],
+            ],
+            ExpiresIn=settings.UPLOAD_INTENT_TIMEOUT,
+        )
+        return {'method': 'POST', 'url': presigned['url'], 'fields': presigned['fields']}
+
+    signature = signing.dumps(str(intent.pk), salt=SIGNING_SALT)
+    url = request.build_absolute_uri(reverse('upload-content', kwargs={'pk': intent.pk}))
+    return {
+        'method': 'POST',
+        'url': f'{url}?{urlencode({"signature": signature})}',
+        'fields': {'Content-Type': intent.content_type},
+    }
+
+
+def check_signature(intent_id, signature):
+    try:
+        return signing.loads(
+            signature, salt=SIGNING_SALT, max_age=settings.UPLOAD_INTENT_TIMEOUT
+        ) == str(intent_id)
+    except signing.BadSignature:
+        return False
@@ -0,0 +1,26 @@
+from django.core.files.storage import default_storage
+
+from apps.jobs.queue import task
+from . import images
+
+
+@task()
+def render_image_variants(model, pk):
+    """Render variants for a photo post ('posts.post') or an avatar ('users.user')."""
+    images.process_one(images.executor(), model, pk)
+
+
+@task()
+def delete_files(names):
+    """Remove replaced originals and variants from storage."""
+    for name in names:
+        default_storage.delete(name)
+
+
+def replace_files(old_name, old_variants, new_name):
+    """Queue removal of a replaced file and its variants."""
+    names = list((old_variants or {}).values())
+    if old_name and old_name != new_name:
+        names.append(old_name)
+    if names:
+        delete_files.enqueue(names=names)
@@ -0,0 +1,12 @@
+from django.urls import path
+from .views import (
+    UploadIntentCreateView,
+    UploadFinalizeView,
+    UploadContentView,
+)
+
+urlpatterns = [
+    path('', UploadIntentCreateView.as_view(), name='upload-create'),
+    path('<uuid:pk>/finalize/', UploadFinalizeView.as_view(), name='upload-finalize'),
+    path('<uuid:pk>/content/', UploadContentView.as_view(), name='upload-content'),
+]
@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status, permissions
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.posts.models import Post
+from apps.posts.serializers import PostSerializer
+from apps.users.authentication import load_user
+from apps.users.serializers import UserSerializer
+
+from .models import UploadIntent
+from .serializers import (
+    UploadIntentSerializer,
+    UploadIntentCreateSerializer,
+    UploadFinalizeSerializer,
+)
+from .storage import upload_target, check_signature
+from .tasks import render_image_variants, replace_files
+
+
+class UploadIntentCreateView(generics.CreateAPIView):
+    """Reserve a storage key and get a URL to upload the file to directly"""
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = UploadIntentCreateSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        intent = serializer.save()
+        data = UploadIntentSerializer(intent).data
+        data['upload'] = upload_target(intent, request)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class UploadFinalizeView(APIView):
+    """Check the uploaded object and attach it to the avatar or a post"""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, pk):
+        serializer = UploadFinalizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            intent = get_object_or_404(
+                UploadIntent.objects.select_for_update(),
+                pk=pk,
+                owner_id=request.user.pk
+            )
+            if intent.status == UploadIntent.Status.ATTACHED:
+                return Response(
+                    {'detail': 'Upload is already attached'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if intent.is_expired:
+                return Response(
+                    {'detail': 'Upload has expired'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if intent.status == UploadIntent.Status.PENDING:
+                size = intent.stored_size()
+                if size is None:
+                    return Response(
+                        {'detail': 'File has not been uploaded'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                if size > intent.max_size:
+                    default_storage.delete(intent.key)
+                    return Response(
+                        {'detail': 'File is too large'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                intent.size = size
+                intent.status = UploadIntent.Status.UPLOADED
+
+            if intent.purpose == UploadIntent.Purpose.AVATAR:
+                response = self.attach_avatar(request, intent)
+            elif 'post' in serializer.validated_data:
+                response = self.attach_to_post(request, intent, serializer.validated_data['post'])
+            else:
+                # Attached later via PostCreateSerializer.media_upload
+                response = None
+            intent.save(update_fields=['size', 'status'])
+
+        return response or Response(UploadIntentSerializer(intent).data)
+
+    def attach_avatar(self, request, intent):
+        user = load_user(request.user)
+        old_name = user.avatar.name if user.avatar else None
+        old_variants = user.avatar_variants
+        user.avatar = intent.key
+        user.avatar_variants = None
+        user.save(update_fields=['avatar', 'avatar_variants', 'updated_at'])
+        intent.status = UploadIntent.Status.ATTACHED
+        replace_files(old_name, old_variants, intent.key)
+        render_image_variants.enqueue(model='users.user', pk=user.pk)
+        return Response(UserSerializer(user, context={'request': request}).data)
+
+    def attach_to_post(self, request, intent, post_id):
+        post = get_object_or_404(Post, pk=post_id, author_id=request.user.pk)
+        if post.content_type != Post.ContentType.MEDIA:
+            return Response(
+                {'detail': 'Only media posts can have a media file'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        old_name = post.media_file.name if post.media_file else None
+        old_variants = post.media_variants
+        post.media_file = intent.key
+        post.media_variants = None
+        post.save(update_fields=['media_file', 'media_variants', 'updated_at'])
+        intent.status = UploadIntent.Status.ATTACHED
+        replace_files(old_name, old_variants, intent.key)
+        if post.media_type == Post.MediaType.PHOTO:
+            render_image_variants.enqueue(model='posts.post', pk=post.pk)
+        return Response(PostSerializer(post, context={'request': request}).data)
+
+
+class UploadContentView(APIView):
+    """Local stand-in for a presigned S3 POST, used when USE_S3 is off"""
+    authentication_classes = ()
+    permission_classes = (permissions.AllowAny,)
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, pk):
+        if settings.USE_S3 or not check_signature(pk, request.query_params.get('signature', '')):
+            raise NotFound()
+        intent = get_object_or_404(UploadIntent, pk=pk, status=UploadIntent.Status.PENDING)
+        if intent.is_expired:
+            return Response({'detail': 'Upload has expired'}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.data.get('Content-Type') != intent.content_type:
+            return Response({'detail': 'Content-Type does not match'}, status=status.HTTP_403_FORBIDDEN)
+        if upload.size > intent.max_size:
+            return Response({'detail': 'File is too large'}, status=status.HTTP_400_BAD_REQUEST)
+
+        default_storage.delete(intent.key)
+        default_storage.save(intent.key, upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,131 @@
+"""
+JWT authentication that does not load the user row on every request.
+
+simplejwt's JWTAuthentication fetches the user by primary key for each
+authenticated request. ClaimsJWTAuthentication instead returns a ClaimsUser
+built from the token: id, email and username come from the claims added in
+CustomTokenObtainPairSerializer.get_token, and the User row is only loaded
+the first time something else is read from it. Whether the account still
+exists and is active is checked against a cache entry that lives for
+AUTH_USER_STATE_CACHE_TIMEOUT seconds and is dropped when the user is saved
+or deleted (see signals.py).
+
+Code that needs a real model instance (saving it, serializing the profile)
+should call load_user(request.user).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+CLAIM_FIELDS = ('email', 'username')
+
+
+def _state_key(user_id):
+    return f'users:active:{user_id}'
+
+
+def is_active(user_id):
+    """True/False for an existing user, None if there is no such user."""
+    key = _state_key(user_id)
+    missing = object()
+    active = cache.get(key, missing)
+    if active is missing:
+        active = User.objects.filter(pk=user_id).values_list('is_active', flat=True).first()
+        cache.set(key, active, settings.AUTH_USER_STATE_CACHE_TIMEOUT)
+    return active
+
+
+def invalidate(user_id):
+    cache.delete(_state_key(user_id))
+
+
+class ClaimsUser(SimpleLazyObject):
+    """request.user backed by a validated token.
+
+    Reading pk, id or a claim in CLAIM_FIELDS costs nothing; anything else
+    loads the User row once and is served from it afterwards. Comparisons
+    and truth tests don't load it either, but isinstance() and passing the
+    object as a model instance to the ORM do, so hot paths use ids.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        user_id = token[api_settings.USER_ID_CLAIM]
+        super().__init__(lambda: User.objects.get(**{api_settings.USER_ID_FIELD: user_id}))
+        self.__dict__['_user_id'] = user_id
+        self.__dict__['_claims'] = {
+            name: token[name] for name in CLAIM_FIELDS if name in token
+        }
+
+    @property
+    def pk(self):
+        return self._user_id
+
+    id = pk
+
+    def _claim(name):
+        def getter(self):
+            # Once loaded the row wins, so changes made during the request
+            # are visible
+            if self._wrapped is empty and name in self._claims:
+                return self._claims[name]
+            return getattr(load_user(self), name)
+        return property(getter)
+
+    email = _claim('email')
+    username = _claim('username')
+    del _claim
+
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        if isinstance(other, ClaimsUser):
+            return self.pk == other.pk
+        if isinstance(other, User):
+            return other.pk == self.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __repr__(self):
+        return f'<ClaimsUser: {self._user_id}>'
+
+
+def load_user(user):
+    """The User instance behind `user`, loading it if it is a ClaimsUser."""
+    if isinstance(user, ClaimsUser):
+        if user._wrapped is empty:
+            user._setup()
+        return user._wrapped
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # The revoke check compares against the password hash, which
+            # needs the row anyway
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        active = is_active(user_id)
+        if active is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        return ClaimsUser(validated_token)
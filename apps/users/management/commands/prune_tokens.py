@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted refresh tokens in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of tokens deleted per transaction'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between chunks to spread the load'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        now = aware_utcnow()
+        expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by('expires_at')
+
+        deleted = 0
+        # Short transactions over the expires_at index instead of one huge
+        # DELETE that locks the whole backlog at once
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            # Blacklist entries go with them (on_delete=CASCADE)
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} expired token(s)')
+        )
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Index on a third-party table (simplejwt's token_blacklist), built
+    # concurrently so logins and refreshes keep working meanwhile
+    atomic = False
+
+    dependencies = [
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+        ('users', '0003_user_search_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS token_outstanding_expires_idx
+            ON token_blacklist_outstandingtoken (expires_at)
+            """,
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS token_outstanding_expires_idx',
+        ),
+    ]
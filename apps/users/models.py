@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 import uuid
 
 
@@ -12,6 +14,9 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     bio = models.TextField(max_length=500, blank=True)
     avatar = models.ImageField(upload_to=avatar_upload_path, null=True, blank=True)
+    # Resized WebP variants, filled by `manage.py process_media`; NULL until
+    # processed (see apps/uploads/images.py)
+    avatar_variants = models.JSONField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -21,6 +26,20 @@ class User(AbstractUser):
     class Meta:
         db_table = 'users'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='users_created_id_idx'),
+            # Avatars still waiting for process_media
+            models.Index(
+                fields=['id'],
+                condition=models.Q(avatar_variants__isnull=True) & ~models.Q(avatar=''),
+                name='users_avatar_pending_idx'
+            ),
+            # Trigram indexes serve the UPPER(...) LIKE queries Django emits
+            # for icontains/istartswith, see UserSearchView
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='users_username_trgm_idx'),
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='users_first_name_trgm_idx'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='users_last_name_trgm_idx'),
+        ]
 
     def __str__(self):
         return self.email
@@ -1,8 +1,15 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 
+from apps.posts import timeline
+from pickme.fieldsets import FieldSelectionMixin
+from apps.uploads.images import file_url, variant_urls
+from apps.uploads.serializers import VariantsField
+
+from .tokens import RefreshToken
+
 User = get_user_model()
 
 
@@ -22,11 +29,13 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         user = User.objects.create_user(**validated_data)
+        timeline.seed_viewer(user)
         return user
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = 'email'
+    token_class = RefreshToken
 
     @classmethod
     def get_token(cls, user):
@@ -36,17 +45,25 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return token
 
 
-class UserSerializer(serializers.ModelSerializer):
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+class UserSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    avatar_variants = VariantsField()
+
     class Meta:
         model = User
-        fields = ('id', 'email', 'username', 'first_name', 'last_name', 'bio', 'avatar', 'created_at', 'is_superuser')
+        fields = ('id', 'email', 'username', 'first_name', 'last_name', 'bio', 'avatar', 'avatar_variants', 'created_at', 'is_superuser')
         read_only_fields = ('id', 'email', 'created_at', 'is_superuser')
 
 
-class UserPublicSerializer(serializers.ModelSerializer):
+class UserPublicSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    avatar_variants = VariantsField()
+
     class Meta:
         model = User
-        fields = ('id', 'username', 'first_name', 'last_name', 'bio', 'avatar')
+        fields = ('id', 'username', 'first_name', 'last_name', 'bio', 'avatar', 'avatar_variants')
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -62,6 +79,36 @@ class AvatarUploadSerializer(serializers.ModelSerializer):
 
 
 class UserSearchSerializer(serializers.ModelSerializer):
+    avatar_variants = VariantsField()
+
     class Meta:
         model = User
-        fields = ('id', 'username', 'first_name', 'last_name', 'avatar')
+        fields = ('id', 'username', 'first_name', 'last_name', 'avatar', 'avatar_variants')
+
+
+def user_search_row(row, request=None, prefix=''):
+    """UserSearchSerializer output for a .values() row.
+
+    `prefix` reads the columns of a related user, e.g. 'author__'.
+    """
+    variants = row[f'{prefix}avatar_variants']
+    return {
+        'id': row[f'{prefix}id'],
+        'username': row[f'{prefix}username'],
+        'first_name': row[f'{prefix}first_name'],
+        'last_name': row[f'{prefix}last_name'],
+        'avatar': file_url(row[f'{prefix}avatar'], request),
+        'avatar_variants': None if variants is None else variant_urls(variants, request),
+    }
+
+
+class UserSearchRowSerializer(UserSearchSerializer):
+    """
+    Read-only UserSearchSerializer for rows of `.values(*row_fields)`.
+    Builds the same dicts without field objects or model instances.
+    """
+    # created_at is the keyset pagination position
+    row_fields = UserSearchSerializer.Meta.fields + ('created_at',)
+
+    def to_representation(self, row):
+        return user_search_row(row, self.context.get('request'))
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from . import authentication, tokens
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    user_id = instance.pk
+    authentication.invalidate(user_id)
+    # Drop again once committed, in case a concurrent request re-cached the
+    # old state before this transaction became visible
+    transaction.on_commit(lambda: authentication.invalidate(user_id))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, **kwargs):
+    # Rows created outside RefreshToken.blacklist(), e.g. in the admin, must
+    # replace a cached "clean" state too
+    token = instance.token
+    tokens.remember_blacklisted(token.jti, token.expires_at.timestamp())
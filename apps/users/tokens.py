@@ -0,0 +1,98 @@
+"""
+Refresh tokens with a cached blacklist check.
+
+With ROTATE_REFRESH_TOKENS and BLACKLIST_AFTER_ROTATION every refresh
+blacklists the presented token, and a replayed token has to be rejected.
+Each jti has one key in the shared cache (L2, so every worker sees changes at
+once) until the token expires: "clean" from the moment the token is issued,
+"blacklisted" once it is. A refresh with either answer costs no query. The
+blacklisted state is written with set() and wins over clean, which is only
+ever add()ed, so a check racing a blacklist() cannot leave a stale "clean"
+behind. Rows created outside blacklist() (admin) update the key through
+signals.py. A jti without a key (evicted, issued before the cache was
+flushed) is checked against BlacklistedToken and the answer cached. Without
+CACHE_URL the shared cache is per process and "clean" is never stored, only
+the blacklisted state is trusted.
+
+Blacklisting is a get_or_create of the outstanding token (a lookup, the row
+is written when the token is issued) plus one INSERT ... ON CONFLICT DO
+NOTHING of the blacklist row. Expired rows are removed by the prune_tokens
+management command.
+"""
+import time
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from pickme.cache import shared_across_workers, shared_cache
+
+CLEAN = 'clean'
+BLACKLISTED = 'blacklisted'
+
+
+def _blacklist_key(jti):
+    return f'auth:blacklist:{jti}'
+
+
+def _timeout(exp):
+    return int(exp - time.time())
+
+
+def remember_blacklisted(jti, exp):
+    timeout = _timeout(exp)
+    if timeout > 0:
+        shared_cache().set(_blacklist_key(jti), BLACKLISTED, timeout)
+
+
+def remember_clean(jti, exp):
+    # A "clean" state in one worker's own memory would outlive a blacklist()
+    # handled by another, so without a shared L2 every check asks the database
+    if not shared_across_workers():
+        return
+    timeout = _timeout(exp)
+    if timeout > 0:
+        # add(): never overwrite a blacklisted state written meanwhile
+        shared_cache().add(_blacklist_key(jti), CLEAN, timeout)
+
+
+class RefreshToken(BaseRefreshToken):
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        state = shared_cache().get(_blacklist_key(jti))
+        if state == CLEAN:
+            return
+        if state == BLACKLISTED:
+            raise TokenError(_('Token is blacklisted'))
+
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            remember_blacklisted(jti, self.payload['exp'])
+            raise TokenError(_('Token is blacklisted'))
+        remember_clean(jti, self.payload['exp'])
+
+    def set_jti(self):
+        # New tokens, from for_user() and rotation: known not to be
+        # blacklisted, so their first refresh needs no query either
+        super().set_jti()
+        exp = self.current_time + api_settings.REFRESH_TOKEN_LIFETIME
+        remember_clean(self.payload[api_settings.JTI_CLAIM], exp.timestamp())
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        exp = self.payload['exp']
+
+        token, _ = OutstandingToken.objects.get_or_create(
+            jti=jti,
+            defaults={
+                'token': str(self),
+                'expires_at': datetime_from_epoch(exp),
+            },
+        )
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=token)], ignore_conflicts=True
+        )
+        remember_blacklisted(jti, exp)
+        return token
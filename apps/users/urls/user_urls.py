@@ -5,11 +5,13 @@ from ..views import (
     AvatarUploadView,
     CurrentUserView,
     UserSearchView,
+    UserBatchView,
 )
 
 urlpatterns = [
     path('me/', CurrentUserView.as_view(), name='current-user'),
     path('search/', UserSearchView.as_view(), name='user-search'),
+    path('batch/', UserBatchView.as_view(), name='user-batch'),
     path('<int:pk>/', UserDetailView.as_view(), name='user-detail'),
     path('<int:pk>/update/', UserUpdateView.as_view(), name='user-update'),
     path('<int:pk>/avatar/', AvatarUploadView.as_view(), name='avatar-upload'),
@@ -3,9 +3,26 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.functions import Greatest
+from drf_spectacular.utils import extend_schema, extend_schema_view
+
+from pickme.async_views import AsyncViewMixin
+from pickme.batch import BatchView, batch_schema
+from pickme.cache import aget_or_compute
+from pickme.conditional import ConditionalGetMixin
+from pickme.db_router import ReplicaReadMixin
+from pickme.fieldsets import FIELDSET_PARAMETERS
+from apps.uploads.tasks import render_image_variants, replace_files
+
+from .authentication import load_user
+from .tokens import RefreshToken
 
 from .serializers import (
     UserRegistrationSerializer,
@@ -15,6 +32,7 @@ from .serializers import (
     UserUpdateSerializer,
     AvatarUploadSerializer,
     UserSearchSerializer,
+    UserSearchRowSerializer,
 )
 
 User = get_user_model()
@@ -30,7 +48,9 @@ class RegisterView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        refresh = RefreshToken.for_user(user)
+        # Same claims as a login, so ClaimsJWTAuthentication can serve the
+        # new user without loading the row
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
         
         return Response({
             'user': UserSerializer(user).data,
@@ -60,9 +80,22 @@ class LogoutView(APIView):
             return Response({'detail': 'Invalid token'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserDetailView(generics.RetrieveAPIView):
+@extend_schema_view(get=extend_schema(parameters=FIELDSET_PARAMETERS))
+class UserDetailView(ConditionalGetMixin, ReplicaReadMixin, generics.RetrieveAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.IsAuthenticated,)
+    _object = None
+
+    def get_validators(self):
+        # The profile is a single row, every change of it moves updated_at
+        user = self.get_object()
+        return user.updated_at, user.updated_at
+
+    def get_object(self):
+        # Loaded once by get_validators(), then reused by retrieve()
+        if self._object is None:
+            self._object = super().get_object()
+        return self._object
 
     def get_serializer_class(self):
         if self.kwargs.get('pk') == self.request.user.pk or str(self.kwargs.get('pk')) == str(self.request.user.pk):
@@ -70,6 +103,14 @@ class UserDetailView(generics.RetrieveAPIView):
         return UserPublicSerializer
 
 
+@batch_schema(UserPublicSerializer, FIELDSET_PARAMETERS)
+class UserBatchView(ReplicaReadMixin, BatchView):
+    """Public profiles by id, see pickme/batch.py"""
+    queryset = User.objects.all()
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = UserPublicSerializer
+
+
 class UserUpdateView(generics.UpdateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.IsAuthenticated,)
@@ -80,7 +121,7 @@ class UserUpdateView(generics.UpdateAPIView):
         if str(pk) != str(self.request.user.pk):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You can only edit your own profile")
-        return self.request.user
+        return load_user(self.request.user)
 
 
 class AvatarUploadView(APIView):
@@ -94,35 +135,99 @@ class AvatarUploadView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        serializer = AvatarUploadSerializer(request.user, data=request.data, partial=True)
+        user = load_user(request.user)
+        serializer = AvatarUploadSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
-            # Delete old avatar if exists
-            if request.user.avatar:
-                request.user.avatar.delete(save=False)
-            serializer.save()
-            return Response(UserSerializer(request.user).data)
+            old_name = user.avatar.name if user.avatar else None
+            old_variants = user.avatar_variants
+            with transaction.atomic():
+                serializer.save(avatar_variants=None)
+                replace_files(old_name, old_variants, user.avatar.name)
+                render_image_variants.enqueue(model='users.user', pk=user.pk)
+            return Response(UserSerializer(user).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CurrentUserView(generics.RetrieveAPIView):
+@extend_schema_view(get=extend_schema(parameters=FIELDSET_PARAMETERS))
+class CurrentUserView(ConditionalGetMixin, generics.RetrieveAPIView):
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = UserSerializer
 
+    def get_validators(self):
+        user = self.get_object()
+        return user.updated_at, user.updated_at
+
     def get_object(self):
-        return self.request.user
+        return load_user(self.request.user)
+
 
+@extend_schema_view(get=extend_schema(responses=UserSearchSerializer))
+class UserSearchView(ReplicaReadMixin, AsyncViewMixin, generics.ListAPIView):
+    """Autocomplete search over username, first and last name.
 
-class UserSearchView(generics.ListAPIView):
+    Matching is case-insensitive substring search served by the trigram
+    indexes on the users table, prefix matches first. Longer queries are then
+    ranked by trigram similarity; queries shorter than
+    `similarity_min_length` are too short for it (and for the indexes) and are
+    sorted by username instead. Results are cached for
+    USER_SEARCH_CACHE_TIMEOUT seconds, so popular prefixes typed by many users
+    hit the database once.
+    """
     permission_classes = (permissions.IsAuthenticated,)
-    serializer_class = UserSearchSerializer
+    serializer_class = UserSearchRowSerializer
+    search_fields = ('username', 'first_name', 'last_name')
+    similarity_min_length = 3
+    max_results = 20
+
+    def get_search_query(self):
+        return self.request.query_params.get('q', '').strip()
+
+    def _match(self, lookup, query):
+        condition = Q()
+        for field in self.search_fields:
+            condition |= Q(**{f'{field}__{lookup}': query})
+        return condition
 
     def get_queryset(self):
-        query = self.request.query_params.get('q', '')
+        query = self.get_search_query()
         if len(query) < 2:
             return User.objects.none()
-        
-        return User.objects.filter(
-            Q(username__icontains=query) |
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query)
-        ).exclude(pk=self.request.user.pk)[:20]
+
+        matches = User.objects.filter(self._match('icontains', query)).annotate(
+            prefix_match=ExpressionWrapper(self._match('istartswith', query), output_field=BooleanField()),
+        )
+        if len(query) < self.similarity_min_length:
+            return matches.order_by('-prefix_match', 'username', 'id')
+
+        return matches.annotate(
+            similarity=Greatest(*(
+                TrigramSimilarity(field, query) for field in self.search_fields
+            )),
+        ).order_by('-prefix_match', '-similarity', 'id')
+
+    def _cache_key(self, query):
+        # Avatar URLs are absolute, so the host is part of the key
+        digest = hashlib.md5(
+            f'{query.lower()}|{self.request.build_absolute_uri("/")}'.encode()
+        ).hexdigest()
+        return f'users:search:{digest}'
+
+    async def _search(self):
+        # One extra row so there are still max_results after excluding the viewer
+        queryset = self.get_queryset().values(*self.serializer_class.row_fields)
+        rows = [row async for row in queryset[:self.max_results + 1]]
+        return list(self.get_serializer(rows, many=True).data)
+
+    async def get(self, request, *args, **kwargs):
+        query = self.get_search_query()
+        if len(query) < 2:
+            results = []
+        else:
+            results = await aget_or_compute(
+                self._cache_key(query),
+                self._search,
+                timeout=settings.USER_SEARCH_CACHE_TIMEOUT,
+            )
+        results = [item for item in results if item['id'] != request.user.pk]
+        page = self.paginate_queryset(results[:self.max_results])
+        return self.get_paginated_response(page)
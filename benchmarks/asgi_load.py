@@ -0,0 +1,223 @@
+"""
+Concurrent connection capacity of the WSGI and ASGI serving modes.
+
+Starts gunicorn with gunicorn.conf.py once per mode, with the same number of
+worker processes (so roughly the same memory), and keeps N client
+connections requesting an endpoint for a while, back to back or with a
+think time between requests. Reports throughput, latency, failed requests
+(errors and requests slower than --timeout) and the resident memory of the
+gunicorn process tree.
+
+    python benchmarks/asgi_load.py [--concurrency 10 100 500] [--duration 10]
+
+Uses the app's database settings (DB_HOST, ...); a `loadtest` user with
+--posts posts is created there if missing.
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = (
+    ('wsgi, sync workers', {'SERVER_MODE': 'wsgi'}),
+    ('asgi, uvicorn workers', {'SERVER_MODE': 'asgi'}),
+)
+
+
+def prepare(posts):
+    """Create the load test user and posts; returns an access token."""
+    import django
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pickme.settings')
+    django.setup()
+
+    from apps.posts.models import Post
+    from apps.users.models import User
+    from apps.users.serializers import CustomTokenObtainPairSerializer
+
+    user, created = User.objects.get_or_create(
+        email='loadtest@example.com',
+        defaults={'username': 'loadtest'},
+    )
+    if created:
+        user.set_unusable_password()
+        user.save()
+    missing = posts - Post.objects.filter(author=user).count()
+    Post.objects.bulk_create(
+        Post(author=user, text_content=f'Load test post {index}') for index in range(missing)
+    )
+    return str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+
+
+def tree_rss(pid):
+    """Resident memory of `pid` and its children, in MB."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                parent = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+    headers = {name.lower(): value for name, value in headers.items()}
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() == 'close'
+
+
+async def request_once(port, request, timeout, connection):
+    """Send `request`, reusing `connection` when given; returns (ok, close, connection)."""
+    if connection is None:
+        connection = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    reader, writer = connection
+    writer.write(request)
+    status, close = await asyncio.wait_for(read_response(reader), timeout)
+    return status == 200, close, connection
+
+
+async def client(port, request, deadline, timeout, think_time, results):
+    connection = None
+    # Spread the first requests of idle-ish clients over the think time
+    await asyncio.sleep(think_time * random.random())
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            try:
+                ok, close, connection = await request_once(port, request, timeout, connection)
+            except (OSError, asyncio.IncompleteReadError):
+                if connection is None:
+                    raise
+                # The server closed an idle keep-alive connection, as real
+                # clients do, retry on a new one
+                connection[1].close()
+                ok, close, connection = await request_once(port, request, timeout, None)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            ok, close = False, True
+        results.append((ok, time.monotonic() - started))
+        if close and connection is not None:
+            connection[1].close()
+            connection = None
+        if think_time:
+            await asyncio.sleep(think_time)
+    if connection is not None:
+        connection[1].close()
+
+
+async def load(port, path, token, concurrency, duration, timeout, think_time=0):
+    request = (
+        f'GET {path} HTTP/1.1\r\n'
+        f'Host: 127.0.0.1\r\n'
+        f'Authorization: Bearer {token}\r\n'
+        f'\r\n'
+    ).encode()
+    results = []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        client(port, request, deadline, timeout, think_time, results)
+        for _ in range(concurrency)
+    ))
+    return results
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'gunicorn did not start on port {port}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per level')
+    parser.add_argument('--timeout', type=float, default=5, help='Seconds before a request counts as failed')
+    parser.add_argument(
+        '--think-time',
+        type=float,
+        default=0,
+        help='Seconds each client waits between requests (0: back to back)'
+    )
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--path', default='/api/posts/')
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    token = prepare(args.posts)
+    print(
+        f'{args.workers} worker(s), {args.path}, {args.duration:g}s per level, '
+        f'{args.think_time:g}s think time'
+    )
+    print(f'{"mode":<24}{"conns":>7}{"req/s":>9}{"p50 ms":>9}{"p99 ms":>9}{"failed":>8}{"RSS MB":>8}')
+    for name, env in MODES:
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+            cwd=ROOT,
+            env={
+                **os.environ,
+                **env,
+                'GUNICORN_BIND': f'127.0.0.1:{args.port}',
+                'GUNICORN_WORKERS': str(args.workers),
+                'DEBUG': 'False',
+                'ALLOWED_HOSTS': '127.0.0.1',
+            },
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(args.port)
+            # Warm up connections and caches
+            asyncio.run(load(args.port, args.path, token, args.workers, 2, args.timeout))
+            for concurrency in args.concurrency:
+                results = asyncio.run(load(
+                    args.port, args.path, token, concurrency,
+                    args.duration, args.timeout, args.think_time,
+                ))
+                timings = sorted(elapsed * 1000 for ok, elapsed in results if ok)
+                failed = sum(1 for ok, _ in results if not ok)
+                p50 = statistics.median(timings) if timings else float('nan')
+                p99 = timings[int(len(timings) * 0.99) - 1] if timings else float('nan')
+                print(
+                    f'{name:<24}{concurrency:>7}{len(timings) / args.duration:>9.0f}'
+                    f'{p50:>9.1f}{p99:>9.1f}{failed:>8}{tree_rss(server.pid):>8.0f}'
+                )
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Per-request database connection overhead under different settings.
+
+Simulates requests the way Django's handler sees them: request_started,
+one query, request_finished (which is where CONN_MAX_AGE and the pool
+decide whether to close or return the connection). Each configuration runs
+in a fresh process with the DB_* environment variables that
+pickme/settings.py reads, so the numbers reflect the real settings.
+
+    python benchmarks/db_connections.py [--requests 500]
+
+Uses the same database settings as the app (DB_HOST, DB_SSLMODE, ...).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CONFIGS = (
+    ('new connection per request', {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '0'}),
+    ('persistent (CONN_MAX_AGE=60)', {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '60'}),
+    ('psycopg pool', {'DB_POOL': 'True'}),
+)
+
+
+def run(requests):
+    import django
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pickme.settings')
+    django.setup()
+
+    from django.core.signals import request_finished, request_started
+    from django.db import connection
+
+    backends = set()
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            backends.add(cursor.fetchone()[0])
+        request_finished.send(sender=None)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(json.dumps({
+        'mean': statistics.mean(timings),
+        'p50': timings[len(timings) // 2],
+        'p99': timings[int(len(timings) * 0.99) - 1],
+        # Distinct server processes, i.e. physical connections opened
+        'connections': len(backends),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run(args.requests)
+        return
+
+    print(f'{"configuration":32} {"mean ms":>9} {"p50 ms":>9} {"p99 ms":>9} {"connections":>12}')
+    for name, env in CONFIGS:
+        output = subprocess.run(
+            [sys.executable, __file__, '--worker', '--requests', str(args.requests)],
+            env={**os.environ, **env},
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f'{name:32} {result["mean"]:9.3f} {result["p50"]:9.3f} '
+            f'{result["p99"]:9.3f} {result["connections"]:12d}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+"""
+Gunicorn settings.
+
+SERVER_MODE=wsgi (default) runs pickme.wsgi with sync workers, one request
+per worker process at a time. SERVER_MODE=asgi runs pickme.asgi under
+uvicorn workers: async views (pickme/async_views.py) then wait on the
+database without holding a worker, so a worker serves many connections.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '3'))
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    wsgi_app = 'pickme.asgi:application'
+else:
+    wsgi_app = 'pickme.wsgi:application'
@@ -0,0 +1,63 @@
+"""
+Async request handling for DRF views.
+
+DRF's APIView.dispatch is synchronous. Under ASGI Django runs such a view in
+a worker thread for the whole request, so a request waiting on PostgreSQL
+ties up a thread. AsyncViewMixin makes the view a coroutine: handlers
+defined with `async def` run on the event loop and await the async ORM,
+everything else keeps working unchanged:
+
+- authentication, permission and throttle checks (initial()) run in one
+  sync_to_async call, they read the cache and, on a miss, the database
+- handlers that are still plain methods (writes, generic mixins) run in
+  sync_to_async as a whole, so the usual transaction and ORM rules apply
+
+Serializers read the representation cache and may touch lazy relations, so
+async handlers call them through aserialize().
+
+Under WSGI an async view is run by Django in a fresh event loop per request,
+which costs a little but behaves the same.
+"""
+import inspect
+
+from asgiref.sync import sync_to_async
+
+
+class AsyncViewMixin:
+    """Serve a DRF view as a coroutine; see the module docstring."""
+    view_is_async = True
+
+    def dispatch(self, request, *args, **kwargs):
+        return self.adispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        # APIView.dispatch with the handler awaited
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if inspect.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+async def aserialize(serializer):
+    """`serializer.data`, computed off the event loop."""
+    return await sync_to_async(lambda: serializer.data)()
@@ -0,0 +1,76 @@
+"""
+Fetching many objects by id in one request: GET .../batch/?ids=3,1,2
+
+Clients hydrating notifications or cached lists would otherwise request
+each object separately. BatchView loads all requested ids with a single
+queryset (its prefetches run once for the whole batch) and answers in
+request order, repeated ids once, each with a status:
+
+    {"results": [
+        {"id": 3, "status": "ok", "data": {...}},
+        {"id": 1, "status": "not_found", "data": null},
+        {"id": 2, "status": "forbidden", "data": null}
+    ]}
+
+At most BATCH_MAX_IDS ids per request.
+"""
+from django.conf import settings
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view, inline_serializer
+from rest_framework import generics, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+def batch_schema(serializer_class, parameters=()):
+    """extend_schema_view() describing a BatchView of `serializer_class`."""
+    name = serializer_class.__name__.removesuffix('Serializer')
+    return extend_schema_view(get=extend_schema(
+        parameters=[
+            OpenApiParameter('ids', str, required=True, description='Comma-separated ids'),
+            *parameters,
+        ],
+        responses=inline_serializer(f'{name}Batch', {
+            'results': inline_serializer(f'{name}BatchItem', {
+                'id': serializers.IntegerField(),
+                'status': serializers.ChoiceField(['ok', 'not_found', 'forbidden']),
+                'data': serializer_class(allow_null=True),
+            }, many=True),
+        }),
+    ))
+
+
+class BatchView(generics.GenericAPIView):
+    pagination_class = None
+
+    def get_ids(self):
+        value = self.request.query_params.get('ids', '')
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in value.split(',') if pk.strip()))
+        except ValueError:
+            raise ValidationError({'ids': ['Expected comma-separated integers.']})
+        if not ids:
+            raise ValidationError({'ids': ['This parameter is required.']})
+        if len(ids) > settings.BATCH_MAX_IDS:
+            raise ValidationError({'ids': [f'At most {settings.BATCH_MAX_IDS} ids per request.']})
+        return ids
+
+    def can_view(self, obj):
+        return True
+
+    def get(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        found = {obj.pk: obj for obj in self.get_queryset().filter(pk__in=ids)}
+        visible = [obj for obj in found.values() if self.can_view(obj)]
+        data = dict(zip(
+            (obj.pk for obj in visible),
+            self.get_serializer(visible, many=True).data,
+        ))
+
+        results = []
+        for pk in ids:
+            if pk in data:
+                results.append({'id': pk, 'status': 'ok', 'data': data[pk]})
+            else:
+                status = 'forbidden' if pk in found else 'not_found'
+                results.append({'id': pk, 'status': status, 'data': None})
+        return Response({'results': results})
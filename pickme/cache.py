@@ -0,0 +1,250 @@
+"""
+Two-tier cache and helpers for caching hot reads.
+
+TieredCache puts a small in-process cache (L1) in front of a shared one
+(L2, Redis in production). Reads are served from L1 when possible, writes
+and deletes go to both. A delete only reaches the L1 of the worker that
+issued it, so other workers may serve a stale value for at most
+CACHE_LOCAL_TIMEOUT seconds; keep that short and use versioned keys or
+shared_cache() for data that must change everywhere at once.
+
+Helpers:
+    versioned_key()/bump_version() - namespace-wide invalidation in O(1)
+    get_or_compute() - single-flight recomputation with early refresh, so an
+        expiring hot key is rebuilt by one worker while others keep serving
+        the previous value; aget_or_compute() is the same for async views
+"""
+import asyncio
+import math
+import random
+import time
+
+from django.core.cache import cache as default_cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class TieredCache(BaseCache):
+    """Cache backend composed of two other configured cache aliases.
+
+    OPTIONS:
+        LOCAL - alias of the in-process cache (L1)
+        SHARED - alias of the shared cache (L2)
+        LOCAL_TIMEOUT - upper bound for how long L1 keeps a value
+
+    LOCAL_TIMEOUT is also the staleness bound. Writes cap the L1 copy at the
+    timeout they were given, but a value filled into L1 from an L2 hit is kept
+    for the full LOCAL_TIMEOUT: the remaining L2 lifetime is unknown without
+    another round trip. Each process may therefore serve a value for up to
+    LOCAL_TIMEOUT seconds after it expired in L2, as after a delete or
+    incr() issued by another process. Data that must not outlive its L2
+    entry goes through shared_cache().
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._local_alias = options.get('LOCAL', 'local')
+        self._shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+
+    @property
+    def local(self):
+        return caches[self._local_alias]
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_timeout(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return max(0, min(self.local_timeout, timeout - time.time()))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self.local.set(key, value, self._local_timeout(timeout), version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        sentinel = object()
+        value = self.local.get(key, sentinel, version)
+        if value is not sentinel:
+            return value
+        value = self.shared.get(key, sentinel, version)
+        if value is sentinel:
+            return default
+        # Full LOCAL_TIMEOUT, whatever the L2 entry has left (see the class)
+        self.local.set(key, value, self.local_timeout, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self.local.set(key, value, self._local_timeout(timeout), version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(key, version)
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version)
+        return self.shared.delete(key, version)
+
+    def get_many(self, keys, version=None):
+        found = self.local.get_many(keys, version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            if shared:
+                self.local.set_many(shared, self.local_timeout, version)
+            found.update(shared)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        self.local.set_many(data, self._local_timeout(timeout), version)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        self.local.delete_many(keys, version)
+        self.shared.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        return self.local.has_key(key, version) or self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        # Counters live in L2 only, L1 would hide other workers' increments
+        self.local.delete(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def shared_cache(cache=None):
+    """The L2 of `cache` (default: the default cache), or `cache` itself if it has one tier."""
+    cache = cache or default_cache
+    return getattr(cache, 'shared', cache)
+
+
+def shared_across_workers(cache=None):
+    """Whether every worker process sees the L2 of `cache`.
+
+    Not with CACHE_URL unset, where the L2 is a LocMemCache in each process:
+    what one worker writes there the others never see.
+    """
+    return not isinstance(shared_cache(cache), LocMemCache)
+
+
+def _version_cache(cache):
+    # Versions are read from L2 directly: a bump must be seen by every worker
+    # immediately, not after their L1 copy expires
+    return shared_cache(cache)
+
+
+def get_version(namespace, cache=None):
+    cache = _version_cache(cache)
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        cache.add(_version_key(namespace), 1, timeout=None)
+        version = cache.get(_version_key(namespace), 1)
+    return version
+
+
+def bump_version(namespace, cache=None):
+    """Invalidate every key built with versioned_key(namespace, ...)."""
+    cache = _version_cache(cache)
+    try:
+        return cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.add(_version_key(namespace), 2, timeout=None)
+        return cache.get(_version_key(namespace), 2)
+
+
+def versioned_key(namespace, *parts, cache=None):
+    suffix = ':'.join(str(part) for part in parts)
+    return f'{namespace}:v{get_version(namespace, cache)}:{suffix}'
+
+
+def get_or_compute(key, compute, timeout, cache=None, beta=1.0, lock_timeout=10, wait=0.5):
+    """Return the cached value for `key`, computing it at most once at a time.
+
+    Values are stored with their expiry and the time it took to compute them.
+    Shortly before expiry a caller may refresh early (probabilistic early
+    expiration, more likely the closer the deadline and the slower the
+    computation), so hot keys rarely expire under load. Recomputation is
+    guarded by a lock in the cache: the lock holder recomputes, everyone
+    else keeps getting the previous value or, if there is none, waits up to
+    `wait` seconds for the lock holder before computing it themselves.
+    """
+    cache = cache or default_cache
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and _fresh(entry, now, beta):
+        return entry[0]
+
+    lock_key = f'lock:{key}'
+    if not cache.add(lock_key, 1, lock_timeout):
+        if entry is not None:
+            return entry[0]
+        deadline = now + wait
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        return compute()
+
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, time.time() + timeout, delta), timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def _fresh(entry, now, beta):
+    _, expires_at, delta = entry
+    return now - delta * beta * math.log(random.random() or 1e-12) < expires_at
+
+
+async def aget_or_compute(key, compute, timeout, cache=None, beta=1.0, lock_timeout=10, wait=0.5):
+    """get_or_compute() for async code: `compute` is a coroutine function."""
+    cache = cache or default_cache
+    entry = await cache.aget(key)
+    now = time.time()
+    if entry is not None and _fresh(entry, now, beta):
+        return entry[0]
+
+    lock_key = f'lock:{key}'
+    if not await cache.aadd(lock_key, 1, lock_timeout):
+        if entry is not None:
+            return entry[0]
+        deadline = now + wait
+        while time.time() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await cache.aget(key)
+            if entry is not None:
+                return entry[0]
+        return await compute()
+
+    try:
+        started = time.time()
+        value = await compute()
+        delta = time.time() - started
+        await cache.aset(key, (value, time.time() + timeout, delta), timeout)
+        return value
+    finally:
+        await cache.adelete(lock_key)
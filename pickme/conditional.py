@@ -0,0 +1,95 @@
+"""
+Conditional GET: ETag and Last-Modified validators for read views.
+
+A view with ConditionalGetMixin implements get_validators(), returning a
+version of what GET would render, built from a few columns (updated_at
+values, counts and newest ids of related rows) without loading the related
+objects or rendering anything. A request whose If-None-Match or
+If-Modified-Since matches is answered 304 from initial(), before the
+handler runs, so neither the body's queries nor its serialization happen.
+
+The ETag also covers the viewer, the query string (fields, cursor, ...),
+the host (media URLs are absolute) and the negotiated format. Last-Modified
+is only sent by views where one timestamp moves with every change of the
+body. Responses with validators are `Cache-Control: private, no-cache`:
+clients may keep them but revalidate every time.
+"""
+import hashlib
+
+from django.db.models import CharField, Subquery, Value
+from django.db.models.functions import Cast, Concat
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def version_subquery(queryset, *aggregates):
+    """`aggregates` of `queryset` joined into one text column, as a subquery.
+
+    `queryset` filters on an OuterRef and is grouped by that column with
+    .values(), e.g. the likes of each post. Count() and Max('pk') together
+    change whenever rows come or go: additions raise the newest id, removals
+    alone lower the count.
+    """
+    parts = []
+    for aggregate in aggregates:
+        parts.extend((Cast(aggregate, CharField()), Value('|')))
+    return Subquery(queryset.order_by().annotate(
+        version=Concat(*parts[:-1], output_field=CharField())
+    ).values('version'))
+
+
+class _ConditionalResponse(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Answer GET with 304 when the client's copy is current; see the module docstring."""
+    etag = None
+    last_modified = None
+
+    def get_validators(self):
+        """(version, last_modified) of the GET response, or None for no validators.
+
+        `version` is any value with a stable repr(), `last_modified` an aware
+        datetime or None. Runs after authentication and permission checks;
+        return None when the handler would fail (not found, not visible).
+        """
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return
+        validators = self.get_validators()
+        if validators is None:
+            return
+
+        version, last_modified = validators
+        key = repr((
+            version,
+            request.user.pk,
+            request.get_full_path(),
+            request.get_host(),
+            request.accepted_media_type,
+        ))
+        self.etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        if last_modified is not None:
+            self.last_modified = int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        if response is not None:
+            raise _ConditionalResponse(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _ConditionalResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag is not None and response.status_code in (200, 304):
+            response.headers['ETag'] = self.etag
+            if self.last_modified is not None:
+                response.headers['Last-Modified'] = http_date(self.last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
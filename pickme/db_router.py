@@ -0,0 +1,136 @@
+"""
+Routing of read-only requests to PostgreSQL replicas.
+
+Writes, and by default all reads, go to `default`. DRF views that inherit
+ReplicaReadMixin serve their GET/HEAD/OPTIONS requests from one of
+READ_REPLICAS, picked once per request, except when:
+
+- the user made a successful write in the last REPLICA_STICKY_SECONDS
+  seconds, so they always see their own changes despite replication lag
+  (ReplicaStickinessMiddleware pins them to the primary);
+- the view sets `use_read_replica = False`;
+- the code runs inside `with primary():`.
+
+Other users may see a write up to the replication lag late.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def _pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def pin_to_primary(user):
+    """Send `user`'s reads to the primary for REPLICA_STICKY_SECONDS."""
+    if settings.READ_REPLICAS and user is not None and user.is_authenticated:
+        cache.set(_pin_key(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user):
+    if user is None or not user.is_authenticated:
+        return False
+    return bool(cache.get(_pin_key(user.pk)))
+
+
+@contextmanager
+def read_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def primary():
+    """Context manager reading from the primary even in a replica view."""
+    return read_from(None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Explicit, otherwise saving an instance read from a replica would be
+        # routed back to that replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.READ_REPLICAS
+
+
+class ReplicaReadMixin:
+    """Serve safe requests of a DRF view from a read replica."""
+    use_read_replica = True
+
+    def dispatch(self, request, *args, **kwargs):
+        if getattr(self, 'view_is_async', False):
+            return self._adispatch(request, *args, **kwargs)
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    async def _adispatch(self, request, *args, **kwargs):
+        # The coroutine may run in another context than the one dispatch()
+        # was called in, so set and clear the alias around awaiting it
+        _read_alias.set(None)
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.set(None)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # After authentication, so read-your-writes can be checked per user
+        if (
+            self.use_read_replica
+            and settings.READ_REPLICAS
+            and request.method in SAFE_METHODS
+            and not is_pinned(request.user)
+        ):
+            _read_alias.set(random.choice(settings.READ_REPLICAS))
+
+
+class ReplicaStickinessMiddleware:
+    """Pin users to the primary for a short while after a successful write."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._is_write(request, response):
+            pin_to_primary(getattr(request, 'user', None))
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._is_write(request, response):
+            await sync_to_async(pin_to_primary)(getattr(request, 'user', None))
+        return response
+
+    def _is_write(self, request, response):
+        # DRF stores the authenticated user on the underlying request
+        return request.method not in SAFE_METHODS and response.status_code < 400
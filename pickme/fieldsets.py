@@ -0,0 +1,110 @@
+"""
+Sparse fieldsets: ?fields=, ?omit= and ?expand= on read endpoints.
+
+Serializers with FieldSelectionMixin render what the request asks for:
+
+    ?fields=id,text_content,likes_count    only these fields
+    ?omit=liked_by,audience_groups_detail  every field but these
+    ?expand=author                         nested objects to render in full
+
+Nested objects a serializer lists in `expandable_fields` and the request
+does not expand are rendered as their id instead; `?expand=` (empty)
+collapses all of them. Without any of the parameters every field is
+rendered and expanded, as before. Unknown field names are a 400.
+
+Views pass select_fields() of the request to their querysets, so the joins,
+prefetches and annotations behind fields that are not rendered are skipped
+as well.
+"""
+from functools import cached_property
+
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+# For extend_schema(parameters=...) of views rendering such serializers
+FIELDSET_PARAMETERS = [
+    OpenApiParameter('fields', str, description='Comma-separated fields to render'),
+    OpenApiParameter('omit', str, description='Comma-separated fields to leave out'),
+    OpenApiParameter(
+        'expand',
+        str,
+        description='Comma-separated nested objects to render in full, the others '
+                    'are rendered as ids. All are expanded when not given.'
+    ),
+]
+
+
+class FieldSelection:
+    """The fields of a serializer to render, in declaration order."""
+
+    def __init__(self, fields, expanded, is_default):
+        self.fields = fields
+        self.expanded = expanded
+        self.is_default = is_default
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def expands(self, name):
+        """Whether `name` is rendered as a nested object."""
+        return name in self.fields and name in self.expanded
+
+
+def _names(request, param):
+    value = request.query_params.get(param) if request is not None else None
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def select_fields(request, serializer_class):
+    """The FieldSelection `request` asks of `serializer_class`."""
+    declared = serializer_class.Meta.fields
+    expandable = serializer_class.expandable_fields
+    fields, omit, expand = (_names(request, param) for param in ('fields', 'omit', 'expand'))
+
+    errors = {}
+    for param, names, known in (('fields', fields, declared), ('omit', omit, declared),
+                                ('expand', expand, expandable)):
+        unknown = sorted((names or set()) - set(known))
+        if unknown:
+            errors[param] = [f'Unknown field: {name}' for name in unknown]
+    if errors:
+        raise ValidationError(errors)
+
+    return FieldSelection(
+        [name for name in declared
+         if (fields is None or name in fields) and (omit is None or name not in omit)],
+        set(expandable) if expand is None else expand,
+        fields is None and omit is None and expand is None,
+    )
+
+
+class FieldSelectionMixin:
+    """Render the fields selected by the request; see the module docstring."""
+    expandable_fields = ()
+
+    @cached_property
+    def selection(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        # Only the serializer a view renders, not nested uses of it
+        request = self.context.get('request') if parent is None else None
+        return select_fields(request, type(self))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.selection
+        if selection.is_default:
+            return fields
+
+        selected = {}
+        for name, field in fields.items():
+            if name not in selection:
+                continue
+            if name in self.expandable_fields and not selection.expands(name):
+                field = serializers.PrimaryKeyRelatedField(read_only=True)
+            selected[name] = field
+        return selected
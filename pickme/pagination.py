@@ -0,0 +1,167 @@
+import json
+import math
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (seek) pagination over a unique composite key.
+
+    Unlike DRF's CursorPagination, which keys on a single field plus an
+    offset, the cursor here carries the full (created_at, id) position of the
+    page boundary, so every page is `WHERE (created_at, id) < (...) LIMIT n`
+    and costs the same however deep the client scrolls. No COUNT query is run.
+    """
+    ordering = ('-created_at', '-id')
+    # Type of each ordering field's value in the cursor
+    position_types = {'created_at': datetime, 'id': int}
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        # The keyset must match the cursor; client ordering is not supported
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() fetching the page with the async ORM."""
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._set_page([item async for item in queryset])
+
+    def page_queryset(self, queryset, request):
+        """The slice of `queryset` holding the requested page plus one row."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.position, self.reverse = None, False
+        else:
+            self.position, self.reverse = self.cursor
+
+        return self.seek(queryset, self._ordering(self.reverse), self.position, self.page_size + 1)
+
+    def seek(self, queryset, ordering, position, limit):
+        """The first `limit` rows of `queryset` in `ordering` after `position` (None: from the top)."""
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+        return queryset[:limit]
+
+    def _set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+
+        if self.reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Went back past the first item, restart from the top
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor((self._position(self.page[-1]), False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor((self._position(self.page[0]), True))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = data['p'], bool(data['r'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                self._parse_value(value, self.position_types[field.lstrip('-')])
+                for field, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def _parse_value(value, kind):
+        # The values come from the client, check them before they reach a query
+        if kind is datetime:
+            if not isinstance(value, str):
+                raise TypeError(value)
+            value = datetime.fromisoformat(value)
+            if value.tzinfo is None:
+                raise ValueError(value)
+            return value
+        if isinstance(value, bool):
+            raise TypeError(value)
+        if kind is int and isinstance(value, int):
+            return value
+        if kind is float and isinstance(value, (int, float)) and math.isfinite(value):
+            return float(value)
+        raise TypeError(value)
+
+    def encode_cursor(self, cursor):
+        position, reverse = cursor
+        data = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = urlsafe_b64encode(data.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _ordering(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(f[1:] if f.startswith('-') else f'-{f}' for f in self.ordering)
+
+    def _position(self, instance):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            # Model instances or .values() rows
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            values.append(value)
+        return values
+
+    def _after(self, ordering, position):
+        """Lexicographic "comes after `position`" condition for `ordering`."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        # Leading-column bound lets the planner seek the index directly
+        first = ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': position[0]}) & condition
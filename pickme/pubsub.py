@@ -0,0 +1,161 @@
+"""
+Publish/subscribe for pushing events to open client streams.
+
+publish() may be called from any sync code (views, signal handlers, jobs).
+subscribe() is used by async stream views and yields every message
+published afterwards, as a JSON-compatible dict.
+
+The broker is chosen by LIVE_BROKER:
+    local - messages only reach subscribers in the publishing process;
+        enough for a single worker and for tests
+    redis - one Redis pub/sub channel (LIVE_REDIS_URL); every process
+        keeps a single subscription to it and hands messages on to its own
+        subscribers, so all workers see every message
+    a dotted path - a LocalBroker subclass of your own
+
+Delivery is best effort: a failed publish is logged and dropped, and a
+subscriber that falls LIVE_QUEUE_SIZE messages behind is disconnected
+(clients reconnect and reload what they show).
+"""
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, message):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Next message, or None after `timeout` seconds without one.
+
+        Stop reading once `overflowed` is set: messages were lost.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """Delivers messages to subscribers of this process."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        self.deliver(message)
+
+    def deliver(self, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # The subscriber's loop is closed, it unsubscribes shortly
+                pass
+
+    async def listen(self):
+        """Make sure messages from other processes reach this one."""
+
+    @asynccontextmanager
+    async def subscribe(self):
+        await self.listen()
+        subscription = Subscription(settings.LIVE_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                self._subscriptions.discard(subscription)
+
+
+class RedisBroker(LocalBroker):
+    """Fans messages out to all processes through a Redis channel."""
+
+    def __init__(self):
+        super().__init__()
+        import redis
+
+        self.channel = f'{settings.CACHE_KEY_PREFIX}:live'
+        self._client = redis.Redis.from_url(settings.LIVE_REDIS_URL)
+        self._listener = None
+
+    def publish(self, message):
+        try:
+            self._client.publish(self.channel, json.dumps(message))
+        except Exception:
+            logger.exception('Cannot publish live event')
+
+    async def listen(self):
+        listener = self._listener
+        if listener is None or listener.done() or listener.get_loop() is not asyncio.get_running_loop():
+            ready = asyncio.Event()
+            self._listener = asyncio.create_task(self._listen(ready))
+            await ready.wait()
+
+    async def _listen(self, ready):
+        import redis.asyncio
+
+        while True:
+            client = redis.asyncio.Redis.from_url(settings.LIVE_REDIS_URL)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    ready.set()
+                    async for item in pubsub.listen():
+                        if item['type'] == 'message':
+                            self.deliver(json.loads(item['data']))
+            except Exception:
+                logger.exception('Live event subscription lost, reconnecting')
+                ready.set()
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+BROKERS = {
+    'local': LocalBroker,
+    'redis': RedisBroker,
+}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            name = settings.LIVE_BROKER
+            broker_class = BROKERS[name] if name in BROKERS else import_string(name)
+            _broker = broker_class()
+        return _broker
+
+
+def publish(message):
+    get_broker().publish(message)
+
+
+def subscribe():
+    """Async context manager yielding a Subscription."""
+    return get_broker().subscribe()
@@ -0,0 +1,45 @@
+"""
+JSON rendering with orjson.
+
+FastJSONRenderer writes the same bytes as DRF's JSONRenderer with the default
+settings (compact, UTF-8, U+2028 and U+2029 escaped), several times faster.
+Values orjson has no native encoding for (datetimes, Decimal, lazy
+translations, querysets, ...) go through DRF's encoder, so they come out as
+before. Known differences: floats needing an exponent are spelled 1e16 rather
+than 1e+16, and NaN/Infinity render as null instead of raising.
+
+Without orjson installed, or when the client asks for indented output (the
+browsable API does), this is DRF's JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            # Integers over 64 bits, unknown types, lone surrogates...: let
+            # the stdlib encoder render them or raise its usual error
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same as JSONRenderer: these are valid JSON but not valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -1,3 +1,4 @@
+import copy
 import os
 from pathlib import Path
 from datetime import timedelta
@@ -13,6 +14,9 @@ DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
+# 'wsgi' or 'asgi', the way gunicorn serves the app (gunicorn.conf.py)
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -20,6 +24,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third party
     'rest_framework',
     'rest_framework_simplejwt',
@@ -32,6 +37,8 @@ INSTALLED_APPS = [
     'apps.users',
     'apps.posts',
     'apps.groups',
+    'apps.uploads',
+    'apps.jobs',
 ]
 
 MIDDLEWARE = [
@@ -42,9 +49,14 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'pickme.db_router.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if SERVER_MODE == 'asgi':
+    # WhiteNoise is sync-only and would pin every request to a thread for
+    # its whole duration; nginx serves /static/ in that deployment
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
 
 ROOT_URLCONF = 'pickme.urls'
 
@@ -87,7 +99,97 @@ else:
 # SSL mode for managed PostgreSQL (Yandex Cloud requires SSL)
 db_sslmode = os.getenv('DB_SSLMODE', '')
 if db_sslmode:
-    DATABASES['default']['OPTIONS'] = {'sslmode': db_sslmode}
+    DATABASES['default'].setdefault('OPTIONS', {})['sslmode'] = db_sslmode
+
+# Connection reuse. Opening a connection (plus a TLS handshake with
+# DB_SSLMODE) on every request is expensive, so by default each worker keeps
+# its connection for DB_CONN_MAX_AGE seconds and checks it is still alive
+# before reusing it. DB_POOL switches to the psycopg 3 connection pool
+# instead: connections are shared between the threads of a worker, which
+# matters for threaded/async workers. Django does not allow both, so
+# CONN_MAX_AGE is forced to 0 when the pool is on.
+# Under ASGI requests run their database work in short-lived threads, so
+# persistent per-thread connections would never be reused: the pool is on by
+# default there.
+DB_POOL = os.getenv('DB_POOL', 'True' if SERVER_MODE == 'asgi' else 'False').lower() == 'true'
+DATABASES['default']['CONN_MAX_AGE'] = 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true'
+if DB_POOL:
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        # Seconds to wait for a free connection before failing the request
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        # Idle connections above min_size are closed after this many seconds
+        'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        # Connections are recycled after this many seconds
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+    }
+
+# Read replicas (see pickme/db_router.py): comma-separated host[:port] list,
+# connected to with the primary's name and credentials. In tests they mirror
+# the test database.
+READ_REPLICAS = []
+for _index, _replica in enumerate(
+    host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()
+):
+    _host, _, _port = _replica.partition(':')
+    _alias = f'replica_{_index}'
+    DATABASES[_alias] = copy.deepcopy(DATABASES['default'])
+    DATABASES[_alias].update({
+        'HOST': _host,
+        'PORT': _port or DATABASES['default'].get('PORT', ''),
+        'TEST': {'MIRROR': 'default'},
+    })
+    READ_REPLICAS.append(_alias)
+DATABASE_ROUTERS = ['pickme.db_router.ReplicaRouter']
+# Seconds a user's reads stay on the primary after they write something
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+
+# Cache: in-process L1 in front of a shared L2 (see pickme/cache.py).
+# Without CACHE_URL the L2 is also in-process, which is only suitable for a
+# single worker (development, tests).
+CACHE_URL = os.getenv('CACHE_URL', '')
+CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'pickme')
+CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', '300'))
+
+if CACHE_URL:
+    _shared_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+        'KEY_PREFIX': CACHE_KEY_PREFIX,
+        'TIMEOUT': CACHE_DEFAULT_TIMEOUT,
+    }
+else:
+    _shared_cache = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pickme-shared',
+        'TIMEOUT': CACHE_DEFAULT_TIMEOUT,
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'pickme.cache.TieredCache',
+        'TIMEOUT': CACHE_DEFAULT_TIMEOUT,
+        'OPTIONS': {
+            'LOCAL': 'local',
+            'SHARED': 'shared',
+            # Also how long a process may serve a value after it expired or
+            # was deleted in L2: copies read from L2 are kept this long
+            # regardless of the L2 entry's remaining lifetime
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', '5')),
+        },
+    },
+    # LocMemCache evicts least recently used entries past MAX_ENTRIES
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pickme-local',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', '10000')),
+        },
+    },
+    'shared': _shared_cache,
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -106,7 +208,8 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # Media files and Storage configuration (Django 4.2+ format)
-if os.getenv('USE_S3', 'False').lower() == 'true':
+USE_S3 = os.getenv('USE_S3', 'False').lower() == 'true'
+if USE_S3:
     AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
     AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
@@ -146,7 +249,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -156,6 +259,10 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'pickme.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -168,8 +275,13 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_REFRESH_SERIALIZER': 'apps.users.serializers.CustomTokenRefreshSerializer',
 }
 
+# How long ClaimsJWTAuthentication trusts a cached "user exists and is
+# active" check (apps/users/authentication.py)
+AUTH_USER_STATE_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_STATE_CACHE_TIMEOUT', '60'))
+
 # CORS
 _cors_origins = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000')
 if _cors_origins == '*':
@@ -192,6 +304,73 @@ SUPERUSER_EMAIL = os.getenv('SUPERUSER_EMAIL', 'admin@pickme.local')
 SUPERUSER_USERNAME = os.getenv('SUPERUSER_USERNAME', 'admin')
 SUPERUSER_PASSWORD = os.getenv('SUPERUSER_PASSWORD', 'admin123secure')
 
+# Home timeline (see apps/posts/timeline.py)
+# In hybrid mode public posts are merged into feeds at read time instead of
+# being fanned out to every user's timeline.
+TIMELINE_HYBRID_MODE = os.getenv('TIMELINE_HYBRID_MODE', 'True').lower() == 'true'
+TIMELINE_FANOUT_BATCH_SIZE = int(os.getenv('TIMELINE_FANOUT_BATCH_SIZE', '1000'))
+
+# Cached per-user group memberships (apps/groups/membership.py)
+GROUP_MEMBERSHIP_CACHE_TIMEOUT = int(os.getenv('GROUP_MEMBERSHIP_CACHE_TIMEOUT', '300'))
+
+# Viewer-independent part of serialized posts (PostSerializer)
+POST_REPR_CACHE_TIMEOUT = int(os.getenv('POST_REPR_CACHE_TIMEOUT', '3600'))
+
+# Number of most recent likers embedded in each serialized post; the full
+# list is paged through GET /api/posts/<id>/likes/
+POSTS_LIKED_BY_PREVIEW_SIZE = int(os.getenv('POSTS_LIKED_BY_PREVIEW_SIZE', '3'))
+
+# Most ids accepted by /api/posts/batch/ and /api/users/batch/ (pickme/batch.py)
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', '100'))
+
+# Delta sync of the feed (apps/posts/sync.py): how far back each sync
+# re-reads to catch late commits (seconds), most changes per response and
+# how long tombstones of deleted posts are kept (`manage.py prune_post_tombstones`)
+SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', '5'))
+SYNC_MAX_CHANGES = int(os.getenv('SYNC_MAX_CHANGES', '500'))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '30'))
+
+# How long /api/users/search/ results for a query are cached (seconds)
+USER_SEARCH_CACHE_TIMEOUT = int(os.getenv('USER_SEARCH_CACHE_TIMEOUT', '30'))
+
+# Direct-to-storage uploads (apps/uploads): how long an upload URL stays
+# valid and size limits per purpose, in bytes. These files never pass
+# through Django when USE_S3 is on, so they are not bound by the limits below.
+UPLOAD_INTENT_TIMEOUT = int(os.getenv('UPLOAD_INTENT_TIMEOUT', '3600'))
+AVATAR_MAX_UPLOAD_SIZE = int(os.getenv('AVATAR_MAX_UPLOAD_SIZE', str(5 * 1024 * 1024)))
+POST_MEDIA_MAX_UPLOAD_SIZE = int(os.getenv('POST_MEDIA_MAX_UPLOAD_SIZE', str(100 * 1024 * 1024)))
+
+# Image variants rendered by the job workers and `manage.py process_media`
+# (apps/uploads/images.py). IMAGE_PROCESSES sizes the resizing process pool
+# of a worker (empty: number of CPUs, 0: render in the worker thread).
+IMAGE_PROCESSES = int(os.getenv('IMAGE_PROCESSES')) if os.getenv('IMAGE_PROCESSES') else None
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv('IMAGE_VARIANT_WIDTHS', '320,640,1080').split(',')]
+IMAGE_THUMBNAIL_SIZE = int(os.getenv('IMAGE_THUMBNAIL_SIZE', '160'))
+AVATAR_VARIANT_WIDTHS = [int(w) for w in os.getenv('AVATAR_VARIANT_WIDTHS', '64,128,256').split(',')]
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', '80'))
+
+# Background jobs (apps/jobs), run by `manage.py run_workers`. JOBS_EAGER runs
+# them inline at enqueue time instead (tests). Failed jobs are retried after
+# JOBS_BACKOFF_BASE * 2^(attempt - 1) seconds, capped at JOBS_BACKOFF_MAX;
+# a job running longer than JOBS_LOCK_TIMEOUT is assumed lost and requeued.
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False').lower() == 'true'
+JOBS_CONCURRENCY = int(os.getenv('JOBS_CONCURRENCY', '4'))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', '1'))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', '5'))
+JOBS_BACKOFF_BASE = int(os.getenv('JOBS_BACKOFF_BASE', '10'))
+JOBS_BACKOFF_MAX = int(os.getenv('JOBS_BACKOFF_MAX', '3600'))
+JOBS_LOCK_TIMEOUT = int(os.getenv('JOBS_LOCK_TIMEOUT', '600'))
+
+# Live updates stream (GET /api/posts/stream/, apps/posts/live.py). Needs
+# SERVER_MODE=asgi. LIVE_BROKER is 'local' (single process), 'redis' or a
+# dotted path, see pickme/pubsub.py. Streams send a heartbeat comment every
+# LIVE_HEARTBEAT seconds and are closed when LIVE_QUEUE_SIZE events behind.
+LIVE_BROKER = os.getenv('LIVE_BROKER', 'redis' if CACHE_URL else 'local')
+LIVE_REDIS_URL = os.getenv('LIVE_REDIS_URL', CACHE_URL)
+LIVE_QUEUE_SIZE = int(os.getenv('LIVE_QUEUE_SIZE', '100'))
+LIVE_HEARTBEAT = float(os.getenv('LIVE_HEARTBEAT', '15'))
+LIVE_RETRY_MS = int(os.getenv('LIVE_RETRY_MS', '5000'))
+
 # File upload limits
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
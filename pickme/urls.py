@@ -4,12 +4,16 @@ from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from apps.posts.views import SyncView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('apps.users.urls.auth_urls')),
     path('api/users/', include('apps.users.urls.user_urls')),
     path('api/posts/', include('apps.posts.urls')),
     path('api/friend-groups/', include('apps.groups.urls')),
+    path('api/uploads/', include('apps.uploads.urls')),
+    path('api/sync/', SyncView.as_view(), name='sync'),
     # API Documentation
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
@@ -1,5 +1,11 @@
+import copy
+
+import fakeredis
 import pytest
 from rest_framework.test import APIClient
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
 from django.contrib.auth import get_user_model
 from apps.groups.models import FriendGroup
 from apps.posts.models import Post
@@ -7,6 +13,47 @@ from apps.posts.models import Post
 User = get_user_model()
 
 
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    # A `replica` alias mirroring the test database, for the read replica
+    # router tests. Unused unless a test sets READ_REPLICAS.
+    replica = copy.deepcopy(settings.DATABASES['default'])
+    replica['TEST'] = {'MIRROR': 'default'}
+    settings.DATABASES['replica'] = replica
+    connections.settings['replica'] = connections.configure_settings(settings.DATABASES)['replica']
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def redis_shared_cache(settings):
+    """Django's RedisCache as the shared tier, talking the Redis protocol to
+    an in-memory server (fakeredis): one L2 for all workers, as in production."""
+    settings.CACHES = {**settings.CACHES, 'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/0',
+        'KEY_PREFIX': 'test',
+        'OPTIONS': {
+            'connection_class': fakeredis.FakeConnection,
+            'server': fakeredis.FakeServer(),
+        },
+    }}
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def eager_jobs(settings):
+    # Background jobs run inline at enqueue time; tests of the queue itself
+    # turn this off again
+    settings.JOBS_EAGER = True
+    settings.IMAGE_PROCESSES = 0
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
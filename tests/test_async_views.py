@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import resolve, reverse
+from rest_framework import status
+from apps.posts.models import Post
+from apps.users.serializers import CustomTokenObtainPairSerializer
+
+
+@pytest.fixture
+def request_as_user(user):
+    """Make a request through AsyncClient, i.e. the ASGI handler."""
+    token = CustomTokenObtainPairSerializer.get_token(user).access_token
+
+    def request(method, url, **kwargs):
+        call = getattr(AsyncClient(), method)
+        return async_to_sync(call)(url, headers={'Authorization': f'Bearer {token}'}, **kwargs)
+    return request
+
+
+def test_read_views_are_coroutines():
+    for url in (
+        reverse('post-list-create'),
+        reverse('post-detail', kwargs={'pk': 1}),
+        reverse('post-like', kwargs={'pk': 1}),
+        reverse('user-search'),
+    ):
+        assert asyncio.iscoroutinefunction(resolve(url).func)
+
+
+@pytest.mark.django_db
+class TestAsyncViews:
+    def test_feed(self, request_as_user, post):
+        response = request_as_user('get', reverse('post-list-create'))
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.json()['results']] == [post.pk]
+
+    def test_detail_hides_private_post(self, request_as_user, another_user):
+        private = Post.objects.create(
+            author=another_user,
+            text_content='Only me',
+            audience_type=Post.AudienceType.ONLY_ME
+        )
+        response = request_as_user('get', reverse('post-detail', kwargs={'pk': private.pk}))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        response = request_as_user('get', reverse('post-detail', kwargs={'pk': private.pk + 1}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_like_and_unlike(self, request_as_user, post):
+        url = reverse('post-like', kwargs={'pk': post.pk})
+        response = request_as_user('post', url)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()['likes_count'] == 1
+        response = request_as_user('delete', url)
+        assert response.json()['likes_count'] == 0
+
+    def test_search(self, request_as_user, another_user):
+        response = request_as_user('get', reverse('user-search'), data={'q': 'anoth'})
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.json()['results']] == [another_user.pk]
+
+    def test_unauthenticated(self, post):
+        response = async_to_sync(AsyncClient().get)(reverse('post-list-create'))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
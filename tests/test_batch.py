@@ -0,0 +1,68 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from apps.posts.models import Post
+
+
+@pytest.fixture
+def private_post(another_user):
+    return Post.objects.create(
+        author=another_user,
+        text_content='Only me',
+        audience_type=Post.AudienceType.ONLY_ME
+    )
+
+
+@pytest.mark.django_db
+class TestPostBatch:
+    def test_request_order_and_markers(self, authenticated_client, post, private_post):
+        missing = private_post.pk + 100
+        response = authenticated_client.get(
+            reverse('post-batch'), {'ids': f'{missing},{post.pk},{private_post.pk},{post.pk}'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()['results']
+        assert [(item['id'], item['status']) for item in results] == [
+            (missing, 'not_found'),
+            (post.pk, 'ok'),
+            (private_post.pk, 'forbidden'),
+        ]
+        assert results[0]['data'] is None and results[2]['data'] is None
+        detail = authenticated_client.get(reverse('post-detail', kwargs={'pk': post.pk}))
+        assert results[1]['data'] == detail.json()
+
+    def test_constant_number_of_queries(self, authenticated_client, user, another_user,
+                                        django_assert_max_num_queries):
+        posts = [Post.objects.create(author=user, text_content=f'Post {i}') for i in range(20)]
+        for item in posts:
+            item.like(another_user)
+        ids = ','.join(str(item.pk) for item in posts)
+        # Viewer's groups (cached afterwards), posts, audience groups, likers
+        with django_assert_max_num_queries(4):
+            response = authenticated_client.get(reverse('post-batch'), {'ids': ids})
+        assert [item['status'] for item in response.json()['results']] == ['ok'] * 20
+
+    def test_fields(self, authenticated_client, post):
+        response = authenticated_client.get(reverse('post-batch'), {'ids': post.pk, 'fields': 'id,likes_count'})
+        assert response.json()['results'][0]['data'] == {'id': post.pk, 'likes_count': 0}
+
+    @pytest.mark.parametrize('ids', ['', 'a,1', ','.join(str(i) for i in range(101))])
+    def test_invalid_ids(self, authenticated_client, ids):
+        response = authenticated_client.get(reverse('post-batch'), {'ids': ids})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'ids' in response.json()
+
+
+@pytest.mark.django_db
+class TestUserBatch:
+    def test_public_profiles(self, authenticated_client, user, another_user, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            response = authenticated_client.get(
+                reverse('user-batch'), {'ids': f'{another_user.pk},0,{user.pk}'}
+            )
+        results = response.json()['results']
+        assert [(item['id'], item['status']) for item in results] == [
+            (another_user.pk, 'ok'), (0, 'not_found'), (user.pk, 'ok')
+        ]
+        assert results[0]['data']['username'] == another_user.username
+        assert 'email' not in results[2]['data']
@@ -0,0 +1,97 @@
+import pytest
+from django.core.cache import cache, caches
+from apps.groups import membership
+from pickme.cache import bump_version, get_or_compute, versioned_key
+
+
+@pytest.fixture(autouse=True, params=['locmem', 'redis'])
+def shared_tier(request):
+    """Run each test with an in-process L2 and with a Redis protocol one."""
+    if request.param == 'redis':
+        request.getfixturevalue('redis_shared_cache')
+    cache.clear()
+    yield request.param
+
+
+class TestTieredCache:
+    def test_shared_backend(self, shared_tier):
+        backend = type(caches['shared']).__name__
+        assert backend == ('RedisCache' if shared_tier == 'redis' else 'LocMemCache')
+
+    def test_reads_fill_local_tier(self):
+        caches['shared'].set('answer', 42)
+        assert cache.get('answer') == 42
+        assert caches['local'].get('answer') == 42
+
+    def test_local_tier_bounds_staleness(self):
+        cache.set('answer', 1)
+        # Another worker changes the shared value; this worker's L1 still has
+        # the old one until it expires
+        caches['shared'].set('answer', 2)
+        assert cache.get('answer') == 1
+        caches['local'].delete('answer')
+        assert cache.get('answer') == 2
+
+    def test_delete_and_incr_reach_both_tiers(self):
+        cache.set('counter', 1)
+        assert cache.incr('counter') == 2
+        assert cache.get('counter') == 2
+        cache.delete('counter')
+        assert caches['local'].get('counter') is None
+        assert caches['shared'].get('counter') is None
+
+    def test_add_is_a_lock(self):
+        assert cache.add('lock:key', 1, 10)
+        assert not cache.add('lock:key', 2, 10)
+        assert caches['shared'].get('lock:key') == 1
+
+    def test_get_many_reads_through(self):
+        cache.set_many({'a': 1, 'b': {'nested': [2]}})
+        caches['local'].clear()
+        assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'b': {'nested': [2]}}
+        assert caches['local'].get('b') == {'nested': [2]}
+
+    def test_incr_missing_key(self):
+        with pytest.raises(ValueError):
+            cache.incr('missing')
+
+    def test_versioned_keys(self):
+        first = versioned_key('post', 1)
+        assert versioned_key('post', 1) == first
+        bump_version('post')
+        assert versioned_key('post', 1) != first
+
+
+class TestGetOrCompute:
+    def test_computes_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'value'
+
+        assert get_or_compute('key', compute, timeout=60) == 'value'
+        assert get_or_compute('key', compute, timeout=60) == 'value'
+        assert len(calls) == 1
+
+    def test_serves_stale_value_while_locked(self):
+        # Expired entry and another worker already recomputing it
+        cache.set('key', ('old', 0, 0.1), 60)
+        cache.add('lock:key', 1, 10)
+        assert get_or_compute('key', lambda: 'new', timeout=60) == 'old'
+
+    def test_refreshes_expired_value(self):
+        cache.set('key', ('old', 0, 0.1), 60)
+        assert get_or_compute('key', lambda: 'new', timeout=60) == 'new'
+        assert get_or_compute('key', lambda: 'newer', timeout=60) == 'new'
+
+
+class TestMembershipCounters:
+    def test_flushed_to_shared_tier(self, monkeypatch):
+        monkeypatch.setattr(membership, 'STATS_FLUSH_EVERY', 2)
+        membership.reset_stats()
+        membership._count(membership.HITS_KEY)
+        membership._count(membership.HITS_KEY)
+        membership._count(membership.MISSES_KEY)
+        assert caches['shared'].get(membership.HITS_KEY) == 2
+        assert membership.stats() == {'hits': 2, 'misses': 1}
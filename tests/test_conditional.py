@@ -0,0 +1,168 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from apps.groups.models import FriendGroup
+from apps.posts.models import Post
+
+
+def revalidate(client, url, response, **params):
+    """GET `url` again with the validators of `response`."""
+    return client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+
+@pytest.mark.django_db
+class TestPostDetail:
+    def test_not_modified_skips_serialization(self, authenticated_client, post, another_user):
+        post.like(another_user)
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert 'private' in response['Cache-Control'] and 'no-cache' in response['Cache-Control']
+        assert not response.has_header('Last-Modified')
+
+        with CaptureQueriesContext(connection) as queries:
+            again = revalidate(authenticated_client, url, response)
+        assert again.status_code == status.HTTP_304_NOT_MODIFIED
+        assert again['ETag'] == response['ETag']
+        assert again.content == b''
+        # The version query only, nothing of the serializer
+        assert len(queries) == 1
+
+    @pytest.mark.parametrize('change', ['edit', 'unlike', 'author', 'liker', 'group'])
+    def test_changes_move_etag(self, authenticated_client, user, another_user, friend_group, change):
+        post = Post.objects.create(
+            author=user, text_content='Post', audience_type=Post.AudienceType.GROUPS
+        )
+        post.audience_groups.add(friend_group)
+        post.like(another_user)
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        response = authenticated_client.get(url)
+
+        if change == 'edit':
+            authenticated_client.patch(url, {'text_content': 'Edited'})
+        elif change == 'unlike':
+            post.unlike(another_user)
+        elif change == 'author':
+            authenticated_client.patch(reverse('user-update', kwargs={'pk': user.pk}), {'first_name': 'New'})
+        elif change == 'liker':
+            another_user.first_name = 'New'
+            another_user.save()
+        elif change == 'group':
+            friend_group.name = 'Renamed'
+            friend_group.save()
+
+        again = revalidate(authenticated_client, url, response)
+        assert again.status_code == status.HTTP_200_OK
+        assert again['ETag'] != response['ETag']
+
+    def test_likers_outside_preview_ignored(self, settings, authenticated_client, user, another_user, post):
+        settings.POSTS_LIKED_BY_PREVIEW_SIZE = 1
+        post.like(another_user)
+        post.like(user)
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        response = authenticated_client.get(url)
+
+        # Not rendered in liked_by, so not part of the version either
+        another_user.first_name = 'New'
+        another_user.save()
+        assert revalidate(authenticated_client, url, response).status_code == status.HTTP_304_NOT_MODIFIED
+
+        user.first_name = 'New'
+        user.save()
+        assert revalidate(authenticated_client, url, response).status_code == status.HTTP_200_OK
+
+    def test_etag_depends_on_viewer_and_fields(self, api_client, authenticated_client, post, another_user):
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        response = authenticated_client.get(url)
+        assert revalidate(authenticated_client, url, response, fields='id').status_code == status.HTTP_200_OK
+
+        api_client.force_authenticate(user=another_user)
+        assert revalidate(api_client, url, response).status_code == status.HTTP_200_OK
+
+    def test_no_validators_for_errors(self, api_client, another_user, user):
+        private = Post.objects.create(author=user, text_content='Mine', audience_type=Post.AudienceType.ONLY_ME)
+        api_client.force_authenticate(user=another_user)
+        response = api_client.get(reverse('post-detail', kwargs={'pk': private.pk}), HTTP_IF_NONE_MATCH='*')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not response.has_header('ETag')
+
+        response = api_client.get(reverse('post-detail', kwargs={'pk': private.pk + 1}), HTTP_IF_NONE_MATCH='*')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestFeed:
+    def test_page_versions(self, authenticated_client, user, another_user):
+        posts = [Post.objects.create(author=user, text_content=f'Post {i}') for i in range(3)]
+        url = reverse('post-list-create')
+        response = authenticated_client.get(url, {'page_size': 2})
+        assert revalidate(authenticated_client, url, response, page_size=2).status_code == \
+            status.HTTP_304_NOT_MODIFIED
+
+        # A post below the page still changes whether there is a next page
+        posts[0].delete()
+        again = revalidate(authenticated_client, url, response, page_size=2)
+        assert again.status_code == status.HTTP_200_OK
+        assert again.json()['next'] is None
+
+        posts[2].like(another_user)
+        assert revalidate(authenticated_client, url, again, page_size=2).status_code == status.HTTP_200_OK
+
+    def test_create_is_unaffected(self, authenticated_client):
+        response = authenticated_client.post(reverse('post-list-create'), {'text_content': 'New'})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert not response.has_header('ETag')
+
+
+@pytest.mark.django_db
+class TestProfiles:
+    @pytest.mark.parametrize('url_name', ['user-detail', 'current-user'])
+    def test_last_modified(self, authenticated_client, user, url_name):
+        url = reverse(url_name, kwargs={'pk': user.pk} if url_name == 'user-detail' else None)
+        response = authenticated_client.get(url)
+        assert response.has_header('Last-Modified')
+
+        again = authenticated_client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert again.status_code == status.HTTP_304_NOT_MODIFIED
+        assert revalidate(authenticated_client, url, response).status_code == status.HTTP_304_NOT_MODIFIED
+
+        authenticated_client.patch(reverse('user-update', kwargs={'pk': user.pk}), {'bio': 'Changed'})
+        assert revalidate(authenticated_client, url, response).status_code == status.HTTP_200_OK
+
+    def test_profile_loaded_once(self, authenticated_client, another_user, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            response = authenticated_client.get(reverse('user-detail', kwargs={'pk': another_user.pk}))
+        assert response.json()['username'] == another_user.username
+
+    def test_missing_profile(self, authenticated_client):
+        response = authenticated_client.get(reverse('user-detail', kwargs={'pk': 0}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert not response.has_header('ETag')
+
+
+@pytest.mark.django_db
+class TestGroupDetail:
+    def test_member_changes(self, authenticated_client, user, another_user):
+        group = FriendGroup.objects.create(name='g', owner=user)
+        group.members.add(another_user)
+        url = reverse('group-detail', kwargs={'pk': group.pk})
+        response = authenticated_client.get(url)
+        assert revalidate(authenticated_client, url, response).status_code == status.HTTP_304_NOT_MODIFIED
+
+        another_user.username = 'renamed'
+        another_user.save()
+        response = revalidate(authenticated_client, url, response)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['members'][0]['username'] == 'renamed'
+
+        group.members.remove(another_user)
+        response = revalidate(authenticated_client, url, response)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['members'] == []
+
+    def test_other_owner(self, api_client, another_user, friend_group):
+        api_client.force_authenticate(user=another_user)
+        response = api_client.get(reverse('group-detail', kwargs={'pk': friend_group.pk}), HTTP_IF_NONE_MATCH='*')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
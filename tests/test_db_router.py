@@ -0,0 +1,67 @@
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.posts.models import Post
+from pickme.db_router import ReplicaRouter, primary, read_from
+
+
+@pytest.fixture
+def replica(settings):
+    # The alias is added in conftest; transaction=True so it sees committed rows
+    settings.READ_REPLICAS = ['replica']
+    return connections['replica']
+
+
+def queries_on(connection, sql_fragment):
+    return [q for q in connection.captured_queries if sql_fragment in q['sql']]
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+class TestReplicaRouting:
+    def test_feed_reads_from_replica(self, replica, user, post):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        with CaptureQueriesContext(replica) as on_replica, \
+                CaptureQueriesContext(connections['default']) as on_primary:
+            response = client.get(reverse('post-list-create'))
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.data['results']] == [post.pk]
+        assert queries_on(on_replica, 'FROM "posts"')
+        assert not queries_on(on_primary, 'FROM "posts"')
+
+    def test_reads_stick_to_primary_after_write(self, replica, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.post(reverse('post-list-create'), {
+            'content_type': Post.ContentType.TEXT,
+            'text_content': 'Fresh',
+            'audience_type': Post.AudienceType.EVERYONE,
+        })
+        assert response.status_code == status.HTTP_201_CREATED
+
+        with CaptureQueriesContext(replica) as on_replica:
+            response = client.get(reverse('post-list-create'))
+        assert response.data['results'][0]['text_content'] == 'Fresh'
+        assert not on_replica.captured_queries
+
+    def test_other_views_use_primary(self, replica, user, post):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        with CaptureQueriesContext(replica) as on_replica:
+            response = client.get(reverse('post-detail', kwargs={'pk': post.pk}))
+        assert response.status_code == status.HTTP_200_OK
+        assert not on_replica.captured_queries
+
+
+class TestReplicaRouter:
+    def test_writes_and_forced_reads_go_to_primary(self):
+        router = ReplicaRouter()
+        with read_from('replica'):
+            assert router.db_for_read(Post) == 'replica'
+            assert router.db_for_write(Post) == 'default'
+            with primary():
+                assert router.db_for_read(Post) == 'default'
+        assert router.db_for_read(Post) == 'default'
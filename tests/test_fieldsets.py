@@ -0,0 +1,110 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from apps.groups.models import FriendGroup
+
+
+def get(client, url, **params):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params)
+    assert response.status_code == status.HTTP_200_OK, response.content
+    # Without the ETag query of the view (pickme/conditional.py)
+    return response.json(), [query['sql'] for query in queries if '_version"' not in query['sql']]
+
+
+@pytest.fixture
+def liked_post(post, another_user, friend_group):
+    post.audience_groups.add(friend_group)
+    post.like(another_user)
+    return post
+
+
+@pytest.mark.django_db
+class TestPostFieldsets:
+    @pytest.mark.parametrize('url_name', ['post-list-create', 'user-posts', 'post-search'])
+    def test_fields_skip_related_queries(self, authenticated_client, user, liked_post, url_name):
+        url = reverse(url_name, kwargs={'user_id': user.pk} if url_name == 'user-posts' else None)
+        params = {'q': 'content'} if url_name == 'post-search' else {}
+
+        full, _ = get(authenticated_client, url, **params)
+        assert full['results'][0]['liked_by']
+
+        data, queries = get(authenticated_client, url, fields='id,text_content,likes_count', **params)
+        assert data['results'] == [{'id': liked_post.pk, 'text_content': liked_post.text_content, 'likes_count': 1}]
+        # Only the page itself, no groups, likers or is_liked subquery
+        assert len(queries) == 1
+        assert '"likes"' not in queries[0] and '"users"' not in queries[0]
+
+    def test_omit(self, authenticated_client, liked_post):
+        data, queries = get(
+            authenticated_client, reverse('post-list-create'), omit='liked_by,is_liked,audience_groups_detail'
+        )
+        item = data['results'][0]
+        assert 'liked_by' not in item and 'is_liked' not in item
+        assert item['audience_groups'] == list(liked_post.audience_groups.values_list('pk', flat=True))
+        assert not any('"likes"' in sql for sql in queries)
+
+    def test_collapsed_author(self, authenticated_client, user, liked_post):
+        url = reverse('post-list-create')
+        data, queries = get(authenticated_client, url, fields='id,author', expand='')
+        assert data['results'] == [{'id': liked_post.pk, 'author': user.pk}]
+        assert not any('"users"' in sql for sql in queries)
+
+        data, _ = get(authenticated_client, url, fields='id,author', expand='author')
+        assert data['results'][0]['author']['username'] == user.username
+
+    def test_detail_bypasses_representation_cache(self, authenticated_client, user, liked_post):
+        url = reverse('post-detail', kwargs={'pk': liked_post.pk})
+        get(authenticated_client, url)
+        data, queries = get(authenticated_client, url, fields='id,author,is_own', expand='')
+        assert data == {'id': liked_post.pk, 'author': user.pk, 'is_own': True}
+        assert not any('"users"' in sql or '"likes"' in sql for sql in queries)
+
+        data, _ = get(authenticated_client, url)
+        assert data['author']['id'] == user.pk
+        assert data['liked_by']
+
+    def test_unknown_fields_rejected(self, authenticated_client, post):
+        response = authenticated_client.get(reverse('post-list-create'), {'fields': 'id,secret', 'expand': 'text_content'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {
+            'fields': ['Unknown field: secret'],
+            'expand': ['Unknown field: text_content'],
+        }
+
+
+@pytest.mark.django_db
+class TestOtherFieldsets:
+    def test_groups(self, authenticated_client, user, another_user):
+        for name in ('a', 'b', 'c'):
+            FriendGroup.objects.create(name=name, owner=user).members.add(another_user)
+        url = reverse('group-list-create')
+
+        data, queries = get(authenticated_client, url)
+        assert [group['members_count'] for group in data['results']] == [1, 1, 1]
+        assert data['results'][0]['owner']['id'] == user.pk
+        # Page count and page; member counts and owners are part of the page query
+        assert len(queries) == 2
+
+        data, queries = get(authenticated_client, url, omit='members_count,created_at,updated_at', expand='')
+        assert data['results'][0] == {'id': data['results'][0]['id'], 'name': 'a', 'owner': user.pk}
+        assert len(queries) == 2
+        assert not any('"friend_groups_members"' in sql or '"users"' in sql for sql in queries)
+
+    def test_users(self, authenticated_client, user, another_user):
+        data, _ = get(authenticated_client, reverse('current-user'), fields='id,email')
+        assert data == {'id': user.pk, 'email': user.email}
+
+        data, _ = get(authenticated_client, reverse('user-detail', kwargs={'pk': another_user.pk}), omit='bio')
+        assert 'bio' not in data and data['username'] == another_user.username
+
+    def test_nested_serializers_ignore_parameters(self, authenticated_client, user):
+        group = FriendGroup.objects.create(name='g', owner=user)
+        data, _ = get(authenticated_client, reverse('group-list-create'), fields='id,owner')
+        # owner is a UserSearchSerializer, `fields` applies to the group only
+        assert data['results'][0]['id'] == group.pk
+        assert set(data['results'][0]['owner']) == {
+            'id', 'username', 'first_name', 'last_name', 'avatar', 'avatar_variants'
+        }
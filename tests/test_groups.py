@@ -1,6 +1,8 @@
 import pytest
+from django.core.cache import caches
 from django.urls import reverse
 from rest_framework import status
+from apps.groups import membership
 from apps.groups.models import FriendGroup
 
 
@@ -13,11 +15,12 @@ class TestFriendGroups:
         assert response.status_code == status.HTTP_201_CREATED
         assert FriendGroup.objects.filter(owner=user, name='Family').exists()
 
-    def test_list_groups(self, authenticated_client, friend_group):
+    def test_list_groups(self, authenticated_client, user, friend_group):
+        FriendGroup.objects.create(name='Aardvarks', owner=user)
         url = reverse('group-list-create')
         response = authenticated_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data['results']) == 1
+        assert [group['name'] for group in response.data['results']] == ['Aardvarks', friend_group.name]
 
     def test_add_member(self, authenticated_client, friend_group, another_user):
         url = reverse('group-member-add', kwargs={'group_id': friend_group.pk})
@@ -41,3 +44,67 @@ class TestFriendGroups:
         response = authenticated_client.delete(url)
         assert response.status_code == status.HTTP_204_NO_CONTENT
         assert not friend_group.members.filter(pk=another_user.pk).exists()
+
+    def test_members_list_cursor_paginated(self, authenticated_client, friend_group, another_user):
+        friend_group.members.add(another_user)
+        url = reverse('group-members-list', kwargs={'group_id': friend_group.pk})
+        response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.data['results']] == [another_user.pk]
+        assert response.data['next'] is None
+        assert 'count' not in response.data
+
+
+@pytest.mark.django_db
+class TestMembershipCache:
+    def test_cached_until_membership_changes(self, friend_group, another_user,
+                                             django_assert_num_queries):
+        assert membership.member_group_ids(another_user) == []
+        with django_assert_num_queries(0):
+            assert membership.member_group_ids(another_user) == []
+
+        friend_group.members.add(another_user)
+        assert membership.member_group_ids(another_user) == [friend_group.pk]
+
+        another_user.member_of_groups.remove(friend_group)
+        assert membership.member_group_ids(another_user) == []
+
+    def test_partitioned_by_owner(self, user, another_user, friend_group):
+        friend_group.members.add(another_user)
+        assert membership.member_group_ids(another_user, owner_id=user.pk) == [friend_group.pk]
+        assert membership.member_group_ids(another_user, owner_id=another_user.pk) == []
+
+    def test_clear_and_group_deletion_invalidate(self, user, friend_group, another_user):
+        friend_group.members.add(another_user)
+        assert membership.member_group_ids(another_user) == [friend_group.pk]
+        friend_group.members.clear()
+        assert membership.member_group_ids(another_user) == []
+
+        other_group = FriendGroup.objects.create(name='Other', owner=user)
+        other_group.members.add(another_user)
+        assert membership.member_group_ids(another_user) == [other_group.pk]
+        other_group.delete()
+        assert membership.member_group_ids(another_user) == []
+
+    def test_hit_and_miss_counters(self, another_user):
+        membership.reset_stats()
+        membership.member_group_ids(another_user)
+        membership.member_group_ids(another_user)
+        assert membership.stats() == {'hits': 1, 'misses': 1}
+
+    def test_counters_flushed_in_batches(self, monkeypatch, another_user):
+        membership.reset_stats()
+        monkeypatch.setattr(membership, 'STATS_FLUSH_EVERY', 3)
+        shared = caches['shared']
+        for _ in range(2):
+            membership.member_group_ids(another_user)
+        assert shared.get(membership.HITS_KEY) is None
+        membership.member_group_ids(another_user)
+        assert (shared.get(membership.HITS_KEY), shared.get(membership.MISSES_KEY)) == (2, 1)
+
+    def test_entries_skip_local_cache(self, friend_group, another_user):
+        # Another worker's L1 would keep the entry past invalidate()
+        friend_group.members.add(another_user)
+        assert membership.member_group_ids(another_user) == [friend_group.pk]
+        assert caches['local'].get(membership._key(another_user.pk)) is None
+        assert caches['shared'].get(membership._key(another_user.pk)) is not None
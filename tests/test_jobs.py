@@ -0,0 +1,143 @@
+import threading
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.jobs import queue
+from apps.jobs.models import Job
+from apps.posts.models import TimelineEntry
+
+calls = []
+
+
+@queue.task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@queue.task(name='tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('boom')
+
+
+@pytest.fixture(autouse=True)
+def queued_jobs(settings):
+    settings.JOBS_EAGER = False
+    calls.clear()
+
+
+@pytest.mark.django_db
+class TestQueue:
+    def test_job_runs_and_is_deleted(self):
+        record.enqueue(value=1)
+        assert calls == []
+        assert queue.run_next()
+        assert calls == [1]
+        assert not Job.objects.exists()
+        assert not queue.run_next()
+
+    def test_enqueue_is_rolled_back_with_transaction(self):
+        try:
+            with transaction.atomic():
+                record.enqueue(value=1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        assert not Job.objects.exists()
+
+    def test_delayed_job_is_not_due(self):
+        record.enqueue(delay=60, value=1)
+        assert not queue.run_next()
+
+    def test_failures_back_off_then_fail(self):
+        job = fail.enqueue()
+        assert queue.run_next()
+        job.refresh_from_db()
+        assert job.status == Job.Status.QUEUED
+        assert job.attempts == 1
+        assert job.run_at > timezone.now()
+        assert 'boom' in job.last_error
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        assert queue.run_next()
+        job.refresh_from_db()
+        assert job.status == Job.Status.FAILED
+        assert not queue.run_next()
+
+    def test_stale_running_job_is_requeued(self, settings):
+        job = record.enqueue(value=1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.RUNNING,
+            locked_at=timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT + 1)
+        )
+        assert queue.requeue_stale() == 1
+        assert queue.run_next()
+        assert calls == [1]
+
+
+    def test_stale_job_fails_after_last_attempt(self, settings):
+        job = record.enqueue(value=1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.RUNNING,
+            attempts=job.max_attempts,
+            locked_at=timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT + 1)
+        )
+        assert queue.requeue_stale() == 0
+        job.refresh_from_db()
+        assert job.status == Job.Status.FAILED
+        assert job.locked_at is None
+        assert 'JOBS_LOCK_TIMEOUT' in job.last_error
+        assert not queue.run_next()
+
+@pytest.mark.django_db(transaction=True)
+def test_run_workers_drains_queue():
+    # Worker threads use their own connections, so jobs must be committed
+    for value in range(5):
+        record.enqueue(value=value)
+    call_command('run_workers', '--once', '--concurrency', '2')
+    assert sorted(calls) == list(range(5))
+    assert not Job.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_claim_skips_locked_jobs():
+    first = record.enqueue(value=1)
+    second = record.enqueue(value=2)
+    claimed = []
+
+    def claim():
+        try:
+            claimed.append(queue.claim())
+        finally:
+            connection.close()
+
+    with transaction.atomic():
+        # Another worker holds the lock on the oldest job
+        Job.objects.select_for_update().get(pk=first.pk)
+        worker = threading.Thread(target=claim)
+        worker.start()
+        worker.join()
+    assert claimed[0].pk == second.pk
+
+
+@pytest.mark.django_db(transaction=True)
+def test_post_fan_out_is_deferred(authenticated_client, user, another_user, friend_group):
+    friend_group.members.add(another_user)
+    response = authenticated_client.post(reverse('post-list-create'), {
+        'content_type': 'text',
+        'text_content': 'For the group',
+        'audience_type': 'groups',
+        'audience_groups': [friend_group.pk]
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    post_id = response.data['id']
+
+    # The author sees the post at once, members once the job ran
+    assert TimelineEntry.objects.filter(viewer=user, post_id=post_id).exists()
+    assert not TimelineEntry.objects.filter(viewer=another_user, post_id=post_id).exists()
+    call_command('run_workers', '--once')
+    assert TimelineEntry.objects.filter(viewer=another_user, post_id=post_id).exists()
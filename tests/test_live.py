@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from apps.posts import live
+from apps.posts.models import Post
+from apps.users.serializers import CustomTokenObtainPairSerializer
+from pickme import pubsub
+
+
+def auth_headers(user):
+    token = CustomTokenObtainPairSerializer.get_token(user).access_token
+    return {'Authorization': f'Bearer {token}'}
+
+
+def event(author, audience_type, group_ids=(), post_id=1):
+    return {
+        'type': 'post',
+        'id': post_id,
+        'created_at': '2025-01-01T00:00:00+00:00',
+        'author_id': author.pk,
+        'audience_type': audience_type,
+        'group_ids': list(group_ids),
+    }
+
+
+@pytest.fixture
+def published(monkeypatch):
+    events = []
+    monkeypatch.setattr(pubsub, 'publish', events.append)
+    return events
+
+
+@pytest.mark.django_db
+class TestEvents:
+    def test_viewer_follows_can_view_rules(self, user, another_user, friend_group):
+        viewer = live.Viewer(another_user)
+        async_to_sync(viewer.load_groups)()
+        assert viewer.can_view(event(user, Post.AudienceType.EVERYONE))
+        assert not viewer.can_view(event(user, Post.AudienceType.ONLY_ME))
+        assert not viewer.can_view(event(user, Post.AudienceType.GROUPS, [friend_group.pk]))
+        assert viewer.can_view(event(another_user, Post.AudienceType.ONLY_ME))
+
+        friend_group.members.add(another_user)
+        async_to_sync(viewer.load_groups)()
+        assert viewer.can_view(event(user, Post.AudienceType.GROUPS, [friend_group.pk]))
+
+    def test_post_created_published_on_commit(self, authenticated_client, friend_group,
+                                              published, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_client.post(reverse('post-list-create'), {
+                'content_type': 'text',
+                'text_content': 'For the group',
+                'audience_type': 'groups',
+                'audience_groups': [friend_group.pk]
+            })
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [(e['type'], e['id'], e['group_ids']) for e in published] == [
+            ('post', response.data['id'], [friend_group.pk])
+        ]
+
+    def test_like_published(self, authenticated_client, post, published,
+                            django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            authenticated_client.post(reverse('post-like', kwargs={'pk': post.pk}))
+        assert [(e['type'], e['likes_count']) for e in published] == [('likes', 1)]
+
+    def test_membership_change_published(self, friend_group, another_user, published,
+                                         django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            friend_group.members.add(another_user)
+        assert published == [{'type': 'membership', 'user_ids': [another_user.pk]}]
+
+
+@pytest.mark.django_db
+class TestStream:
+    def test_requires_asgi(self, authenticated_client):
+        response = authenticated_client.get(reverse('post-stream'))
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    def test_streams_visible_events(self, settings, user, another_user, friend_group):
+        settings.SERVER_MODE = 'asgi'
+        settings.LIVE_HEARTBEAT = 0.05
+        friend_group.members.add(another_user)
+        headers = auth_headers(another_user)
+
+        async def read_events(chunks, count):
+            received = []
+            while len(received) < count:
+                chunk = (await asyncio.wait_for(chunks.__anext__(), 5)).decode()
+                if chunk.startswith('event:'):
+                    received.append(chunk)
+            return received
+
+        async def scenario():
+            response = await AsyncClient().get(
+                reverse('post-stream'), headers=headers
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert response['Content-Type'] == 'text/event-stream'
+            chunks = response.streaming_content.__aiter__()
+            assert 'connected' in (await chunks.__anext__()).decode()
+
+            pubsub.publish(event(user, Post.AudienceType.ONLY_ME, post_id=1))
+            pubsub.publish(event(user, Post.AudienceType.EVERYONE, post_id=2))
+            pubsub.publish(event(user, Post.AudienceType.GROUPS, [friend_group.pk], post_id=3))
+            received = await read_events(chunks, 2)
+            await chunks.aclose()
+            return received
+
+        received = async_to_sync(scenario)()
+        assert received[0].startswith('event: post\ndata: {"id":2,')
+        assert received[1].startswith('event: post\ndata: {"id":3,')
+        assert 'group_ids' not in received[1]
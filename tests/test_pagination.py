@@ -0,0 +1,72 @@
+import json
+from base64 import urlsafe_b64encode
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from apps.posts.models import Post
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    @pytest.fixture
+    def posts(self, user):
+        created = [
+            Post.objects.create(author=user, text_content=f'Post {i}')
+            for i in range(7)
+        ]
+        return sorted(created, key=lambda p: (p.created_at, p.id), reverse=True)
+
+    def test_walks_feed_without_count_query(self, authenticated_client, posts):
+        url = reverse('post-list-create') + '?page_size=3'
+        seen = []
+        with CaptureQueriesContext(connection) as ctx:
+            while url:
+                response = authenticated_client.get(url)
+                assert response.status_code == status.HTTP_200_OK
+                assert 'count' not in response.data
+                seen.extend(item['id'] for item in response.data['results'])
+                url = response.data['next']
+
+        assert seen == [p.id for p in posts]
+        # Paginator.count issues `SELECT COUNT(*) AS "__count"`
+        assert not any('"__count"' in q['sql'] for q in ctx.captured_queries)
+
+    def test_previous_link_returns_prior_page(self, authenticated_client, posts):
+        first = authenticated_client.get(reverse('post-list-create') + '?page_size=3')
+        assert first.data['previous'] is None
+        second = authenticated_client.get(first.data['next'])
+        back = authenticated_client.get(second.data['previous'])
+        assert [item['id'] for item in back.data['results']] == [p.id for p in posts[:3]]
+
+    def test_invalid_cursor(self, authenticated_client):
+        response = authenticated_client.get(reverse('post-list-create') + '?cursor=bogus')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize('url_name, position', [
+        ('post-list-create', ['abc', 1]),
+        ('post-list-create', ['2025-01-02T03:04:05+00:00', 'x']),
+        ('post-list-create', ['2025-01-02T03:04:05', 1]),
+        ('post-list-create', [None, None]),
+        ('post-list-create', [[1], {}]),
+        ('post-list-create', ['2025-01-02T03:04:05+00:00', True]),
+        ('post-search', ['0.5', 1]),
+        ('post-search', [float('nan'), 1]),
+    ])
+    def test_malformed_cursor_position(self, authenticated_client, posts, url_name, position):
+        cursor = urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+        response = authenticated_client.get(reverse(url_name), {'cursor': cursor, 'q': 'Post'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_search_cursor_accepts_integer_rank(self, authenticated_client, posts):
+        cursor = urlsafe_b64encode(json.dumps({'p': [1, posts[0].id + 1], 'r': 0}).encode()).decode()
+        response = authenticated_client.get(reverse('post-search'), {'cursor': cursor, 'q': 'Post'})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_user_posts_paginated(self, authenticated_client, user, posts):
+        url = reverse('user-posts', kwargs={'user_id': user.pk}) + '?page_size=5'
+        response = authenticated_client.get(url)
+        assert len(response.data['results']) == 5
+        assert response.data['next'] is not None
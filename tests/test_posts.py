@@ -1,7 +1,11 @@
 import pytest
+from django.core.management import call_command
+from django.contrib import admin
 from django.urls import reverse
 from rest_framework import status
-from apps.posts.models import Post
+from apps.posts.models import Post, Like
+from apps.posts.admin import PostAdmin
+from apps.posts.serializers import PostSerializer
 
 
 @pytest.mark.django_db
@@ -70,3 +74,186 @@ class TestPosts:
         url = reverse('post-detail', kwargs={'pk': post.pk})
         response = authenticated_client.delete(url)
         assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    @pytest.mark.parametrize('page_size', [2, 10])
+    def test_feed_query_count_independent_of_page_size(self, authenticated_client, user,
+                                                       another_user, django_assert_num_queries,
+                                                       page_size):
+        for i in range(page_size):
+            post = Post.objects.create(author=another_user, text_content=f'Post {i}')
+            post.like(user)
+            post.like(another_user)
+
+        url = reverse('post-list-create') + f'?page_size={page_size}'
+        # page versions (ETag), posts (with like annotations), audience
+        # groups, liker preview
+        with django_assert_num_queries(4):
+            response = authenticated_client.get(url)
+
+        assert len(response.data['results']) == page_size
+        item = response.data['results'][0]
+        assert item['likes_count'] == 2
+        assert item['is_liked'] is True
+        assert len(item['liked_by']) == 2
+
+    def test_like_and_unlike_update_counter(self, authenticated_client, post):
+        url = reverse('post-like', kwargs={'pk': post.pk})
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['likes_count'] == 1
+        assert response.data['is_liked'] is True
+        assert 'liked_by' not in response.data
+
+        response = authenticated_client.post(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['likes_count'] == 1
+
+        response = authenticated_client.delete(url)
+        assert response.data['likes_count'] == 0
+        post.refresh_from_db()
+        assert post.likes_count == 0
+
+    def test_reconcile_like_counts(self, post, user, another_user):
+        Like.objects.create(user=user, post=post)
+        Like.objects.create(user=another_user, post=post)
+        Post.objects.filter(pk=post.pk).update(likes_count=7)
+
+        call_command('reconcile_like_counts', chunk_size=1)
+
+        post.refresh_from_db()
+        assert post.likes_count == 2
+
+    def test_liked_by_preview_is_capped(self, settings, authenticated_client, post, user, another_user):
+        settings.POSTS_LIKED_BY_PREVIEW_SIZE = 1
+        post.like(user)
+        post.like(another_user)
+
+        response = authenticated_client.get(reverse('post-detail', kwargs={'pk': post.pk}))
+        assert response.data['likes_count'] == 2
+        assert [u['id'] for u in response.data['liked_by']] == [another_user.pk]
+
+    def test_likers_endpoint_pages_through_likes(self, authenticated_client, post, user, another_user):
+        post.like(user)
+        post.like(another_user)
+
+        url = reverse('post-likers', kwargs={'pk': post.pk}) + '?page_size=1'
+        first = authenticated_client.get(url)
+        assert first.status_code == status.HTTP_200_OK
+        assert first.data['results'][0]['user']['id'] == another_user.pk
+        second = authenticated_client.get(first.data['next'])
+        assert second.data['results'][0]['user']['id'] == user.pk
+        assert second.data['next'] is None
+
+    def test_likers_hidden_for_invisible_post(self, api_client, user, another_user):
+        private_post = Post.objects.create(
+            author=user,
+            text_content='Only me',
+            audience_type=Post.AudienceType.ONLY_ME
+        )
+        api_client.force_authenticate(user=another_user)
+        response = api_client.get(reverse('post-likers', kwargs={'pk': private_post.pk}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestPostRepresentationCache:
+    def test_shared_part_rendered_once(self, authenticated_client, post, monkeypatch):
+        calls = []
+        original = PostSerializer.get_audience_groups_detail
+
+        def counting(self, obj):
+            calls.append(obj.pk)
+            return original(self, obj)
+
+        monkeypatch.setattr(PostSerializer, 'get_audience_groups_detail', counting)
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        authenticated_client.get(url)
+        response = authenticated_client.get(url)
+
+        assert calls == [post.pk]
+        assert response.data['is_own'] is True
+
+    def test_repr_version_invalidates(self, authenticated_client, post, monkeypatch):
+        calls = []
+        original = PostSerializer.get_audience_groups_detail
+
+        def counting(self, obj):
+            calls.append(obj.pk)
+            return original(self, obj)
+
+        monkeypatch.setattr(PostSerializer, 'get_audience_groups_detail', counting)
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        authenticated_client.get(url)
+        monkeypatch.setattr(PostSerializer, 'repr_version', PostSerializer.repr_version + 1)
+        authenticated_client.get(url)
+
+        assert calls == [post.pk, post.pk]
+
+    def test_author_change_invalidates(self, authenticated_client, post, user):
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        authenticated_client.get(url)
+
+        user.username = 'renamed'
+        user.save()
+        response = authenticated_client.get(url)
+        assert response.data['author']['username'] == 'renamed'
+
+    def test_group_rename_invalidates(self, authenticated_client, user, friend_group):
+        post = Post.objects.create(
+            author=user,
+            text_content='Shared',
+            audience_type=Post.AudienceType.GROUPS
+        )
+        post.audience_groups.add(friend_group)
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        authenticated_client.get(url)
+
+        authenticated_client.patch(
+            reverse('group-detail', kwargs={'pk': friend_group.pk}),
+            {'name': 'Renamed'}
+        )
+        response = authenticated_client.get(url)
+        assert response.data['audience_groups_detail'] == [{'id': friend_group.pk, 'name': 'Renamed'}]
+
+    def test_viewer_fields_not_shared(self, api_client, post, another_user):
+        api_client.force_authenticate(user=post.author)
+        api_client.get(reverse('post-detail', kwargs={'pk': post.pk}))
+
+        api_client.force_authenticate(user=another_user)
+        response = api_client.get(reverse('post-detail', kwargs={'pk': post.pk}))
+        assert response.data['is_own'] is False
+
+
+@pytest.mark.django_db
+class TestPostSearch:
+    def test_search_ranks_and_respects_visibility(self, api_client, user, another_user):
+        best = Post.objects.create(author=user, text_content='Кошки и коты: кошка спит, кошки играют')
+        other = Post.objects.create(author=user, text_content='Собака и кошка')
+        Post.objects.create(author=user, text_content='Про собак')
+        Post.objects.create(
+            author=user,
+            text_content='Секретные кошки',
+            audience_type=Post.AudienceType.ONLY_ME
+        )
+
+        api_client.force_authenticate(user=another_user)
+        response = api_client.get(reverse('post-search'), {'q': 'кошки'})
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.data['results']] == [best.pk, other.pk]
+
+    def test_search_cursor_pagination(self, authenticated_client, user):
+        for i in range(3):
+            Post.objects.create(author=user, text_content=f'weather report {i}')
+        first = authenticated_client.get(reverse('post-search'), {'q': 'weather', 'page_size': 2})
+        second = authenticated_client.get(first.data['next'])
+        ids = [item['id'] for item in first.data['results'] + second.data['results']]
+        assert len(set(ids)) == 3
+
+    def test_admin_search_uses_text_index(self, rf, user, post):
+        model_admin = PostAdmin(Post, admin.site)
+        queryset = model_admin.get_queryset(rf.get('/'))
+
+        results, _ = model_admin.get_search_results(rf.get('/'), queryset, 'content')
+        assert list(results) == [post]
+        results, _ = model_admin.get_search_results(rf.get('/'), queryset, user.username)
+        assert list(results) == [post]
@@ -0,0 +1,149 @@
+import datetime
+import decimal
+import uuid
+
+import pytest
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.groups.models import FriendGroup
+from apps.posts.models import Post
+from apps.users.models import User
+from apps.users.serializers import UserSearchSerializer
+from apps.posts.serializers import PostSerializer
+from pickme import renderers
+from pickme.renderers import FastJSONRenderer
+
+SAMPLE = {
+    'text': 'Привет 😀 "quoted" \\ \n\t\x00\x1f\x7f line para ',
+    'int': 2 ** 40,
+    'float': 1.5,
+    'none': None,
+    'bools': [True, False],
+    'nested': [{'a': ()}, {}],
+    'aware': datetime.datetime(2025, 1, 2, 3, 4, 5, 678, tzinfo=datetime.timezone.utc),
+    'naive': datetime.datetime(2025, 1, 2, 3, 4, 5),
+    'date': datetime.date(2025, 1, 2),
+    'time': datetime.time(3, 4),
+    'decimal': decimal.Decimal('1.10'),
+    'uuid': uuid.UUID(int=1),
+    'lazy': gettext_lazy('Not found.'),
+    1: 'int key',
+}
+
+
+class TestFastJSONRenderer:
+    def test_same_bytes_as_json_renderer(self):
+        assert FastJSONRenderer().render(SAMPLE) == JSONRenderer().render(SAMPLE)
+
+    def test_falls_back_for_what_orjson_cannot_encode(self):
+        assert FastJSONRenderer().render({'big': 2 ** 70}) == b'{"big":1180591620717411303424}'
+        with pytest.raises(TypeError, match='not JSON serializable'):
+            FastJSONRenderer().render({'unknown': object()})
+
+    def test_indent_and_missing_orjson_use_json_renderer(self, monkeypatch):
+        media_type = 'application/json; indent=2'
+        assert FastJSONRenderer().render(SAMPLE, media_type) == JSONRenderer().render(SAMPLE, media_type)
+        monkeypatch.setattr(renderers, 'orjson', None)
+        assert FastJSONRenderer().render(SAMPLE) == JSONRenderer().render(SAMPLE)
+
+
+@pytest.fixture
+def avatar_user(db):
+    user = User.objects.create_user(
+        email='avatar@example.com',
+        username='with_avatar',
+        password='testpass123',
+        first_name='Анна',
+    )
+    User.objects.filter(pk=user.pk).update(
+        avatar='avatars/a.png',
+        avatar_variants={'320w': 'avatars/a-320.webp', 'thumbnail': 'avatars/a-t.webp'},
+    )
+    user.refresh_from_db()
+    return user
+
+
+@pytest.fixture
+def posts(db, user, another_user, avatar_user, authenticated_client):
+    """Own posts of `user` covering every PostSerializer field."""
+    groups = [FriendGroup.objects.create(name=name, owner=user) for name in ('b', 'a')]
+    ids = []
+    for audience, text in (('everyone', 'Текст  😀'), ('groups', 'Group'), ('only_me', 'Only me')):
+        response = authenticated_client.post(reverse('post-list-create'), {
+            'content_type': 'text',
+            'text_content': text,
+            'audience_type': audience,
+            'audience_groups': [group.pk for group in groups] if audience == 'groups' else [],
+        })
+        ids.append(response.data['id'])
+
+    Post.objects.filter(pk=ids[0]).update(
+        content_type='media',
+        media_type='photo',
+        media_file='posts/1/photo.jpg',
+        media_variants={'640w': 'posts/1/photo-640.webp'},
+    )
+    Post.objects.filter(pk=ids[1]).update(media_variants={})
+    for liker in (user, another_user, avatar_user):
+        Post.objects.get(pk=ids[0]).like(liker)
+    Post.objects.get(pk=ids[1]).like(avatar_user)
+    return ids
+
+
+def context_request(path, user):
+    request = Request(APIRequestFactory().get(path))
+    request.user = user
+    return request
+
+
+def expected_page(response, items, serializer_class, user):
+    """The response body as rendered before, by `serializer_class`."""
+    data = response.json()
+    request = context_request(response.wsgi_request.get_full_path(), user)
+    results = serializer_class(items, many=True, context={'request': request}).data
+    return JSONRenderer().render({'next': data['next'], 'previous': data['previous'], 'results': results})
+
+
+@pytest.mark.django_db
+class TestRowSerializers:
+    def test_feed(self, authenticated_client, user, posts):
+        response = authenticated_client.get(reverse('post-list-create'), {'page_size': 2})
+        instances = Post.objects.for_serializer(user).filter(pk__in=posts[1:]).order_by('-created_at', '-id')
+        assert len(response.json()['results']) == 2
+        assert response.content == expected_page(response, instances, PostSerializer, user)
+
+        response = authenticated_client.get(response.json()['next'])
+        instances = Post.objects.for_serializer(user).filter(pk=posts[0])
+        assert response.content == expected_page(response, instances, PostSerializer, user)
+
+    def test_user_posts(self, api_client, another_user, user, posts):
+        api_client.force_authenticate(user=another_user)
+        response = api_client.get(reverse('user-posts', kwargs={'user_id': user.pk}))
+        instances = Post.objects.for_serializer(another_user).filter(pk=posts[0])
+        assert response.content == expected_page(response, instances, PostSerializer, another_user)
+
+    def test_group_members(self, authenticated_client, user, another_user, avatar_user, friend_group):
+        friend_group.members.add(another_user, avatar_user)
+        response = authenticated_client.get(
+            reverse('group-members-list', kwargs={'group_id': friend_group.pk})
+        )
+        members = User.objects.filter(pk__in=[another_user.pk, avatar_user.pk]).order_by('-created_at', '-id')
+        assert len(response.json()['results']) == 2
+        assert response.content == expected_page(response, members, UserSearchSerializer, user)
+
+    def test_search(self, authenticated_client, user, avatar_user):
+        response = authenticated_client.get(reverse('user-search'), {'q': 'with'})
+        request = context_request('/', user)
+        results = UserSearchSerializer([avatar_user], many=True, context={'request': request}).data
+        data = response.json()
+        assert response.content == JSONRenderer().render({
+            'count': 1, 'next': data['next'], 'previous': data['previous'], 'results': results
+        })
+
+    def test_utc_datetimes_end_with_z(self, settings, authenticated_client, post):
+        settings.TIME_ZONE = 'UTC'
+        response = authenticated_client.get(reverse('post-list-create'))
+        assert response.json()['results'][0]['created_at'].endswith('Z')
@@ -0,0 +1,199 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.posts.models import Post, PostTombstone
+from apps.users.models import User
+from apps.posts.sync import encode_token
+
+
+def sync(client, token=None, **params):
+    if token is not None:
+        params['since'] = token
+    response = client.get(reverse('sync'), params)
+    assert response.status_code == status.HTTP_200_OK, response.content
+    return response.json()
+
+
+def age(queryset, seconds=60):
+    """Move the timestamps of `queryset` before any sync token of the test."""
+    before = timezone.now() - timedelta(seconds=seconds)
+    queryset.update(updated_at=before, counters_updated_at=before)
+
+
+@pytest.mark.django_db
+class TestSync:
+    def test_first_sync_resets(self, authenticated_client, post):
+        data = sync(authenticated_client)
+        assert data['reset'] is True
+        assert data['posts'] == data['likes'] == data['removed'] == []
+        assert data['token']
+
+    def test_steady_state_is_empty(self, authenticated_client, post):
+        age(Post.objects.all())
+        token = encode_token(timezone.now())
+        data = sync(authenticated_client, token)
+        assert data['reset'] is False
+        assert data['posts'] == data['likes'] == data['removed'] == []
+
+    def test_created_and_edited(self, authenticated_client, user, post):
+        age(Post.objects.all())
+        token = sync(authenticated_client)['token']
+        created = Post.objects.create(author=user, text_content='New')
+
+        data = sync(authenticated_client, token)
+        assert [item['id'] for item in data['posts']] == [created.pk]
+        feed = authenticated_client.get(reverse('post-list-create')).json()['results']
+        assert data['posts'][0] == feed[0]
+
+        authenticated_client.patch(reverse('post-detail', kwargs={'pk': post.pk}), {'text_content': 'Edited'})
+        data = sync(authenticated_client, token, fields='id,text_content')
+        assert {'id': post.pk, 'text_content': 'Edited'} in data['posts']
+
+    def test_like_counts(self, authenticated_client, user, another_user, post):
+        age(Post.objects.all())
+        token = encode_token(timezone.now())
+        post.like(another_user)
+        post.like(user)
+
+        data = sync(authenticated_client, token)
+        assert data['posts'] == []
+        assert data['likes'] == [{'id': post.pk, 'likes_count': 2, 'is_liked': True}]
+
+    def test_deleted(self, authenticated_client, post):
+        age(Post.objects.all())
+        token = encode_token(timezone.now())
+        authenticated_client.delete(reverse('post-detail', kwargs={'pk': post.pk}))
+
+        data = sync(authenticated_client, token)
+        assert data['removed'] == [post.pk]
+        assert data['posts'] == []
+
+    def test_audience_change(self, api_client, authenticated_client, another_user, post):
+        age(Post.objects.all())
+        token = encode_token(timezone.now())
+        authenticated_client.patch(reverse('post-detail', kwargs={'pk': post.pk}), {'audience_type': 'only_me'})
+
+        # The author still sees it, as an edit
+        data = sync(authenticated_client, token)
+        assert [item['id'] for item in data['posts']] == [post.pk]
+        assert data['removed'] == []
+
+        api_client.force_authenticate(user=another_user)
+        data = sync(api_client, token)
+        assert data['posts'] == []
+        assert data['removed'] == [post.pk]
+
+    def test_private_removals_reach_their_viewers_only(self, authenticated_client, another_user, friend_group):
+        friend_group.members.add(another_user)
+        posts = []
+        for text in ('Deleted', 'Hidden', 'Left behind'):
+            response = authenticated_client.post(reverse('post-list-create'), {
+                'text_content': text,
+                'audience_type': Post.AudienceType.GROUPS,
+                'audience_groups': [friend_group.pk],
+            })
+            posts.append(response.data['id'])
+        age(Post.objects.all())
+        token = encode_token(timezone.now())
+        member = APIClient()
+        member.force_authenticate(user=another_user)
+        outsider = APIClient()
+        outsider.force_authenticate(
+            user=User.objects.create_user(email='outsider@example.com', username='outsider', password='x')
+        )
+
+        authenticated_client.delete(reverse('post-detail', kwargs={'pk': posts[0]}))
+        authenticated_client.patch(reverse('post-detail', kwargs={'pk': posts[1]}), {'audience_type': 'only_me'})
+        assert sync(outsider, token)['removed'] == []
+        assert sync(member, token)['removed'] == posts[:2]
+
+        authenticated_client.delete(
+            reverse('group-member-remove', kwargs={'group_id': friend_group.pk, 'user_id': another_user.pk})
+        )
+        assert sync(member, token)['removed'] == posts
+        assert sync(authenticated_client, token)['removed'] == posts[:1]
+
+    def test_unchanged_audience_is_not_refreshed(self, monkeypatch, authenticated_client, friend_group, post):
+        url = reverse('post-detail', kwargs={'pk': post.pk})
+        authenticated_client.patch(url, {'audience_type': 'groups', 'audience_groups': [friend_group.pk]})
+        refreshed = []
+        monkeypatch.setattr('apps.posts.timeline.refresh_post', lambda *args, **kwargs: refreshed.append(args))
+
+        authenticated_client.patch(url, {'audience_type': 'groups', 'audience_groups': [friend_group.pk]})
+        authenticated_client.patch(url, {'text_content': 'Edited', 'audience_type': 'groups'})
+        assert refreshed == []
+        authenticated_client.patch(url, {'audience_type': 'only_me'})
+        assert len(refreshed) == 1
+
+    def test_audience_change_is_atomic(self, monkeypatch, authenticated_client, friend_group, post):
+        def fail(*args, **kwargs):
+            raise RuntimeError('timeline down')
+
+        monkeypatch.setattr('apps.posts.timeline.refresh_post', fail)
+        with pytest.raises(RuntimeError):
+            authenticated_client.patch(
+                reverse('post-detail', kwargs={'pk': post.pk}),
+                {'audience_type': 'groups', 'audience_groups': [friend_group.pk]}
+            )
+        post.refresh_from_db()
+        assert post.audience_type == Post.AudienceType.EVERYONE
+        assert not post.audience_groups.exists()
+
+    def test_reset(self, settings, authenticated_client, user):
+        settings.SYNC_MAX_CHANGES = 2
+        token = encode_token(timezone.now())
+        for i in range(3):
+            Post.objects.create(author=user, text_content=f'Post {i}')
+        assert sync(authenticated_client, token)['reset'] is True
+
+        old = encode_token(timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS + 1))
+        assert sync(authenticated_client, old)['reset'] is True
+
+    # Not base64, and a timestamp without a timezone
+    @pytest.mark.parametrize('token', ['x', 'eyJ0IjoiMjAyNS0wMS0wMSJ9'])
+    def test_invalid_token(self, authenticated_client, token):
+        response = authenticated_client.get(reverse('sync'), {'since': token})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'since' in response.json()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_late_fan_out(settings, api_client, user, another_user, friend_group):
+    settings.JOBS_EAGER = False
+    friend_group.members.add(another_user)
+    api_client.force_authenticate(user=user)
+    response = api_client.post(reverse('post-list-create'), {
+        'content_type': Post.ContentType.TEXT,
+        'text_content': 'For the group',
+        'audience_type': Post.AudienceType.GROUPS,
+        'audience_groups': [friend_group.pk],
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    # The worker runs well after the post was created
+    age(Post.objects.all())
+
+    api_client.force_authenticate(user=another_user)
+    token = encode_token(timezone.now())
+    data = sync(api_client, token)
+    assert data['posts'] == []
+
+    call_command('run_workers', '--once')
+    data = sync(api_client, token)
+    assert [item['id'] for item in data['posts']] == [response.data['id']]
+    assert data['likes'] == []
+
+
+@pytest.mark.django_db
+def test_prune_post_tombstones(settings):
+    kept = PostTombstone.objects.create(post_id=1, reason=PostTombstone.Reason.DELETED)
+    expired = PostTombstone.objects.create(post_id=2, reason=PostTombstone.Reason.DELETED)
+    PostTombstone.objects.filter(pk=expired.pk).update(
+        created_at=timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS + 1)
+    )
+    call_command('prune_post_tombstones', chunk_size=1)
+    assert list(PostTombstone.objects.values_list('pk', flat=True)) == [kept.pk]
@@ -0,0 +1,133 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.posts.models import Post, TimelineEntry
+
+
+def feed_ids(client):
+    response = client.get(reverse('post-list-create'))
+    assert response.status_code == status.HTTP_200_OK
+    return [item['id'] for item in response.data['results']]
+
+
+@pytest.mark.django_db
+class TestTimeline:
+    def create_group_post(self, authenticated_client, friend_group):
+        response = authenticated_client.post(reverse('post-list-create'), {
+            'content_type': 'text',
+            'text_content': 'For the group',
+            'audience_type': 'groups',
+            'audience_groups': [friend_group.pk]
+        })
+        assert response.status_code == status.HTTP_201_CREATED
+        return response.data['id']
+
+    def test_group_post_fanned_out_to_members(self, authenticated_client, friend_group, another_user):
+        friend_group.members.add(another_user)
+        post_id = self.create_group_post(authenticated_client, friend_group)
+
+        assert TimelineEntry.objects.filter(viewer=another_user, post_id=post_id).exists()
+        member_client = APIClient()
+        member_client.force_authenticate(user=another_user)
+        assert post_id in feed_ids(member_client)
+
+    def test_membership_changes_fill_and_prune(self, authenticated_client, friend_group, another_user):
+        post_id = self.create_group_post(authenticated_client, friend_group)
+        member_client = APIClient()
+        member_client.force_authenticate(user=another_user)
+        assert post_id not in feed_ids(member_client)
+
+        authenticated_client.post(
+            reverse('group-member-add', kwargs={'group_id': friend_group.pk}),
+            {'user_id': another_user.pk}
+        )
+        assert post_id in feed_ids(member_client)
+
+        authenticated_client.delete(reverse('group-member-remove', kwargs={
+            'group_id': friend_group.pk,
+            'user_id': another_user.pk
+        }))
+        assert post_id not in feed_ids(member_client)
+
+    def test_audience_change_prunes_timeline(self, authenticated_client, friend_group, another_user):
+        friend_group.members.add(another_user)
+        post_id = self.create_group_post(authenticated_client, friend_group)
+
+        response = authenticated_client.patch(
+            reverse('post-detail', kwargs={'pk': post_id}),
+            {'audience_type': 'only_me'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert not TimelineEntry.objects.filter(viewer=another_user, post_id=post_id).exists()
+        assert TimelineEntry.objects.filter(post_id=post_id).count() == 1
+
+    def test_hybrid_mode_merges_public_posts(self, api_client, another_user, post):
+        assert not TimelineEntry.objects.filter(post=post).exists()
+        api_client.force_authenticate(user=another_user)
+        assert post.pk in feed_ids(api_client)
+
+    def test_rebuild_without_hybrid_mode(self, settings, api_client, user, another_user, friend_group):
+        settings.TIMELINE_HYBRID_MODE = False
+        public_post = Post.objects.create(author=user, text_content='Public')
+        group_post = Post.objects.create(
+            author=user,
+            text_content='Shared',
+            audience_type=Post.AudienceType.GROUPS
+        )
+        group_post.audience_groups.add(friend_group)
+        friend_group.members.add(another_user)
+
+        call_command('rebuild_timelines')
+
+        api_client.force_authenticate(user=another_user)
+        assert feed_ids(api_client) == [group_post.pk, public_post.pk]
+
+    @pytest.mark.parametrize('hybrid', [True, False])
+    def test_feed_pages_merge_timeline_and_public_posts(self, settings, authenticated_client, user, hybrid):
+        settings.TIMELINE_HYBRID_MODE = hybrid
+        for index in range(7):
+            audience = 'only_me' if index % 3 else 'everyone'
+            authenticated_client.post(reverse('post-list-create'), {
+                'text_content': f'Post {index}',
+                'audience_type': audience,
+            })
+        # Own public posts are in the timeline and among the public posts
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        seen = []
+        url = reverse('post-list-create') + '?page_size=2'
+        while url:
+            data = authenticated_client.get(url).json()
+            seen.extend(item['id'] for item in data['results'])
+            url = data['next']
+        assert seen == expected
+
+        previous = authenticated_client.get(data['previous']).json()
+        assert [item['id'] for item in previous['results']] == expected[4:6]
+
+    def test_rebuild_is_atomic(self, monkeypatch, authenticated_client, user, post):
+        call_command('rebuild_timelines')
+
+        def fail(entries):
+            list(entries)
+            raise RuntimeError('database went away')
+
+        monkeypatch.setattr('apps.posts.timeline._insert', fail)
+        with pytest.raises(RuntimeError):
+            call_command('rebuild_timelines')
+        assert TimelineEntry.objects.filter(viewer=user, post=post).exists()
+
+    def test_group_delete_is_atomic(self, monkeypatch, authenticated_client, friend_group, another_user):
+        friend_group.members.add(another_user)
+        post_id = self.create_group_post(authenticated_client, friend_group)
+
+        def fail(*args):
+            raise RuntimeError('database went away')
+
+        monkeypatch.setattr('apps.posts.timeline.prune_entries', fail)
+        with pytest.raises(RuntimeError):
+            authenticated_client.delete(reverse('group-detail', kwargs={'pk': friend_group.pk}))
+        assert friend_group.posts.filter(pk=post_id).exists()
+        assert TimelineEntry.objects.filter(viewer=another_user, post_id=post_id).exists()
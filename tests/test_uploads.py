@@ -0,0 +1,188 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+from datetime import timedelta
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from apps.posts.models import Post
+from apps.posts.serializers import PostCreateSerializer
+from apps.uploads.images import render_variants
+from apps.uploads.models import UploadIntent
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.USE_S3 = False
+
+
+def create_intent(client, purpose, content_type='image/png', filename='photo.png'):
+    response = client.post(reverse('upload-create'), {
+        'purpose': purpose,
+        'filename': filename,
+        'content_type': content_type,
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.data
+
+
+def upload(intent, content=b'fake image bytes'):
+    target = intent['upload']
+    data = dict(target['fields'])
+    data['file'] = SimpleUploadedFile('photo.png', content, content_type='image/png')
+    # The upload URL carries its own signature, no credentials needed
+    return APIClient().post(target['url'], data, format='multipart')
+
+
+@pytest.mark.django_db
+class TestUploads:
+    def test_avatar_upload_flow(self, authenticated_client, user):
+        intent = create_intent(authenticated_client, UploadIntent.Purpose.AVATAR)
+        assert intent['key'].startswith(f'avatars/{user.pk}/')
+        assert upload(intent).status_code == status.HTTP_204_NO_CONTENT
+
+        response = authenticated_client.post(
+            reverse('upload-finalize', kwargs={'pk': intent['id']})
+        )
+        assert response.status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        assert user.avatar.name == intent['key']
+        assert UploadIntent.objects.get(pk=intent['id']).status == UploadIntent.Status.ATTACHED
+
+    def test_post_media_upload_flow(self, authenticated_client, user):
+        intent = create_intent(authenticated_client, UploadIntent.Purpose.POST_MEDIA)
+        upload(intent)
+        response = authenticated_client.post(
+            reverse('upload-finalize', kwargs={'pk': intent['id']})
+        )
+        assert response.data['status'] == UploadIntent.Status.UPLOADED
+        assert response.data['size'] == len(b'fake image bytes')
+
+        response = authenticated_client.post(reverse('post-list-create'), {
+            'content_type': Post.ContentType.MEDIA,
+            'media_type': Post.MediaType.PHOTO,
+            'media_upload': intent['id'],
+        })
+        assert response.status_code == status.HTTP_201_CREATED
+        post = Post.objects.get(author=user)
+        assert post.media_file.name == intent['key']
+        assert UploadIntent.objects.get(pk=intent['id']).status == UploadIntent.Status.ATTACHED
+
+    def test_upload_attached_to_one_post_only(self, authenticated_client, user):
+        intent = create_intent(authenticated_client, UploadIntent.Purpose.POST_MEDIA)
+        upload(intent)
+        authenticated_client.post(reverse('upload-finalize', kwargs={'pk': intent['id']}))
+
+        # Attached by a concurrent request after this one was validated
+        serializer = PostCreateSerializer(
+            data={
+                'content_type': Post.ContentType.MEDIA,
+                'media_type': Post.MediaType.PHOTO,
+                'media_upload': intent['id'],
+            },
+            context={'request': SimpleNamespace(user=user)}
+        )
+        assert serializer.is_valid(), serializer.errors
+        UploadIntent.objects.filter(pk=intent['id']).update(status=UploadIntent.Status.ATTACHED)
+        with pytest.raises(ValidationError):
+            serializer.save()
+        assert not Post.objects.exists()
+
+    def test_finalize_requires_uploaded_file(self, authenticated_client):
+        intent = create_intent(authenticated_client, UploadIntent.Purpose.AVATAR)
+        response = authenticated_client.post(
+            reverse('upload-finalize', kwargs={'pk': intent['id']})
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_upload_rejects_bad_signature_and_size(self, authenticated_client):
+        intent = create_intent(authenticated_client, UploadIntent.Purpose.AVATAR)
+        intent['upload']['url'] = intent['upload']['url'].split('?')[0] + '?signature=forged'
+        assert upload(intent).status_code == status.HTTP_404_NOT_FOUND
+
+        small = create_intent(authenticated_client, UploadIntent.Purpose.AVATAR)
+        UploadIntent.objects.filter(pk=small['id']).update(max_size=4)
+        assert upload(small).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_content_type_must_match_purpose(self, authenticated_client):
+        response = authenticated_client.post(reverse('upload-create'), {
+            'purpose': UploadIntent.Purpose.AVATAR,
+            'filename': 'clip.mp4',
+            'content_type': 'video/mp4',
+        })
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_prune_uploads(self, authenticated_client):
+        intent = create_intent(authenticated_client, UploadIntent.Purpose.POST_MEDIA)
+        upload(intent)
+        UploadIntent.objects.filter(pk=intent['id']).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        call_command('prune_uploads')
+        assert not UploadIntent.objects.exists()
+        assert not default_storage.exists(intent['key'])
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.mark.django_db
+class TestMediaVariants:
+    def test_render_variants_never_upscales(self):
+        variants = render_variants(png(800, 600), [320, 640, 1080], thumbnail_size=100)
+        sizes = {key: Image.open(io.BytesIO(data)).size for key, data in variants.items()}
+        assert sizes == {
+            '320w': (320, 240),
+            '640w': (640, 480),
+            '800w': (800, 600),
+            'thumbnail': (100, 100),
+        }
+
+    def test_square_variants(self):
+        variants = render_variants(png(300, 200), [64, 256], square=True)
+        sizes = {key: Image.open(io.BytesIO(data)).size for key, data in variants.items()}
+        assert sizes == {'64w': (64, 64), '200w': (200, 200)}
+
+    def test_process_media_records_variants(self, authenticated_client, user):
+        post = Post.objects.create(
+            author=user,
+            content_type=Post.ContentType.MEDIA,
+            media_type=Post.MediaType.PHOTO,
+            media_file=default_storage.save(f'posts/{user.pk}/photo.png', io.BytesIO(png(700, 700))),
+        )
+        user.avatar = default_storage.save(f'avatars/{user.pk}/me.png', io.BytesIO(png(90, 90)))
+        user.save()
+
+        call_command('process_media', once=True, processes=1)
+
+        post.refresh_from_db()
+        user.refresh_from_db()
+        assert set(post.media_variants) == {'320w', '640w', '700w', 'thumbnail'}
+        assert set(user.avatar_variants) == {'64w', '90w'}
+        assert all(default_storage.exists(name) for name in post.media_variants.values())
+
+        response = authenticated_client.get(reverse('post-detail', kwargs={'pk': post.pk}))
+        assert response.data['media_variants']['640w'].startswith('http://testserver/media/')
+        assert set(response.data['author']['avatar_variants']) == {'64w', '90w'}
+
+    def test_unreadable_image_is_marked_processed(self, user):
+        post = Post.objects.create(
+            author=user,
+            content_type=Post.ContentType.MEDIA,
+            media_type=Post.MediaType.PHOTO,
+            media_file=default_storage.save(f'posts/{user.pk}/broken.png', io.BytesIO(b'not an image')),
+        )
+        call_command('process_media', once=True, processes=1)
+        post.refresh_from_db()
+        assert post.media_variants == {}
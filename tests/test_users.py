@@ -1,6 +1,22 @@
 import pytest
+from django.contrib.auth import get_user_model
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.users.authentication import ClaimsUser, load_user
+from apps.users.serializers import CustomTokenObtainPairSerializer
+from apps.users.tokens import RefreshToken
+
+User = get_user_model()
 
 
 @pytest.mark.django_db
@@ -68,3 +84,175 @@ class TestUserProfile:
         assert response.status_code == status.HTTP_200_OK
         user.refresh_from_db()
         assert user.bio == 'New bio'
+
+
+@pytest.mark.django_db
+class TestUserSearch:
+    @pytest.fixture
+    def people(self, db):
+        return {
+            name: User.objects.create_user(
+                email=f'{name}@example.com', username=name, password='testpass123', **extra
+            )
+            for name, extra in (
+                ('annabel', {}),
+                ('joanna', {}),
+                ('bob', {'first_name': 'Anna'}),
+                ('carl', {}),
+            )
+        }
+
+    def search(self, client, query):
+        response = client.get(reverse('user-search'), {'q': query})
+        assert response.status_code == status.HTTP_200_OK
+        return [item['username'] for item in response.data['results']]
+
+    def test_short_query_matches_substrings(self, authenticated_client, people):
+        # Prefix matches first, then by username
+        assert self.search(authenticated_client, 'an') == ['annabel', 'bob', 'joanna']
+
+    def test_ranks_prefix_matches_first(self, authenticated_client, people):
+        results = self.search(authenticated_client, 'anna')
+        assert set(results[:2]) == {'annabel', 'bob'}
+        assert results[2:] == ['joanna']
+
+    def test_excludes_viewer(self, authenticated_client, user, people):
+        assert 'testuser' not in self.search(authenticated_client, 'test')
+
+    def test_results_are_cached(self, authenticated_client, people, django_assert_num_queries):
+        self.search(authenticated_client, 'anna')
+        with django_assert_num_queries(0):
+            assert 'joanna' in self.search(authenticated_client, 'ANNA')
+
+    @pytest.mark.parametrize('field', ['username', 'first_name', 'last_name'])
+    def test_uses_trigram_index(self, people, field):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        # Without the default ordering, whose index the planner may prefer
+        # depending on table statistics
+        plan = User.objects.filter(**{f'{field}__icontains': 'anna'}).order_by().explain()
+        assert f'users_{field}_trgm_idx' in plan
+
+
+@pytest.mark.django_db
+class TestClaimsAuthentication:
+    def bearer(self, api_client, user):
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return api_client
+
+    def test_claims_user_reads_token_without_queries(self, user, django_assert_num_queries):
+        token = AccessToken(str(CustomTokenObtainPairSerializer.get_token(user).access_token))
+        claims_user = ClaimsUser(token)
+        with django_assert_num_queries(0):
+            assert claims_user.pk == user.pk
+            assert claims_user.username == user.username
+            assert claims_user.is_authenticated
+            assert claims_user == user
+        with django_assert_num_queries(1):
+            assert load_user(claims_user).email == user.email
+            assert claims_user.bio == user.bio
+
+    def test_requests_skip_user_lookup(self, api_client, user):
+        client = self.bearer(api_client, user)
+        assert client.get(reverse('group-list-create')).status_code == status.HTTP_200_OK
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('group-list-create'))
+        assert response.status_code == status.HTTP_200_OK
+        assert not [q for q in queries.captured_queries if 'FROM "users"' in q['sql']]
+
+    def test_profile_is_read_from_database(self, api_client, user):
+        client = self.bearer(api_client, user)
+        user.username = 'renamed'
+        user.save()
+        response = client.get(reverse('current-user'))
+        assert response.data['username'] == 'renamed'
+
+    def test_inactive_user_rejected(self, api_client, user):
+        client = self.bearer(api_client, user)
+        assert client.get(reverse('current-user')).status_code == status.HTTP_200_OK
+        user.is_active = False
+        user.save()
+        assert client.get(reverse('current-user')).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestTokenRefresh:
+    def test_rotated_token_is_rejected(self, api_client, user):
+        refresh = str(RefreshToken.for_user(user))
+        response = api_client.post(reverse('token_refresh'), {'refresh': refresh})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['refresh'] != refresh
+
+        response = api_client.post(reverse('token_refresh'), {'refresh': refresh})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_blacklist_check_served_from_cache(self, user, django_assert_num_queries):
+        refresh = RefreshToken.for_user(user)
+        refresh.blacklist()
+        with django_assert_num_queries(0):
+            with pytest.raises(TokenError):
+                RefreshToken(str(refresh))
+
+    def test_blacklist_check_falls_back_to_database(self, user):
+        refresh = RefreshToken.for_user(user)
+        refresh.blacklist()
+        refresh.blacklist()
+        cache.clear()
+        with pytest.raises(TokenError):
+            RefreshToken(str(refresh))
+        assert BlacklistedToken.objects.filter(token__jti=refresh['jti']).count() == 1
+
+    def test_clean_token_refresh_skips_blacklist_query(self, redis_shared_cache, user):
+        refresh = str(RefreshToken.for_user(user))
+        with CaptureQueriesContext(connection) as queries:
+            RefreshToken(refresh)
+        assert not any('token_blacklist_blacklistedtoken' in q['sql'] for q in queries)
+
+        # Evicted: checked once against the database, then cached again
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            RefreshToken(refresh)
+        assert len(queries) == 1
+        with CaptureQueriesContext(connection) as queries:
+            RefreshToken(refresh)
+        assert len(queries) == 0
+
+    def test_clean_state_needs_a_shared_cache(self, user):
+        # With a per-process L2 the blacklisting may have happened in another
+        # worker: every check goes to the database
+        refresh = RefreshToken.for_user(user)
+        RefreshToken(str(refresh))
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=OutstandingToken.objects.get(jti=refresh['jti']))
+        ])
+        with pytest.raises(TokenError):
+            RefreshToken(str(refresh))
+
+    def test_blacklisting_overrides_clean_state(self, redis_shared_cache, user):
+        refresh = RefreshToken.for_user(user)
+        RefreshToken(str(refresh))
+        refresh.blacklist()
+        with pytest.raises(TokenError):
+            RefreshToken(str(refresh))
+
+        other = RefreshToken.for_user(user)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=other['jti']))
+        with pytest.raises(TokenError):
+            RefreshToken(str(other))
+
+    def test_prune_tokens(self, user):
+        live = RefreshToken.for_user(user)
+        for index in range(5):
+            token = OutstandingToken.objects.create(
+                user=user,
+                jti=f'expired-{index}',
+                token='expired',
+                expires_at=timezone.now() - timedelta(days=1),
+            )
+            BlacklistedToken.objects.create(token=token)
+
+        call_command('prune_tokens', chunk_size=2)
+
+        assert list(OutstandingToken.objects.values_list('jti', flat=True)) == [live['jti']]
+        assert not BlacklistedToken.objects.exists()
@@ -0,0 +1,61 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from apps.posts.models import Post
+
+
+@pytest.mark.django_db
+class TestVisibility:
+    @pytest.fixture
+    def posts(self, user, friend_group):
+        public = Post.objects.create(author=user, text_content='Public')
+        private = Post.objects.create(
+            author=user,
+            text_content='Only me',
+            audience_type=Post.AudienceType.ONLY_ME
+        )
+        shared = Post.objects.create(
+            author=user,
+            text_content='Shared',
+            audience_type=Post.AudienceType.GROUPS
+        )
+        shared.audience_groups.add(friend_group)
+        return {'public': public, 'private': private, 'shared': shared}
+
+    def test_visible_to_matches_can_view(self, posts, user, another_user, friend_group):
+        for viewer in (user, another_user):
+            for member in (False, True):
+                if member:
+                    friend_group.members.add(another_user)
+                expected = {p.pk for p in posts.values() if p.can_view(viewer)}
+                assert set(Post.objects.visible_to(viewer).values_list('pk', flat=True)) == expected
+
+    def test_bulk_can_view(self, posts, another_user, friend_group):
+        ids = [p.pk for p in posts.values()]
+        assert Post.objects.bulk_can_view(another_user, ids) == {posts['public'].pk}
+
+        friend_group.members.add(another_user)
+        assert Post.objects.bulk_can_view(another_user, ids) == {
+            posts['public'].pk, posts['shared'].pk
+        }
+
+    def test_visible_to_plan_has_no_distinct(self, posts, another_user):
+        queryset = Post.objects.visible_to(another_user)
+        assert 'DISTINCT' not in str(queryset.query)
+        plan = queryset.explain()
+        assert 'Unique' not in plan
+        assert 'HashAggregate' not in plan
+
+    def test_user_posts_respect_membership(self, api_client, user, another_user, friend_group, posts):
+        friend_group.members.add(another_user)
+        api_client.force_authenticate(user=another_user)
+        response = api_client.get(reverse('user-posts', kwargs={'user_id': user.pk}))
+        assert response.status_code == status.HTTP_200_OK
+        assert {item['id'] for item in response.data['results']} == {
+            posts['public'].pk, posts['shared'].pk
+        }
+
+    def test_like_requires_visibility(self, api_client, another_user, posts):
+        api_client.force_authenticate(user=another_user)
+        response = api_client.post(reverse('post-like', kwargs={'pk': posts['private'].pk}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND